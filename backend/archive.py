@@ -0,0 +1,513 @@
+"""
+Arquivo compactado de transcrições em disco, para guardar a longo prazo tudo
+o que já foi buscado (o cache expira; o arquivo não).
+
+Formato: um arquivo de dados só de acréscimo (`transcripts.dat`) e um índice
+SQLite com a posição de cada registro. Cada registro (um vídeo/idioma) é:
+
+- cabeçalho: magic, versão, codec, número de segmentos e de blocos
+- índice de blocos: início/fim (ms), posição e tamanho de cada bloco
+- blocos de até ARCHIVE_BLOCK_SEGMENTS segmentos, cada um comprimido sozinho
+  com zstd (zstandard, em requirements.txt; sem ele cai para zlib, e o codec
+  de cada registro fica no cabeçalho) contendo os inícios em ms codificados como
+  deltas, as durações em ms, os tamanhos dos textos e o texto em UTF-8
+
+A leitura usa mmap, e um intervalo de tempo só descomprime os blocos que se
+sobrepõem a ele.
+
+O servidor e a linha de comando podem usar o mesmo diretório ao mesmo tempo:
+acréscimos e o compact() pegam um flock exclusivo em `archive.lock`, leituras
+um compartilhado, e quem encontra o arquivo de dados trocado por um compact()
+de outro processo reabre os handles antes de continuar.
+
+Uso (a partir de backend/):
+    python archive.py stats
+    python archive.py export transcripts.jsonl
+    python archive.py import transcripts.jsonl
+    python archive.py import-cache          # copia as transcrições do cache SQLite
+    python archive.py compact
+"""
+import argparse
+import json
+import mmap
+import os
+import queue
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+from typing import IO, List, Optional, Tuple
+
+from subtitles import Transcript
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:
+    # Sem flock (Windows): só o lock entre threads do próprio processo
+    fcntl = None
+
+DEFAULT_DIR = os.environ.get(
+    "TRANSCRIPT_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_archive"),
+)
+ARCHIVE_ENABLED = os.environ.get("TRANSCRIPT_ARCHIVE", "1") not in ("0", "false", "no")
+ARCHIVE_BLOCK_SEGMENTS = int(os.environ.get("ARCHIVE_BLOCK_SEGMENTS", 256))
+ARCHIVE_ZSTD_LEVEL = int(os.environ.get("ARCHIVE_ZSTD_LEVEL", 9))
+ARCHIVE_ZLIB_LEVEL = int(os.environ.get("ARCHIVE_ZLIB_LEVEL", 6))
+QUEUE_MAX_SIZE = int(os.environ.get("ARCHIVE_QUEUE_SIZE", 1000))
+
+MAGIC = b"YTA1"
+FORMAT_VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {CODEC_ZLIB: "zlib", CODEC_ZSTD: "zstd"}
+
+# magic, versão, codec, segmentos, blocos
+_HEADER = struct.Struct("<4sBBII")
+# início do primeiro segmento (ms), fim do último (ms), posição relativa ao registro, tamanho
+_BLOCK = struct.Struct("<qqQI")
+# segmentos no bloco, tamanho do texto (bytes)
+_PAYLOAD = struct.Struct("<II")
+
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _to_bytes(values: array) -> bytes:
+    # Inteiros sempre em little-endian no disco
+    if _BIG_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def _compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ARCHIVE_ZLIB_LEVEL)
+
+
+def _decompress(data, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ArchiveError("registro comprimido com zstd, mas o pacote zstandard não está instalado")
+        try:
+            return zstandard.ZstdDecompressor().decompress(data)
+        except zstandard.ZstdError as e:
+            raise ArchiveError(f"bloco corrompido: {e}") from e
+    if codec != CODEC_ZLIB:
+        raise ArchiveError(f"codec desconhecido: {codec}")
+    try:
+        return zlib.decompress(data)
+    except zlib.error as e:
+        raise ArchiveError(f"bloco corrompido: {e}") from e
+
+
+def _ms(seconds: float) -> int:
+    return int(round(seconds * 1000))
+
+
+def encode_block(block: Transcript, codec: int) -> bytes:
+    starts_ms = [_ms(start) for start in block.starts]
+    deltas = array("i", (b - a for a, b in zip([starts_ms[0]] + starts_ms, starts_ms)))
+    durations = array("I", (max(0, _ms(duration)) for duration in block.durations))
+    lengths = array("I", (b - a for a, b in zip(block.offsets, block.offsets[1:])))
+    text = block.text.encode("utf-8")
+    payload = b"".join((
+        _PAYLOAD.pack(len(block), len(text)),
+        _to_bytes(deltas),
+        _to_bytes(durations),
+        _to_bytes(lengths),
+        text,
+    ))
+    return _compress(payload, codec)
+
+
+def decode_block(data, codec: int, first_start_ms: int) -> Transcript:
+    payload = memoryview(_decompress(data, codec))
+    if len(payload) < _PAYLOAD.size:
+        raise ArchiveError("bloco truncado")
+    count, text_size = _PAYLOAD.unpack_from(payload)
+    position = _PAYLOAD.size
+    width = 4 * count
+    if len(payload) != position + 3 * width + text_size:
+        raise ArchiveError("bloco com tamanho inconsistente")
+    deltas = _from_bytes("i", payload[position:position + width])
+    durations = _from_bytes("I", payload[position + width:position + 2 * width])
+    lengths = _from_bytes("I", payload[position + 2 * width:position + 3 * width])
+    position += 3 * width
+    text = bytes(payload[position:position + text_size]).decode("utf-8")
+    # O primeiro delta é sempre 0; o início do bloco vem do índice de blocos
+    starts = array("d", (ms / 1000 for ms in accumulate(deltas, initial=first_start_ms)))
+    del starts[0]
+    return Transcript(
+        starts,
+        array("d", (ms / 1000 for ms in durations)),
+        array("I", accumulate(lengths, initial=0)),
+        text,
+    )
+
+
+def encode_record(transcript: Transcript, codec: int, block_segments: int = ARCHIVE_BLOCK_SEGMENTS) -> bytes:
+    blocks: List[Tuple[int, int, bytes]] = []
+    for first in range(0, len(transcript), block_segments):
+        block = transcript.slice(first, first + block_segments)
+        end_ms = max(_ms(s + d) for s, d in zip(block.starts, block.durations))
+        blocks.append((_ms(block.starts[0]), end_ms, encode_block(block, codec)))
+
+    position = _HEADER.size + _BLOCK.size * len(blocks)
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, codec, len(transcript), len(blocks))]
+    for first_ms, end_ms, data in blocks:
+        parts.append(_BLOCK.pack(first_ms, end_ms, position, len(data)))
+        position += len(data)
+    parts.extend(data for _, _, data in blocks)
+    return b"".join(parts)
+
+
+def read_block_index(record) -> Tuple[int, List[Tuple[int, int, int, int]]]:
+    if len(record) < _HEADER.size:
+        raise ArchiveError("registro truncado")
+    magic, version, codec, _, block_count = _HEADER.unpack_from(record)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ArchiveError("registro inválido ou de outra versão do formato")
+    if len(record) < _HEADER.size + block_count * _BLOCK.size:
+        raise ArchiveError("registro truncado")
+    blocks = [_BLOCK.unpack_from(record, _HEADER.size + i * _BLOCK.size) for i in range(block_count)]
+    if any(offset + length > len(record) for _, _, offset, length in blocks):
+        raise ArchiveError("registro truncado")
+    return codec, blocks
+
+
+def decode_record(record, start: Optional[float] = None, end: Optional[float] = None) -> Transcript:
+    """Registro inteiro, ou só os blocos que se sobrepõem a [start, end)."""
+    codec, blocks = read_block_index(record)
+    if start is not None:
+        start_ms = _ms(start)
+        end_ms = _ms(end) if end != float("inf") else None
+        blocks = [b for b in blocks if b[1] > start_ms and (end_ms is None or b[0] < end_ms)]
+    transcript = Transcript.concat([
+        decode_block(record[offset:offset + length], codec, first_ms)
+        for first_ms, _, offset, length in blocks
+    ])
+    if start is not None:
+        transcript = transcript.slice_time(start, end)
+    return transcript
+
+
+class TranscriptArchive:
+    def __init__(self, directory: str = DEFAULT_DIR, block_segments: int = ARCHIVE_BLOCK_SEGMENTS):
+        self.directory = directory
+        self.block_segments = block_segments
+        self.codec = default_codec()
+        self.data_path = os.path.join(directory, "transcripts.dat")
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS archive_index (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                source TEXT,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                segment_count INTEGER NOT NULL,
+                duration REAL NOT NULL,
+                fingerprint TEXT NOT NULL,
+                archived_at REAL NOT NULL,
+                PRIMARY KEY (video_id, language)
+            )
+            """
+        )
+        self._lock_file = open(os.path.join(directory, "archive.lock"), "a")
+        self._file = open(self.data_path, "ab")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._map: Optional[mmap.mmap] = None
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"archived": 0, "unchanged": 0, "dropped": 0, "errors": 0, "reads": 0, "range_reads": 0}
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        """Lock entre threads e entre processos (servidor e CLI no mesmo diretório)."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                # Um compact() de outro processo troca o arquivo de dados (e os offsets)
+                if os.stat(self.data_path).st_ino != self._inode:
+                    self._reopen()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _reopen(self):
+        self._file.close()
+        self._file = open(self.data_path, "ab")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._map = None
+
+    # Escrita
+
+    def put(self, video_id: str, language: Optional[str], transcript: Transcript, source: Optional[str] = None) -> bool:
+        """Acrescenta o registro; False se a mesma versão já estava arquivada."""
+        language = language or "*"
+        fingerprint = transcript.fingerprint()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint FROM archive_index WHERE video_id = ? AND language = ?",
+                (video_id, language),
+            ).fetchone()
+        if row is not None and row[0] == fingerprint:
+            self.stats["unchanged"] += 1
+            return False
+        # Compressão fora do lock, para não travar as leituras
+        record = encode_record(transcript, self.codec, self.block_segments)
+        with self._locked(exclusive=True):
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(record)
+            self._file.flush()
+            # A versão anterior continua no arquivo de dados até o compact()
+            self._db.execute(
+                "INSERT OR REPLACE INTO archive_index "
+                "(video_id, language, source, offset, length, segment_count, duration, fingerprint, archived_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, language, source, offset, len(record), len(transcript), transcript.duration,
+                 fingerprint, time.time()),
+            )
+        self.stats["archived"] += 1
+        return True
+
+    def submit(self, video_id: str, language: Optional[str], transcript: Transcript, source: Optional[str] = None):
+        """Enfileira para arquivamento; nunca bloqueia quem chamou."""
+        if not transcript:
+            return
+        try:
+            self._queue.put_nowait((video_id, language, transcript, source))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self.put(*item)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Archiving failed for {item[0]}: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="transcript-archiver", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Leitura
+
+    def _record(self, video_id: str, language: Optional[str]) -> Optional[memoryview]:
+        with self._locked():
+            row = self._db.execute(
+                "SELECT offset, length FROM archive_index WHERE video_id = ? AND language = ?",
+                (video_id, language or "*"),
+            ).fetchone()
+            if row is None:
+                return None
+            offset, length = row
+            # O arquivo só cresce: remapeia quando o registro está além do mapa atual.
+            # O mapa antigo não é fechado aqui; ele é liberado quando a última
+            # leitura que ainda o referencia terminar.
+            if self._map is None or offset + length > len(self._map):
+                with open(self.data_path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Sem cópia: cada bloco é descomprimido direto do mapa
+            return memoryview(self._map)[offset:offset + length]
+
+    def get(self, video_id: str, language: Optional[str]) -> Optional[Transcript]:
+        record = self._record(video_id, language)
+        if record is None:
+            return None
+        self.stats["reads"] += 1
+        return decode_record(record)
+
+    def get_range(self, video_id: str, language: Optional[str], start: float, end: float) -> Optional[Transcript]:
+        """Segmentos em [start, end), descomprimindo só os blocos necessários."""
+        record = self._record(video_id, language)
+        if record is None:
+            return None
+        self.stats["range_reads"] += 1
+        return decode_record(record, start, end)
+
+    def entries(self) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT video_id, language, source, segment_count, duration, archived_at FROM archive_index ORDER BY video_id"
+            ).fetchall()
+        return [
+            {"video_id": v, "language": None if l == "*" else l, "source": s, "segments": n, "duration": d, "archived_at": t}
+            for v, l, s, n, d, t in rows
+        ]
+
+    # Importação e exportação em massa (JSON Lines, uma transcrição por linha)
+
+    def export_jsonl(self, out: IO[str]) -> int:
+        count = 0
+        for entry in self.entries():
+            transcript = self.get(entry["video_id"], entry["language"])
+            if transcript is None:
+                continue
+            out.write(json.dumps({
+                "video_id": entry["video_id"],
+                "language": entry["language"],
+                "source": entry["source"],
+                "transcript": transcript.to_compact(),
+            }, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+        return count
+
+    def import_jsonl(self, lines: IO[str]) -> int:
+        count = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            transcript = Transcript.from_compact(item["transcript"])
+            count += self.put(item["video_id"], item.get("language"), transcript, item.get("source"))
+        return count
+
+    def import_cache(self, cache_path: str) -> int:
+        """Copia as transcrições válidas do cache SQLite (cache.py)."""
+        from cache import _decode
+
+        db = sqlite3.connect(cache_path)
+        try:
+            rows = db.execute(
+                "SELECT video_id, language, value FROM transcript_cache WHERE source = 'transcript' AND negative = 0"
+            ).fetchall()
+        finally:
+            db.close()
+        count = 0
+        for video_id, language, value in rows:
+            result = json.loads(value, object_hook=_decode)
+            transcript = result.get("transcript")
+            if isinstance(transcript, Transcript) and transcript:
+                count += self.put(video_id, language, transcript, result.get("source"))
+        return count
+
+    def compact(self) -> dict:
+        """Reescreve o arquivo de dados só com as versões atuais de cada registro."""
+        with self._locked(exclusive=True):
+            before = os.path.getsize(self.data_path)
+            rows = self._db.execute("SELECT video_id, language, offset, length FROM archive_index ORDER BY offset").fetchall()
+            temp_path = self.data_path + ".compact"
+            moved = []
+            with open(self.data_path, "rb") as source, open(temp_path, "wb") as target:
+                for video_id, language, offset, length in rows:
+                    source.seek(offset)
+                    moved.append((target.tell(), video_id, language))
+                    target.write(source.read(length))
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, self.data_path)
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE archive_index SET offset = ? WHERE video_id = ? AND language = ?", moved)
+            self._db.execute("COMMIT")
+            self._reopen()
+            after = os.path.getsize(self.data_path)
+        return {"bytes_before": before, "bytes_after": after}
+
+    def info(self) -> dict:
+        with self._locked():
+            videos, segments, hours = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(segment_count), 0), COALESCE(SUM(duration), 0) / 3600 FROM archive_index"
+            ).fetchone()
+            live = self._db.execute("SELECT COALESCE(SUM(length), 0) FROM archive_index").fetchone()[0]
+            size = os.path.getsize(self.data_path)
+        return dict(
+            self.stats,
+            codec=CODEC_NAMES[self.codec],
+            queued=self._queue.qsize(),
+            transcripts=videos,
+            segments=segments,
+            hours=round(hours, 2),
+            bytes=size,
+            garbage_bytes=size - live,
+        )
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._map = None
+            self._file.close()
+            self._lock_file.close()
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats")
+    commands.add_parser("export").add_argument("path")
+    commands.add_parser("import").add_argument("path")
+    from cache import DEFAULT_DB_PATH as CACHE_DB_PATH
+    commands.add_parser("import-cache").add_argument("path", nargs="?", default=CACHE_DB_PATH)
+    commands.add_parser("compact")
+    args = parser.parse_args()
+
+    archive = TranscriptArchive(args.dir)
+    try:
+        if args.command == "export":
+            with open(args.path, "w", encoding="utf-8") as f:
+                print(f"{archive.export_jsonl(f)} transcrições exportadas")
+        elif args.command == "import":
+            with open(args.path, encoding="utf-8") as f:
+                print(f"{archive.import_jsonl(f)} transcrições importadas")
+        elif args.command == "import-cache":
+            print(f"{archive.import_cache(args.path)} transcrições importadas do cache")
+        elif args.command == "compact":
+            print(archive.compact())
+        else:
+            print(json.dumps(archive.info(), indent=2))
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
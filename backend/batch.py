@@ -0,0 +1,98 @@
+"""
+Busca de transcrições em lote (lista de vídeos, playlist ou canal).
+
+Os itens passam por um agendador com concorrência limitada e limite de taxa
+por host, e cada resultado é entregue assim que fica pronto. Erros de um item
+viram um evento de erro daquele item, sem derrubar o lote.
+"""
+import asyncio
+import os
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+import yt_dlp
+from fastapi import HTTPException
+
+from ratelimit import HostRateLimiter
+import sources
+
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 500))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 8))
+BATCH_HOST_RATE = float(os.environ.get("BATCH_HOST_RATE", 2.0))
+BATCH_HOST_BURST = float(os.environ.get("BATCH_HOST_BURST", 4.0))
+
+# Itens do lote começam no máximo BATCH_HOST_RATE vezes por segundo para cada host
+host_limiter = HostRateLimiter(BATCH_HOST_RATE, BATCH_HOST_BURST)
+
+Loader = Callable[[str, str, Optional[str]], Awaitable[dict]]
+
+
+def watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def item_host(url: str) -> str:
+    return sources.upstream_host(url)
+
+
+def _expand_playlist_sync(url: str, limit: int) -> List[str]:
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        # Extração "flat": só lista os IDs, sem abrir cada vídeo
+        'extract_flat': 'in_playlist',
+        'playlistend': limit,
+        'user_agent': sources.BROWSER_HEADERS['User-Agent'],
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    video_ids = []
+    pending = list(info.get('entries') or [])
+    while pending and len(video_ids) < limit:
+        entry = pending.pop(0)
+        if not entry:
+            continue
+        # Canais retornam abas (Videos, Shorts...) como playlists aninhadas
+        if entry.get('_type') == 'playlist' and entry.get('entries'):
+            pending[:0] = list(entry['entries'])
+            continue
+        if entry.get('id'):
+            video_ids.append(entry['id'])
+    return video_ids
+
+
+async def expand_playlist(url: str, limit: int = BATCH_MAX_ITEMS) -> List[str]:
+    return await sources.run_limited(sources.upstream_host(url), _expand_playlist_sync, url, limit)
+
+
+async def run_batch(
+    items: List[Tuple[str, str]],
+    loader: Loader,
+    language: Optional[str],
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+) -> AsyncIterator[dict]:
+    """Recebe (video_id, url) e gera um evento por item, na ordem em que terminam."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_item(index: int, video_id: str, url: str) -> dict:
+        async with semaphore:
+            await host_limiter.acquire(item_host(url))
+            try:
+                result = await loader(video_id, url, language)
+                return {"index": index, "video_id": video_id, "status": "ok", "result": result}
+            except HTTPException as e:
+                return {"index": index, "video_id": video_id, "status": "error",
+                        "status_code": e.status_code, "detail": e.detail}
+            except Exception as e:
+                return {"index": index, "video_id": video_id, "status": "error",
+                        "status_code": 500, "detail": str(e)}
+
+    tasks = [asyncio.ensure_future(run_item(i, vid, url)) for i, (vid, url) in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Cliente desconectou (ou o lote terminou): não deixa nada rodando à toa
+        for task in tasks:
+            task.cancel()
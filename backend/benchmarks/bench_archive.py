@@ -0,0 +1,121 @@
+"""
+Arquivo compactado (archive.py) contra um arquivo JSON por vídeo (lista de
+dicts + full_text, o formato antigo da API).
+
+Mede tamanho em disco, tempo de escrita, tempo para carregar cada vídeo
+inteiro e tempo para carregar um intervalo de alguns minutos. Tudo é
+normalizado por 1.000 horas de transcrição.
+
+O texto de make_cues se repete e comprimiria bem demais; aqui as palavras
+são sorteadas de um vocabulário maior para chegar perto de legendas reais.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_archive.py --videos 200 --video-hours 1
+    ARCHIVE_BLOCK_SEGMENTS=128 python benchmarks/bench_archive.py --range-minutes 2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive  # noqa: E402
+from subtitles import Transcript  # noqa: E402
+from bench_parsers import make_cues  # noqa: E402
+
+
+def make_vocabulary(rng: random.Random, size: int = 5000):
+    letters = "abcdefghijklmnopqrstuvwxyzáéíóãçõ"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(size)]
+
+
+def make_transcript(hours: float, rng: random.Random, vocabulary) -> Transcript:
+    return Transcript.from_segments(
+        (start, duration, " ".join(rng.choices(vocabulary, k=rng.randint(5, 12))))
+        for start, duration, _ in make_cues(hours)
+    )
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--video-hours", type=float, default=1.0)
+    parser.add_argument("--range-minutes", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    transcripts = {f"v{i:09d}": make_transcript(args.video_hours, rng, vocabulary) for i in range(args.videos)}
+    hours = args.videos * args.video_hours
+    scale = 1000 / hours
+    window = args.range_minutes * 60
+    ranges = {video_id: rng.uniform(0, max(0.0, args.video_hours * 3600 - window)) for video_id in transcripts}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        json_dir = os.path.join(workdir, "json")
+        os.makedirs(json_dir)
+
+        started = time.perf_counter()
+        for video_id, transcript in transcripts.items():
+            with open(os.path.join(json_dir, f"{video_id}.json"), "w", encoding="utf-8") as f:
+                json.dump({"transcript": transcript.to_dicts(), "full_text": transcript.full_text}, f, ensure_ascii=False)
+        json_write = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for video_id in transcripts:
+            with open(os.path.join(json_dir, f"{video_id}.json"), encoding="utf-8") as f:
+                Transcript.from_segments(json.load(f)["transcript"])
+        json_load = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for video_id, start in ranges.items():
+            with open(os.path.join(json_dir, f"{video_id}.json"), encoding="utf-8") as f:
+                Transcript.from_segments(json.load(f)["transcript"]).slice_time(start, start + window)
+        json_range = time.perf_counter() - started
+
+        store = archive.TranscriptArchive(os.path.join(workdir, "archive"))
+        started = time.perf_counter()
+        for video_id, transcript in transcripts.items():
+            store.put(video_id, "pt", transcript)
+        archive_write = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for video_id, transcript in transcripts.items():
+            loaded = store.get(video_id, "pt")
+        archive_load = time.perf_counter() - started
+        assert loaded.text == transcript.text and len(loaded) == len(transcript)
+
+        started = time.perf_counter()
+        for video_id, start in ranges.items():
+            part = store.get_range(video_id, "pt", start, start + window)
+        archive_range = time.perf_counter() - started
+        assert part.text == transcripts[video_id].slice_time(start, start + window).text
+
+        json_size = directory_size(json_dir)
+        archive_size = directory_size(os.path.join(workdir, "archive"))
+        store.close()
+
+    print(f"{args.videos} vídeos x {args.video_hours}h = {hours:g}h, codec {archive.CODEC_NAMES[archive.default_codec()]}, "
+          f"blocos de {archive.ARCHIVE_BLOCK_SEGMENTS} segmentos; valores por 1.000 horas")
+    rows = (
+        ("tamanho (MB)", json_size / 1e6, archive_size / 1e6),
+        ("escrita (s)", json_write, archive_write),
+        ("carga completa (s)", json_load, archive_load),
+        (f"carga de {args.range_minutes:g} min (s)", json_range, archive_range),
+    )
+    print(f"{'':<24}{'JSON':>12}{'arquivo':>12}{'razão':>9}")
+    for name, plain, packed in rows:
+        print(f"{name:<24}{plain * scale:>12.2f}{packed * scale:>12.2f}{plain / packed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark dos parsers de legenda.
+
+Gera a mesma legenda sintética nos quatro formatos (json3, WebVTT, SRV3, TTML),
+confere que todos os parsers produzem os mesmos segmentos e mede o tempo de cada um.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_parsers.py --hours 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitles import PARSERS  # noqa: E402
+
+WORDS = "o rato roeu a roupa do rei de roma e a rainha com raiva resolveu remendar".split()
+
+
+def make_cues(hours: float, cue_seconds: float = 2.5):
+    cues = []
+    t = 0.0
+    i = 0
+    while t < hours * 3600:
+        text = " ".join(WORDS[(i + k) % len(WORDS)] for k in range(8))
+        cues.append((round(t, 3), cue_seconds, text))
+        t += cue_seconds
+        i += 1
+    return cues
+
+
+def fmt_clock(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def to_json3(cues) -> bytes:
+    events = [{"tStartMs": 0, "dDurationMs": 0, "id": 1, "wpWinPosId": 1}]
+    for start, duration, text in cues:
+        words = text.split(" ")
+        segs = [{"utf8": words[0]}] + [{"utf8": " " + w, "tOffsetMs": 100 * k} for k, w in enumerate(words[1:], 1)]
+        events.append({"tStartMs": int(start * 1000), "dDurationMs": int(duration * 1000), "segs": segs})
+    return json.dumps({"events": events}).encode()
+
+
+def to_vtt(cues) -> bytes:
+    out = ["WEBVTT", "Kind: captions", "Language: pt", ""]
+    for start, duration, text in cues:
+        half = len(text) // 2
+        cut = text.index(" ", half)
+        out.append(f"{fmt_clock(start)} --> {fmt_clock(start + duration)} align:start position:0%")
+        out.append(f"<c>{text[:cut]}</c>")
+        out.append(text[cut + 1:])
+        out.append("")
+    return "\n".join(out).encode()
+
+
+def to_srv3(cues) -> bytes:
+    out = ['<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>']
+    for start, duration, text in cues:
+        words = text.split(" ")
+        spans = "".join(f'<s t="{100 * k}">{" " if k else ""}{w}</s>' for k, w in enumerate(words))
+        out.append(f'<p t="{int(start * 1000)}" d="{int(duration * 1000)}" w="1">{spans}</p>')
+    out.append("</body></timedtext>")
+    return "".join(out).encode()
+
+
+def to_ttml(cues) -> bytes:
+    out = ['<?xml version="1.0" encoding="utf-8"?><tt xmlns="http://www.w3.org/ns/ttml" xml:lang="pt"><body><div>']
+    for start, duration, text in cues:
+        half = len(text) // 2
+        cut = text.index(" ", half)
+        out.append(
+            f'<p begin="{fmt_clock(start)}" end="{fmt_clock(start + duration)}">'
+            f'{text[:cut]}<br/><span>{text[cut + 1:]}</span></p>'
+        )
+    out.append("</div></body></tt>")
+    return "".join(out).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cues = make_cues(args.hours)
+    expected = [(start, duration, text) for start, duration, text in cues]
+    payloads = {
+        "json3": to_json3(cues),
+        "vtt": to_vtt(cues),
+        "srv3": to_srv3(cues),
+        "ttml": to_ttml(cues),
+    }
+
+    print(f"{len(cues)} cues ({args.hours}h)")
+    print(f"{'format':<8}{'size (KB)':>12}{'best (ms)':>12}{'cues/s':>14}")
+    for fmt, payload in payloads.items():
+        parse = PARSERS[fmt]
+        segments = [(round(s.start, 3), round(s.duration, 3), s.text) for s in parse(payload)]
+        if segments != expected:
+            first_bad = next(i for i, (a, b) in enumerate(zip(segments, expected)) if a != b) if len(segments) == len(expected) else "length"
+            raise SystemExit(f"{fmt}: parser output differs from expected cues (at {first_bad})")
+
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for _ in parse(payload):
+                pass
+            best = min(best, time.perf_counter() - started)
+        print(f"{fmt:<8}{len(payload) / 1024:>12.0f}{best * 1000:>12.1f}{len(cues) / best:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Roda o resumo map-reduce contra o servidor local (fake_llm.py) e mostra
+latência por etapa e uso de tokens.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_summarizer.py --hours 3 --latency 0.5 --parallel 4
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+from bench_parsers import make_cues  # noqa: E402
+from fake_llm import serve  # noqa: E402
+from subtitles import Transcript  # noqa: E402
+from summarizer import SummaryStream  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, background=True)
+    client = OpenAI(base_url=f"http://127.0.0.1:{args.port}/v1", api_key="local")
+    transcript = Transcript.from_segments(make_cues(args.hours))
+
+    stream = SummaryStream(client, transcript, max_parallel=args.parallel, on_progress=print)
+    for _ in stream:
+        pass
+    result = stream.result
+    server.shutdown()
+
+    print(f"chunks: {result.chunks}")
+    for stage, seconds in result.stages.items():
+        print(f"{stage:<10}{seconds * 1000:>10.1f} ms")
+    print("usage:", result.usage)
+    assert result.text, "empty summary"
+
+
+if __name__ == "__main__":
+    main()
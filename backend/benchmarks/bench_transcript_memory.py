@@ -0,0 +1,64 @@
+"""
+Memória por hora de transcrição: lista de dicts + full_text (formato antigo)
+contra a estrutura compacta `Transcript`.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_transcript_memory.py --hours 1
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitles import Transcript  # noqa: E402
+from bench_parsers import make_cues  # noqa: E402
+
+
+def measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Textos criados fora da medição nos dois casos (eles vêm do parser)
+    cues = [(start, duration, "".join(text)) for start, duration, text in make_cues(args.hours)]
+
+    def legacy():
+        transcript = [{"text": text, "start": start, "duration": duration} for start, duration, text in cues]
+        full_text = " ".join([t['text'] for t in transcript])
+        return transcript, full_text
+
+    def compact():
+        return Transcript.from_segments(cues)
+
+    _, legacy_bytes, legacy_time = measure(legacy)
+    transcript, compact_bytes, compact_time = measure(compact)
+
+    # O formato antigo mantém também as strings de cada segmento vivas
+    segment_text_bytes = sum(sys.getsizeof(text) for _, _, text in cues)
+    legacy_total = legacy_bytes + segment_text_bytes
+
+    per_hour = 1.0 / args.hours
+    print(f"{len(cues)} segments ({args.hours}h)")
+    print(f"{'layout':<26}{'KB/hour':>12}{'build (ms)':>12}")
+    print(f"{'list of dicts + full_text':<26}{legacy_total * per_hour / 1024:>12.0f}{legacy_time * 1000:>12.1f}")
+    print(f"{'Transcript':<26}{compact_bytes * per_hour / 1024:>12.0f}{compact_time * 1000:>12.1f}")
+    print(f"ratio: {legacy_total / compact_bytes:.1f}x")
+
+    assert transcript.full_text == " ".join(text for _, _, text in cues)
+
+
+if __name__ == "__main__":
+    main()
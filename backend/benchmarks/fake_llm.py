@@ -0,0 +1,103 @@
+"""
+Servidor local compatível com a API de chat da OpenAI, para rodar o resumo
+sem gastar tokens da Groq.
+
+Uso (a partir de backend/):
+    python benchmarks/fake_llm.py --port 8001 --latency 0.5
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def make_handler(latency: float, log: Optional[list] = None):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            time.sleep(latency)
+
+            # Resposta determinística: as primeiras palavras do prompt viram "tópicos"
+            words = prompt.split()
+            content = "\n".join(f"- {' '.join(words[i:i + 8])}" for i in range(0, min(len(words), 40), 8))
+            prompt_tokens = len(prompt) // 4 + 1
+            completion_tokens = len(content) // 4 + 1
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            if log is not None:
+                # Registro das chamadas, para os testes conferirem contagens e uso
+                log.append({"prompt": prompt, "content": content, "stream": bool(body.get("stream")), "usage": usage})
+
+            if body.get("stream"):
+                # Server-Sent Events no formato de chat.completion.chunk
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+                for i, piece in enumerate(pieces):
+                    chunk = {
+                        "id": "chatcmpl-local",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "local"),
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                    }
+                    if i == len(pieces) - 1:
+                        chunk["x_groq"] = {"usage": usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(0.01)
+                self.wfile.write(b"data: [DONE]\n\n")
+                return
+
+            payload = {
+                "id": "chatcmpl-local",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "local"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(port: int = 8001, latency: float = 0.5, background: bool = False, log: Optional[list] = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, log))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    print(f"Fake LLM listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.latency)
+
+
+if __name__ == "__main__":
+    main()
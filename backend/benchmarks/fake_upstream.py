@@ -0,0 +1,150 @@
+"""
+Servidor local que imita os upstreams de legenda, para testes de carga sem
+tocar no YouTube.
+
+Rotas:
+    GET /api/v1/videos/<id>         Invidious: info do vídeo com a lista de legendas
+    GET /api/v1/captions/<id>       Invidious: legenda em WebVTT
+    GET /api/v1/stats               Invidious: usado pelo probe de saúde
+    GET /api/timedtext?v=<id>       timedtext do YouTube em json3
+
+Latência, taxa de erro (HTTP 500) e taxa de 429 (com Retry-After) são configuráveis.
+
+Uso (a partir de backend/):
+    python benchmarks/fake_upstream.py --port 8002 --latency 0.2 --error-rate 0.05 --rate-429 0.02
+    INVIDIOUS_INSTANCES=http://127.0.0.1:8002 FETCH_SOURCES=invidious uvicorn main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, NamedTuple
+from urllib.parse import parse_qs, urlparse
+
+from bench_parsers import make_cues, to_json3, to_vtt
+
+
+class UpstreamConfig(NamedTuple):
+    latency: float = 0.2
+    jitter: float = 0.1
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    retry_after: float = 1.0
+    hours: float = 0.5
+
+
+class Bodies:
+    """Legendas geradas uma vez e reutilizadas (o servidor não deve ser o gargalo)."""
+
+    def __init__(self, hours: float):
+        cues = make_cues(hours)
+        self.vtt = to_vtt(cues)
+        self.json3 = to_json3(cues)
+
+
+def make_handler(config: UpstreamConfig, bodies: Bodies, stats: Counter):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, payload, headers: Dict[str, str] = None):
+            self._send(status, json.dumps(payload).encode(), "application/json", headers)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+
+            if url.path == "/api/v1/stats":
+                self._send_json(200, {"software": {"name": "fake-invidious"}})
+                return
+
+            delay = max(0.0, config.latency + random.uniform(-config.jitter, config.jitter))
+            time.sleep(delay)
+
+            roll = random.random()
+            if roll < config.rate_429:
+                with lock:
+                    stats["429"] += 1
+                self._send_json(429, {"error": "Too Many Requests"}, {"Retry-After": f"{config.retry_after:g}"})
+                return
+            if roll < config.rate_429 + config.error_rate:
+                with lock:
+                    stats["500"] += 1
+                self._send_json(500, {"error": "injected failure"})
+                return
+
+            if len(parts) == 4 and parts[:3] == ["api", "v1", "videos"]:
+                video_id = parts[3]
+                captions = [
+                    {"label": "Português", "languageCode": "pt", "url": f"/api/v1/captions/{video_id}?label=pt"},
+                    {"label": "English", "languageCode": "en", "url": f"/api/v1/captions/{video_id}?label=en"},
+                ]
+                self._send_json(200, {"videoId": video_id, "title": f"Fake {video_id}", "captions": captions})
+                name = "videos"
+            elif len(parts) == 4 and parts[:3] == ["api", "v1", "captions"]:
+                self._send(200, bodies.vtt, "text/vtt; charset=utf-8")
+                name = "captions"
+            elif url.path == "/api/timedtext" and parse_qs(url.query).get("v"):
+                self._send(200, bodies.json3, "application/json")
+                name = "timedtext"
+            else:
+                self._send_json(404, {"error": "not found"})
+                name = "404"
+            with lock:
+                stats[name] += 1
+
+    return Handler
+
+
+def serve(port: int = 8002, config: UpstreamConfig = UpstreamConfig(), background: bool = False):
+    stats: Counter = Counter()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config, Bodies(config.hours), stats))
+    server.daemon_threads = True
+    server.stats = stats
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.2, help="latência média por requisição (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="variação uniforme da latência (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas HTTP 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fração de respostas HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After enviado nos 429 (s)")
+    parser.add_argument("--hours", type=float, default=0.5, help="duração das legendas geradas")
+
+
+def config_from_args(args) -> UpstreamConfig:
+    return UpstreamConfig(args.latency, args.jitter, args.error_rate, args.rate_429, args.retry_after, args.hours)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8002)
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(f"Fake upstream listening on http://127.0.0.1:{args.port}")
+    serve(args.port, config_from_args(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Teste de carga do backend contra o upstream local (fake_upstream.py).
+
+Sobe o servidor falso, sobe o FastAPI (uvicorn) apontado para ele com caches
+e bancos temporários, e dispara /transcript e /check-video com concorrência
+fixa. Mostra vazão, latência p50/p95/p99, status e memória (RSS) do servidor,
+e pode salvar o resultado como baseline para comparar depois.
+
+/check-video usa a youtube-transcript-api, que não tem como apontar para o
+servidor falso: sem cache ela vai ao YouTube de verdade. Por isso o padrão é
+só /transcript; use --check-video-ratio com --hot-videos para medir o caminho
+de cache/single-flight do /check-video.
+
+Uso (a partir de backend/):
+    python benchmarks/load_test.py --requests 2000 --concurrency 50 --videos 200
+    python benchmarks/load_test.py --rate-429 0.05 --save-baseline hedged
+    python benchmarks/load_test.py --compare hedged
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000   # servidor já rodando
+    python benchmarks/load_test.py --upstream-rate 10   # orçamento por host da produção
+
+O limitador de taxa protege upstreams reais; contra o servidor falso o padrão
+(--upstream-rate 1000) praticamente o desliga, senão a fila do limitador é o
+que se mede. Passe a taxa de produção para ver o efeito dela no p95.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+from fake_upstream import add_arguments, config_from_args, serve
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+COMPARED = ("throughput", "p50", "p95", "p99", "error_rate", "rss_mb")
+
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))]
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_backend(
+    port: int, upstream_port: int, workdir: str, extra_env: Dict[str, str], upstream_rate: float
+) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        INVIDIOUS_INSTANCES=f"http://127.0.0.1:{upstream_port}",
+        FETCH_SOURCES="invidious",
+        TRANSCRIPT_CACHE_DB=os.path.join(workdir, "cache.db"),
+        TRANSCRIPT_SEARCH_DB=os.path.join(workdir, "search.db"),
+        JOB_DB=os.path.join(workdir, "jobs.db"),
+        TRANSCRIPT_ARCHIVE_DIR=os.path.join(workdir, "archive"),
+        UPSTREAM_GLOBAL_RATE=str(max(upstream_rate, 20.0)),
+        UPSTREAM_GLOBAL_BURST=str(max(upstream_rate * 2, 40.0)),
+        UPSTREAM_HOST_RATE=str(upstream_rate),
+        UPSTREAM_HOST_BURST=str(upstream_rate * 2),
+    )
+    env.update(extra_env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            if process.poll() is not None:
+                raise RuntimeError("backend exited during startup")
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("backend did not start in 30s")
+
+
+def pick_video(args, hot: List[str]) -> str:
+    if hot and random.random() < args.hot_ratio:
+        return random.choice(hot)
+    return f"v{random.randrange(args.videos):09d}"
+
+
+async def run_load(args, base_url: str, server_pid: Optional[int]) -> dict:
+    hot = [f"v{i:09d}" for i in range(args.hot_videos)]
+    latencies: Dict[str, List[float]] = {"transcript": [], "check-video": []}
+    statuses: Counter = Counter()
+    peak_rss = 0.0
+    remaining = args.requests
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            endpoint = "check-video" if random.random() < args.check_video_ratio else "transcript"
+            body = {"url": f"https://www.youtube.com/watch?v={pick_video(args, hot)}", "language": args.language}
+            started = time.perf_counter()
+            try:
+                r = await client.post(f"{base_url}/{endpoint}", json=body)
+                status = str(r.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[endpoint].append(time.perf_counter() - started)
+            statuses[f"{endpoint} {status}"] += 1
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, rss_mb(server_pid) or 0.0)
+            await asyncio.sleep(0.2)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        sampler = asyncio.create_task(sample_memory()) if server_pid else None
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        if sampler:
+            sampler.cancel()
+
+    every = latencies["transcript"] + latencies["check-video"]
+    errors = sum(count for key, count in statuses.items() if not key.endswith(" 200"))
+    report = {
+        "requests": len(every),
+        "concurrency": args.concurrency,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(len(every) / elapsed, 2) if elapsed else 0.0,
+        "p50": percentile(every, 50),
+        "p95": percentile(every, 95),
+        "p99": percentile(every, 99),
+        "error_rate": round(errors / len(every), 4) if every else 0.0,
+        "statuses": dict(statuses),
+        "endpoints": {
+            name: {"count": len(samples), "p50": percentile(samples, 50), "p95": percentile(samples, 95), "p99": percentile(samples, 99)}
+            for name, samples in latencies.items() if samples
+        },
+    }
+    if server_pid:
+        report["rss_mb"] = round(peak_rss, 1)
+    return report
+
+
+def print_report(report: dict):
+    ms = lambda v: "-" if v is None else f"{v * 1000:.1f}ms"  # noqa: E731
+    print(f"requests:    {report['requests']} (concurrency {report['concurrency']}) in {report['elapsed']}s")
+    print(f"throughput:  {report['throughput']} req/s")
+    print(f"latency:     p50 {ms(report['p50'])}  p95 {ms(report['p95'])}  p99 {ms(report['p99'])}")
+    for name, data in report["endpoints"].items():
+        print(f"  {name:<12} n={data['count']:<6} p50 {ms(data['p50'])}  p95 {ms(data['p95'])}  p99 {ms(data['p99'])}")
+    print(f"error rate:  {report['error_rate']:.2%}")
+    for key, count in sorted(report["statuses"].items()):
+        print(f"  {key}: {count}")
+    if "rss_mb" in report:
+        print(f"server RSS:  {report['rss_mb']} MB (pico)")
+    if "upstream" in report:
+        print(f"upstream:    {report['upstream']}")
+
+
+def compare(report: dict, baseline: dict):
+    print("\nvs baseline:")
+    for key in COMPARED:
+        old, new = baseline.get(key), report.get(key)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"  {key:<11} {old:>10.4g} -> {new:<10.4g} {change}")
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--videos", type=int, default=200, help="quantidade de video_ids distintos")
+    parser.add_argument("--hot-videos", type=int, default=0, help="tamanho do conjunto de vídeos 'populares'")
+    parser.add_argument("--hot-ratio", type=float, default=0.8, help="fração das requisições que vão para os populares")
+    parser.add_argument("--check-video-ratio", type=float, default=0.0)
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--base-url", help="usar um backend já rodando em vez de subir um")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--upstream-port", type=int, default=8002)
+    parser.add_argument("--upstream-rate", type=float, default=1000.0, help="req/s por host upstream no backend")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE extra para o backend (repetível)")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    process = upstream = None
+    base_url = args.base_url
+    workdir = tempfile.TemporaryDirectory()
+    try:
+        if not base_url:
+            upstream = serve(args.upstream_port, config_from_args(args), background=True)
+            extra_env = dict(item.split("=", 1) for item in args.env)
+            process = start_backend(args.port, args.upstream_port, workdir.name, extra_env, args.upstream_rate)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        report = asyncio.run(run_load(args, base_url, process.pid if process else None))
+        report["config"] = {
+            "videos": args.videos,
+            "hot_videos": args.hot_videos,
+            "check_video_ratio": args.check_video_ratio,
+            "upstream": config_from_args(args)._asdict(),
+            "env": args.env,
+        }
+        if upstream is not None:
+            report["upstream"] = dict(upstream.stats)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        if upstream is not None:
+            upstream.shutdown()
+        workdir.cleanup()
+
+    print_report(report)
+
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            compare(report, json.load(f))
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nbaseline saved to {baseline_path(args.save_baseline)}")
+
+
+if __name__ == "__main__":
+    main()
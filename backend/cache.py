@@ -0,0 +1,363 @@
+"""
+Cache de transcrições em duas camadas:
+
+1. LRU em memória (rápido, por processo)
+2. SQLite em disco (sobrevive a restarts e é compartilhado entre o FastAPI e o Streamlit)
+
+As entradas são endereçadas pelo conteúdo da chave (video_id, language, source),
+têm TTL próprio e podem ser "negativas" (ex: legendas desativadas), para não
+voltarmos ao YouTube só para receber o mesmo erro.
+
+Gravações vão para a memória na hora e para o disco numa thread em background
+(write-behind): serializar e gravar no SQLite nunca acontece no event loop.
+Leituras do disco são síncronas; no FastAPI rodam no executor (run_blocking).
+"""
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+from subtitles import Transcript
+
+DEFAULT_DB_PATH = os.environ.get(
+    "TRANSCRIPT_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_cache.db"),
+)
+DEFAULT_TTL = int(os.environ.get("TRANSCRIPT_CACHE_TTL", 24 * 3600))
+DEFAULT_NEGATIVE_TTL = int(os.environ.get("TRANSCRIPT_CACHE_NEGATIVE_TTL", 10 * 60))
+MEMORY_MAX_ENTRIES = int(os.environ.get("TRANSCRIPT_CACHE_MEMORY_ENTRIES", 256))
+DISK_MAX_ENTRIES = int(os.environ.get("TRANSCRIPT_CACHE_DISK_ENTRIES", 10000))
+DISK_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_DISK_BYTES", 512 * 1024 * 1024))
+WRITE_QUEUE_SIZE = int(os.environ.get("TRANSCRIPT_CACHE_WRITE_QUEUE_SIZE", 1000))
+
+# Incrementar quando o formato dos valores mudar (entradas antigas deixam de ser encontradas)
+CACHE_VERSION = 2
+
+
+class NegativeEntry(NamedTuple):
+    """Resultado de erro cacheado (ex: legendas desativadas ou inexistentes)."""
+    status_code: int
+    detail: str
+
+
+def make_key(video_id: str, language: Optional[str], source: str) -> str:
+    raw = f"v{CACHE_VERSION}\x00{video_id}\x00{language or '*'}\x00{source}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _encode(obj):
+    # Transcript vai para o disco na forma compacta (texto único + offsets)
+    if isinstance(obj, Transcript):
+        return {"__transcript__": obj.to_compact()}
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "__transcript__" in obj:
+        return Transcript.from_compact(obj["__transcript__"])
+    return obj
+
+
+class TranscriptCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        memory_max_entries: int = MEMORY_MAX_ENTRIES,
+        disk_max_entries: int = DISK_MAX_ENTRIES,
+        disk_max_bytes: int = DISK_MAX_BYTES,
+        default_ttl: int = DEFAULT_TTL,
+        negative_ttl: int = DEFAULT_NEGATIVE_TTL,
+    ):
+        self.path = path
+        self.memory_max_entries = memory_max_entries
+        self.disk_max_entries = disk_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+
+        # key -> (expires_at, negative, value)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # A conexão é compartilhada entre o executor (leituras) e a thread de escrita
+        self._db_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "write_dropped": 0,
+            "write_errors": 0,
+        }
+        # Totais do disco mantidos a cada escrita (recontados só quando passam do limite)
+        self._disk_entries = 0
+        self._disk_bytes = 0
+
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS transcript_cache (
+                        key TEXT PRIMARY KEY,
+                        video_id TEXT NOT NULL,
+                        language TEXT,
+                        source TEXT NOT NULL,
+                        negative INTEGER NOT NULL DEFAULT 0,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        expires_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                    """
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_transcript_cache_accessed ON transcript_cache(accessed_at)"
+                )
+                self._disk_entries, self._disk_bytes = self._disk_totals()
+            except sqlite3.Error as e:
+                # Sem disco (ex: filesystem somente leitura) seguimos só com a camada em memória
+                print(f"Transcript cache disk tier disabled: {e}")
+                self._db = None
+
+    # Camada em memória
+
+    def _memory_get(self, key: str, now: float):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry
+
+    def _memory_set(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    # Camada em disco (sempre com _db_lock)
+
+    def _disk_totals(self):
+        return self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcript_cache"
+        ).fetchone()
+
+    def _disk_delete(self, key: str, size: int):
+        self._db.execute("DELETE FROM transcript_cache WHERE key = ?", (key,))
+        self._disk_entries -= 1
+        self._disk_bytes -= size
+
+    def _disk_get(self, key: str, now: float):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT negative, value, size, expires_at FROM transcript_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        negative, value, size, expires_at = row
+        if expires_at <= now:
+            self._disk_delete(key, size)
+            return None
+        self._db.execute("UPDATE transcript_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return (expires_at, bool(negative), json.loads(value, object_hook=_decode))
+
+    def _disk_set(self, key, video_id, language, source, negative, value, expires_at, now):
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_encode)
+        with self._db_lock:
+            old = self._db.execute("SELECT size FROM transcript_cache WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO transcript_cache
+                    (key, video_id, language, source, negative, value, size, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, video_id, language, source, int(negative), payload, len(payload), expires_at, now),
+            )
+            if old is None:
+                self._disk_entries += 1
+            else:
+                self._disk_bytes -= old[0]
+            self._disk_bytes += len(payload)
+            if self._disk_entries > self.disk_max_entries or self._disk_bytes > self.disk_max_bytes:
+                self._disk_evict(now)
+
+    def _disk_evict(self, now: float):
+        # Outros processos (Streamlit) também gravam no arquivo: recontar antes de apagar
+        self._db.execute("DELETE FROM transcript_cache WHERE expires_at <= ?", (now,))
+        count, total = self._disk_totals()
+        to_delete = []
+        if count > self.disk_max_entries or total > self.disk_max_bytes:
+            # Remove as entradas acessadas há mais tempo até voltar aos limites
+            rows = self._db.execute(
+                "SELECT key, size FROM transcript_cache ORDER BY accessed_at ASC"
+            )
+            for key, size in rows:
+                if count <= self.disk_max_entries and total <= self.disk_max_bytes:
+                    break
+                to_delete.append((key,))
+                count -= 1
+                total -= size
+            self._db.executemany("DELETE FROM transcript_cache WHERE key = ?", to_delete)
+        self._disk_entries, self._disk_bytes = count, total
+        with self._lock:
+            self._stats["evictions"] += len(to_delete)
+
+    # Escrita em background
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                self._disk_set(*item)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                with self._lock:
+                    self._stats["write_errors"] += 1
+                print(f"Transcript cache write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if self._db is not None and self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="transcript-cache-writer", daemon=True)
+            self._thread.start()
+            # Streamlit e scripts não chamam stop(): grava o que ficou na fila ao sair
+            atexit.register(self.stop)
+
+    def flush(self):
+        """Espera a fila de escrita esvaziar."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # API pública
+
+    def get(self, video_id: str, language: Optional[str], source: str, memory_only: bool = False) -> Any:
+        """
+        Retorna o valor cacheado, um NegativeEntry para erros cacheados,
+        ou None em caso de miss.
+
+        Com `memory_only`, não toca no disco (seguro no event loop) e um miss
+        não entra nas estatísticas: quem chamou ainda vai consultar o disco.
+        """
+        key = make_key(video_id, language, source)
+        now = time.time()
+        with self._lock:
+            entry = self._memory_get(key, now)
+            if entry is not None:
+                self._stats["memory_hits"] += 1
+            elif memory_only:
+                return None
+
+        if entry is None:
+            try:
+                with self._db_lock:
+                    entry = self._disk_get(key, now)
+            except sqlite3.Error as e:
+                print(f"Transcript cache read failed: {e}")
+                entry = None
+            with self._lock:
+                if entry is None:
+                    self._stats["misses"] += 1
+                    return None
+                self._stats["disk_hits"] += 1
+                self._memory_set(key, entry)
+
+        _, negative, value = entry
+        if negative:
+            with self._lock:
+                self._stats["negative_hits"] += 1
+            return NegativeEntry(**value)
+        return value
+
+    def set(self, video_id: str, language: Optional[str], source: str, value: Any, ttl: Optional[int] = None):
+        self._set(video_id, language, source, value, False, ttl or self.default_ttl)
+
+    def set_negative(
+        self,
+        video_id: str,
+        language: Optional[str],
+        source: str,
+        status_code: int,
+        detail: str,
+        ttl: Optional[int] = None,
+    ):
+        value = {"status_code": status_code, "detail": detail}
+        self._set(video_id, language, source, value, True, ttl or self.negative_ttl)
+
+    def _set(self, video_id, language, source, value, negative, ttl):
+        key = make_key(video_id, language, source)
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._stats["sets"] += 1
+            self._memory_set(key, (expires_at, negative, value))
+        if self._db is None:
+            return
+        self.start()
+        try:
+            # json.dumps e o SQLite ficam com a thread de escrita
+            self._queue.put_nowait((key, video_id, language, source, negative, value, expires_at, now))
+        except queue.Full:
+            with self._lock:
+                self._stats["write_dropped"] += 1
+
+    def invalidate(self, video_id: str, language: Optional[str], source: str):
+        key = make_key(video_id, language, source)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT size FROM transcript_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._disk_delete(key, row[0])
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._disk_entries
+                stats["disk_bytes"] = self._disk_bytes
+                stats["write_queue"] = self._queue.qsize()
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+
+_cache: Optional[TranscriptCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TranscriptCache:
+    """Instância única por processo (o arquivo SQLite é compartilhado entre processos)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TranscriptCache()
+    return _cache
@@ -0,0 +1,181 @@
+"""
+Exportação de transcrições (SRT, WebVTT, texto, texto com tempos, JSON, Markdown).
+
+A saída dos writers em streaming da Transcript passa por um compressor
+incremental (gzip ou brotli) e vai direto para a resposta: o ETag vem do
+fingerprint da transcrição, então não é preciso gerar o arquivo inteiro antes.
+O resultado comprimido fica num LRU em memória endereçado pelo ETag, e
+downloads repetidos viram um 304 ou uma cópia de bytes prontos.
+"""
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from subtitles import Transcript
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXPORT_CACHE_BYTES = int(os.environ.get("EXPORT_CACHE_BYTES", 64 * 1024 * 1024))
+# Abaixo disso comprimir não compensa
+EXPORT_MIN_COMPRESS_BYTES = int(os.environ.get("EXPORT_MIN_COMPRESS_BYTES", 1024))
+# Texto acumulado antes de cada chamada ao compressor (e de cada pedaço da resposta)
+EXPORT_STREAM_BUFFER = int(os.environ.get("EXPORT_STREAM_BUFFER", 64 * 1024))
+
+
+class ExportFormat(NamedTuple):
+    media_type: str
+    writer: Callable[..., Iterator[str]]
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "srt": ExportFormat("application/x-subrip; charset=utf-8", lambda t, **kw: t.iter_srt()),
+    "vtt": ExportFormat("text/vtt; charset=utf-8", lambda t, **kw: t.iter_vtt()),
+    "txt": ExportFormat("text/plain; charset=utf-8", lambda t, timestamps=False, **kw: t.iter_text(timestamps)),
+    "json": ExportFormat("application/json", lambda t, **kw: t.iter_json()),
+    "md": ExportFormat("text/markdown; charset=utf-8", lambda t, title=None, url=None, **kw: t.iter_markdown(title, url)),
+}
+
+
+def negotiate_encoding(accept_encoding: Optional[str], transcript: Optional[Transcript] = None) -> str:
+    """br se disponível e aceito, depois gzip; senão sem compressão (também para transcrições curtas)."""
+    if transcript is not None and len(transcript.text) < EXPORT_MIN_COMPRESS_BYTES:
+        return "identity"
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def _compressor(encoding: str) -> Optional[Tuple[Callable[[bytes], bytes], Callable[[], bytes]]]:
+    """(comprimir um pedaço, finalizar) do encoding, ou None para identity."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        return compressor.process, compressor.finish
+    if encoding == "gzip":
+        # wbits 31: formato gzip (cabeçalho + CRC), como o gzip.compress
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+    return None
+
+
+def iter_encoded(chunks: Iterable[str], encoding: str) -> Iterator[bytes]:
+    """Texto dos writers -> bytes (comprimidos se for o caso), em pedaços de ~EXPORT_STREAM_BUFFER."""
+    compressor = _compressor(encoding)
+    process = compressor[0] if compressor is not None else None
+    buffer: List[str] = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= EXPORT_STREAM_BUFFER:
+            data = "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+            data = process(data) if process is not None else data
+            if data:
+                yield data
+    data = "".join(buffer).encode("utf-8")
+    if compressor is not None:
+        data = process(data) + compressor[1]()
+    if data:
+        yield data
+
+
+def make_etag(video_id: str, transcript: Transcript, fmt: str, variant: str, encoding: str) -> str:
+    # Representações comprimidas diferentes têm ETags diferentes
+    return f'"{video_id}-{transcript.fingerprint()}-{fmt}{variant}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def render_stream(
+    transcript: Transcript,
+    fmt: str,
+    encoding: str,
+    cache: Optional["ExportCache"] = None,
+    etag: Optional[str] = None,
+    **options,
+) -> Iterator[bytes]:
+    """
+    Corpo da resposta em pedaços já comprimidos. Com `cache`, guarda o corpo
+    inteiro no fim (se couber) para os próximos downloads do mesmo ETag.
+    """
+    parts: Optional[List[bytes]] = [] if cache is not None else None
+    size = 0
+    for part in iter_encoded(EXPORT_FORMATS[fmt].writer(transcript, **options), encoding):
+        if parts is not None:
+            size += len(part)
+            if size > cache.max_bytes:
+                # Não caberia no cache: só transmite
+                parts = None
+            else:
+                parts.append(part)
+        yield part
+    if parts is not None:
+        cache.set(etag, b"".join(parts), encoding)
+
+
+def render(transcript: Transcript, fmt: str, encoding: str, **options) -> bytes:
+    """Arquivo completo de uma vez (já comprimido)."""
+    return b"".join(render_stream(transcript, fmt, encoding, **options))
+
+
+class ExportCache:
+    """LRU limitado pelo total de bytes guardados."""
+
+    def __init__(self, max_bytes: int = EXPORT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, etag: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.stats["hits"] += 1
+            return entry
+
+    def set(self, etag: str, body: bytes, encoding: str):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[etag] = (body, encoding)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def record_not_modified(self):
+        """Conta um 304 (If-None-Match bateu com o ETag; nada foi renderizado)."""
+        with self._lock:
+            self.stats["not_modified"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes, brotli=brotli is not None)
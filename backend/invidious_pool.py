@@ -0,0 +1,228 @@
+"""
+Pool de instâncias Invidious com pontuação de saúde e circuit breaker.
+
+Cada instância guarda as latências recentes, a taxa de sucesso e as falhas
+consecutivas. As tentativas são ordenadas pela pontuação de saúde, instâncias
+que falham repetidamente têm o circuito aberto (são puladas) e uma tarefa em
+background volta a testá-las até se recuperarem.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import List, Optional
+
+# Lista de instâncias públicas que costumam funcionar
+DEFAULT_INSTANCES = [
+    "https://inv.tux.pizza",
+    "https://invidious.projectsegfau.lt",
+    "https://invidious.fdn.fr",
+    "https://vid.puffyan.us",
+    "https://invidious.jing.rocks"
+]
+
+FAILURE_THRESHOLD = int(os.environ.get("INVIDIOUS_FAILURE_THRESHOLD", 3))
+OPEN_SECONDS = float(os.environ.get("INVIDIOUS_OPEN_SECONDS", 60))
+PROBE_INTERVAL = float(os.environ.get("INVIDIOUS_PROBE_INTERVAL", 30))
+PROBE_TIMEOUT = float(os.environ.get("INVIDIOUS_PROBE_TIMEOUT", 5))
+# Quanto tempo a tentativa de teste de uma instância half-open segura a vaga:
+# quem recebeu a lista pode nem chegar a tentar (outra instância respondeu antes)
+TRIAL_TIMEOUT = float(os.environ.get("INVIDIOUS_TRIAL_TIMEOUT", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def load_instances() -> List[str]:
+    """
+    Ordem: INVIDIOUS_INSTANCES (separadas por vírgula), depois
+    INVIDIOUS_INSTANCES_FILE (lista JSON), depois a lista padrão.
+    """
+    raw = os.environ.get("INVIDIOUS_INSTANCES")
+    if raw:
+        return [i.strip().rstrip("/") for i in raw.split(",") if i.strip()]
+
+    path = os.environ.get("INVIDIOUS_INSTANCES_FILE")
+    if path and os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("instances", [])
+        return [str(i).rstrip("/") for i in data]
+
+    return list(DEFAULT_INSTANCES)
+
+
+class InstanceHealth:
+    def __init__(self, url: str, window: int = 50):
+        self.url = url
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        # Início da tentativa de teste em andamento (half-open), se houver
+        self.trial_started_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.total_requests = 0
+
+    def latency_percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def success_rate(self) -> float:
+        if not self.outcomes:
+            # Instância nunca testada: otimista, mas abaixo de uma comprovadamente boa
+            return 0.75
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def score(self) -> float:
+        p50 = self.latency_percentile(50)
+        latency_penalty = 1.0 + (p50 if p50 is not None else 2.0)
+        return self.success_rate / latency_penalty / (1 + self.consecutive_failures)
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "trial_in_flight": self.trial_started_at is not None,
+            "score": round(self.score(), 4),
+            "success_rate": round(self.success_rate, 4),
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "latency_p99": self.latency_percentile(99),
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+        }
+
+
+class InvidiousPool:
+    def __init__(
+        self,
+        instances: List[str],
+        failure_threshold: int = FAILURE_THRESHOLD,
+        open_seconds: float = OPEN_SECONDS,
+        probe_interval: float = PROBE_INTERVAL,
+        trial_timeout: float = TRIAL_TIMEOUT,
+    ):
+        self.instances = {url: InstanceHealth(url) for url in instances}
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.probe_interval = probe_interval
+        self.trial_timeout = trial_timeout
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def ordered(self) -> List[str]:
+        """
+        Instâncias disponíveis, da mais saudável para a menos saudável. Uma
+        instância half-open vai para um único chamador por vez (a tentativa de
+        teste); os demais a pulam até o resultado chegar ou o teste expirar.
+        """
+        now = time.monotonic()
+        available = []
+        for health in self.instances.values():
+            if health.state == OPEN:
+                if now - health.opened_at < self.open_seconds:
+                    continue
+                # Cooldown terminou: deixa passar uma tentativa
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN:
+                if health.trial_started_at is not None and now - health.trial_started_at < self.trial_timeout:
+                    continue
+                health.trial_started_at = now
+            available.append(health)
+        available.sort(key=lambda h: h.score(), reverse=True)
+        return [h.url for h in available]
+
+    def record_success(self, url: str, latency: float):
+        health = self.instances.get(url)
+        if health is None:
+            return
+        health.total_requests += 1
+        health.latencies.append(latency)
+        health.outcomes.append(1)
+        health.consecutive_failures = 0
+        health.state = CLOSED
+        health.trial_started_at = None
+        health.last_success_at = time.time()
+
+    def record_failure(self, url: str, error: BaseException, latency: Optional[float] = None):
+        health = self.instances.get(url)
+        if health is None:
+            return
+        health.total_requests += 1
+        if latency is not None:
+            health.latencies.append(latency)
+        health.outcomes.append(0)
+        health.consecutive_failures += 1
+        health.last_error = str(error) or error.__class__.__name__
+        health.last_failure_at = time.time()
+        health.trial_started_at = None
+        if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+            if health.state != OPEN:
+                print(f"Invidious circuit opened for {url}: {health.last_error}")
+            health.state = OPEN
+            health.opened_at = time.monotonic()
+
+    # Sondagem em background
+
+    async def _probe(self, get, url: str):
+        started = time.monotonic()
+        try:
+            r = await get(f"{url}/api/v1/stats", timeout=PROBE_TIMEOUT)
+            if r.status_code != 200:
+                raise RuntimeError(f"HTTP {r.status_code}")
+            health = self.instances[url]
+            # Recuperou: volta para half-open, a próxima requisição real decide
+            health.state = HALF_OPEN
+            health.trial_started_at = None
+            health.latencies.append(time.monotonic() - started)
+        except Exception as e:
+            health = self.instances[url]
+            health.last_error = str(e) or e.__class__.__name__
+            health.opened_at = time.monotonic()
+
+    async def probe_loop(self, get):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            broken = [h.url for h in self.instances.values() if h.state == OPEN]
+            if broken:
+                await asyncio.gather(*(self._probe(get, url) for url in broken), return_exceptions=True)
+
+    def start_probing(self, get):
+        """`get(url, **kwargs)` assíncrono; o mesmo GET limitado das requisições reais."""
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self.probe_loop(get))
+
+    async def stop_probing(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def snapshot(self) -> dict:
+        instances = sorted(
+            (h.snapshot() for h in self.instances.values()),
+            key=lambda s: s["score"],
+            reverse=True,
+        )
+        return {
+            "failure_threshold": self.failure_threshold,
+            "open_seconds": self.open_seconds,
+            "probe_interval": self.probe_interval,
+            "instances": instances,
+        }
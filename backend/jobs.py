@@ -0,0 +1,353 @@
+"""
+Fila de jobs em background (transcrição e resumo).
+
+Em vez de segurar a conexão HTTP aberta enquanto as fontes lentas respondem,
+o cliente cria um job, recebe o ID na hora e depois consulta o status (ou
+assina os eventos via SSE). O estado fica num SQLite local, então jobs na fila
+sobrevivem a um restart.
+
+Os workers são tasks asyncio; o trabalho bloqueante dos handlers já roda no
+executor compartilhado (`sources.run_blocking`). Todo acesso ao SQLite (e o
+json.dumps dos resultados) passa por uma thread própria da fila, em ordem de
+chegada, nunca pelo event loop. Falhas temporárias são repetidas com backoff
+exponencial; erros do cliente (4xx) falham direto.
+"""
+import asyncio
+import functools
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+DEFAULT_DB_PATH = os.environ.get(
+    "JOB_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db"),
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_BASE_DELAY = float(os.environ.get("JOB_RETRY_BASE_DELAY", 2.0))
+JOB_RETRY_MAX_DELAY = float(os.environ.get("JOB_RETRY_MAX_DELAY", 60.0))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 24 * 3600))
+JOB_PURGE_INTERVAL = float(os.environ.get("JOB_PURGE_INTERVAL", 10 * 60))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+Progress = Callable[[str], None]
+Handler = Callable[[dict, Progress], Awaitable[dict]]
+
+
+def retry_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter: ~base, ~2*base, ~4*base..."""
+    delay = min(JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class ConfigurationError(Exception):
+    """Servidor mal configurado (ex: falta uma chave de API): retentar não adianta."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    # URL inválida, legendas inexistentes, configuração etc. não mudam numa nova tentativa
+    if isinstance(exc, ConfigurationError):
+        return False
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500
+    return True
+
+
+def error_detail(exc: BaseException) -> dict:
+    if isinstance(exc, HTTPException):
+        return {"status_code": exc.status_code, "detail": exc.detail}
+    if isinstance(exc, ConfigurationError):
+        return {"status_code": 503, "detail": str(exc)}
+    return {"status_code": 500, "detail": str(exc)}
+
+
+class JobStore:
+    """Estado dos jobs no SQLite (parâmetros, status, tentativas e resultado)."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                run_after REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, updated_at);
+            """
+        )
+
+    def insert(self, kind: str, params: dict, priority: int, max_attempts: int) -> dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO jobs (id, kind, params, priority, status, max_attempts, created_at, updated_at, run_after)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, kind, json.dumps(params), priority, QUEUED, max_attempts, now, now, now),
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        for name in ("result", "error"):
+            if fields.get(name) is not None:
+                fields[name] = json.dumps(fields[name], ensure_ascii=False)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        for name in ("result", "error"):
+            if job[name] is not None:
+                job[name] = json.loads(job[name])
+        return job
+
+    def pending(self) -> List[dict]:
+        """Jobs a retomar depois de um restart (os que estavam rodando voltam para a fila)."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            ids = [row[0] for row in self._db.execute("SELECT id FROM jobs WHERE status = ?", (QUEUED,))]
+        return [self.get(job_id) for job_id in ids]
+
+    def purge(self, ttl: int = JOB_RESULT_TTL) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at <= ?",
+                (*FINISHED, time.time() - ttl),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class JobQueue:
+    def __init__(
+        self,
+        handlers: Dict[str, Handler],
+        store: Optional[JobStore] = None,
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        self.handlers = handlers
+        self.store = store if store is not None else JobStore()
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        # Uma thread só: as escritas (status, progresso, resultado) não trocam de ordem
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self._tasks: List[asyncio.Task] = []
+        self._timers: List[asyncio.TimerHandle] = []
+        self._changed: Dict[str, asyncio.Event] = {}
+        # Desempate FIFO entre jobs de mesma prioridade
+        self._seq = itertools.count()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "purged": 0}
+
+    async def _store(self, method: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    # Ciclo de vida
+
+    async def start(self, purge_interval: float = JOB_PURGE_INTERVAL):
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        for job in await self._store(self.store.pending):
+            self._enqueue(job, max(0.0, job["run_after"] - time.time()))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop(purge_interval)))
+
+    async def _purge_loop(self, interval: float):
+        # Jobs terminados guardam a transcrição inteira: não esperar um restart para apagar
+        while True:
+            try:
+                self.stats["purged"] += await self._store(self.store.purge)
+            except sqlite3.Error as e:
+                print(f"Job purge failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def stop(self):
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Espera as escritas pendentes (ex: jobs interrompidos voltando para a fila)
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    # API pública
+
+    async def submit(self, kind: str, params: dict, priority: int = 0) -> dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await self._store(self.store.insert, kind, params, priority, self.max_attempts)
+        self.stats["submitted"] += 1
+        self._enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self._store(self.store.get, job_id)
+
+    async def watch(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[dict]:
+        """Estado do job a cada mudança, até terminar (repete o último a cada `heartbeat`)."""
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield job
+            if job["status"] in FINISHED:
+                return
+            event = self._changed.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                pass
+
+    def info(self) -> dict:
+        """Síncrono (lê o SQLite): no FastAPI, chamar pelo executor."""
+        return dict(
+            self.stats,
+            workers=self.workers,
+            queued=self._queue.qsize() if self._queue is not None else 0,
+            delayed=len(self._timers),
+            jobs=self.store.counts(),
+        )
+
+    # Internos
+
+    def _enqueue(self, job: dict, delay: float = 0.0):
+        # PriorityQueue entrega o menor primeiro: prioridade maior sai antes
+        item = (-job["priority"], next(self._seq), job["id"])
+        if self._queue is None:
+            return  # ainda não iniciado; `start()` retoma os jobs pendentes do SQLite
+        if delay <= 0:
+            self._queue.put_nowait(item)
+            return
+
+        def release():
+            self._timers.remove(timer)
+            self._queue.put_nowait(item)
+
+        timer = asyncio.get_running_loop().call_later(delay, release)
+        self._timers.append(timer)
+
+    def _notify(self, job_id: str):
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _progress_reporter(self, job_id: str) -> Progress:
+        # Handlers reportam progresso do event loop ou de dentro do executor. A
+        # escrita entra na fila da thread do SQLite na hora, então nunca passa
+        # na frente do status final gravado depois que o handler retorna
+        loop = asyncio.get_running_loop()
+
+        def report(message: str):
+            future = self._executor.submit(self.store.update, job_id, progress=message)
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._notify, job_id))
+
+        return report
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        attempts = job["attempts"] + 1
+        await self._store(self.store.update, job_id, status=RUNNING, attempts=attempts)
+        self._notify(job_id)
+
+        handler = self.handlers[job["kind"]]
+        try:
+            result = await handler(job["params"], self._progress_reporter(job_id))
+        except asyncio.CancelledError:
+            # Desligamento: o job volta para a fila e é retomado no próximo start.
+            # Direto, sem o executor: a task já foi cancelada e não pode mais esperar
+            self._executor.submit(self.store.update, job_id, status=QUEUED)
+            raise
+        except Exception as e:
+            if is_retryable(e) and attempts < job["max_attempts"]:
+                delay = retry_delay(attempts)
+                self.stats["retries"] += 1
+                await self._store(
+                    self.store.update, job_id, status=QUEUED, error=error_detail(e), run_after=time.time() + delay
+                )
+                self._enqueue(job, delay)
+            else:
+                self.stats["failed"] += 1
+                await self._store(self.store.update, job_id, status=FAILED, error=error_detail(e))
+        else:
+            self.stats["completed"] += 1
+            await self._store(self.store.update, job_id, status=DONE, result=result, error=None, progress=None)
+        self._notify(job_id)
+
+
+def public_view(job: dict, include_result: bool = True) -> dict:
+    view = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if include_result and job["status"] == DONE:
+        view["result"] = job["result"]
+    return view
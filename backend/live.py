@@ -0,0 +1,367 @@
+"""
+Atualização incremental de transcrições de lives e vídeos recém-publicados.
+
+As legendas automáticas desses vídeos continuam crescendo (e as últimas falas
+às vezes são reescritas). Em vez de refazer toda a cadeia de fontes, cada
+vídeo acompanhado guarda a URL do arquivo de legenda bruto, o ETag e o ponto
+do arquivo onde começa o último evento já visto:
+
+- a nova versão é baixada com If-None-Match/If-Modified-Since (304 = nada novo)
+- se o começo do arquivo não mudou, só o trecho a partir do último evento é
+  parseado (json3 e WebVTT); senão o arquivo inteiro é parseado e comparado
+- os segmentos novos substituem os antigos a partir do primeiro início
+  diferente, e a diferença vai para os inscritos via SSE
+
+O intervalo entre consultas se ajusta à velocidade de crescimento: mira em
+LIVE_TARGET_SEGMENTS segmentos novos por consulta e vai recuando enquanto
+nada muda. Sem crescimento por LIVE_IDLE_TIMEOUT, a live é dada como encerrada.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from typing import AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+import metrics
+import sources
+from subtitles import Transcript, detect_format, parse
+from subtitles.tail import first_difference, merge_tail, parse_tail, resume_offset
+
+LIVE_INITIAL_INTERVAL = float(os.environ.get("LIVE_INITIAL_INTERVAL", 15))
+LIVE_MIN_INTERVAL = float(os.environ.get("LIVE_MIN_INTERVAL", 5))
+LIVE_MAX_INTERVAL = float(os.environ.get("LIVE_MAX_INTERVAL", 120))
+LIVE_BACKOFF = float(os.environ.get("LIVE_BACKOFF", 1.5))
+LIVE_TARGET_SEGMENTS = float(os.environ.get("LIVE_TARGET_SEGMENTS", 5))
+LIVE_IDLE_TIMEOUT = float(os.environ.get("LIVE_IDLE_TIMEOUT", 30 * 60))
+LIVE_MAX_WATCHES = int(os.environ.get("LIVE_MAX_WATCHES", 50))
+LIVE_SUBSCRIBER_QUEUE = int(os.environ.get("LIVE_SUBSCRIBER_QUEUE", 100))
+# Estado de vídeos só com refresh avulso (sem inscritos) é mantido por este tempo
+LIVE_WATCH_TTL = float(os.environ.get("LIVE_WATCH_TTL", 10 * 60))
+
+Key = Tuple[str, Optional[str]]
+
+
+def http_error(exc: Exception) -> Optional[HTTPException]:
+    """Erro de upstream como resposta HTTP (None = erro inesperado, propaga)."""
+    if isinstance(exc, HTTPException):
+        return exc
+    if isinstance(exc, sources.TranscriptUnavailable):
+        return HTTPException(status_code=404, detail=str(exc))
+    if isinstance(exc, (httpx.HTTPError, ValueError)):
+        # ValueError: arquivo de legenda malformado (JSON inválido, formato desconhecido)
+        return HTTPException(status_code=502, detail=f"Caption refresh failed: {exc}")
+    return None
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def next_interval(current: float, added: int, elapsed: float) -> float:
+    if added > 0 and elapsed > 0:
+        # Intervalo que traria ~LIVE_TARGET_SEGMENTS por consulta, suavizado com o atual
+        target = LIVE_TARGET_SEGMENTS * elapsed / added
+        interval = (current + target) / 2
+    else:
+        interval = current * LIVE_BACKOFF
+    return min(LIVE_MAX_INTERVAL, max(LIVE_MIN_INTERVAL, interval))
+
+
+class LiveWatch:
+    """Estado de um vídeo acompanhado."""
+
+    def __init__(self, video_id: str, url: str, language: Optional[str]):
+        self.video_id = video_id
+        self.url = url
+        self.language = language
+        self.transcript = Transcript.empty()
+        self.source: Optional[str] = None
+        self.version = 0
+        # Arquivo bruto
+        self.caption_url: Optional[str] = None
+        self.fmt: Optional[str] = None
+        self.headers: dict = {}
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.offset: Optional[int] = None
+        self.prefix_digest: Optional[bytes] = None
+        # Falha da carga inicial, repassada a quem estava esperando por ela
+        self.error: Optional[BaseException] = None
+        # Agendamento
+        self.interval = LIVE_INITIAL_INTERVAL
+        self.polled_at = time.monotonic()
+        self.grew_at = time.monotonic()
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    def result(self) -> dict:
+        return {"video_id": self.video_id, "source": self.source, "transcript": self.transcript}
+
+    def snapshot_event(self) -> dict:
+        return {
+            "video_id": self.video_id,
+            "language": self.language,
+            "source": self.source,
+            "version": self.version,
+            "segment_count": len(self.transcript),
+            "segments": self.transcript.to_dicts(),
+        }
+
+    def info(self) -> dict:
+        return {
+            "video_id": self.video_id,
+            "language": self.language,
+            "segments": len(self.transcript),
+            "version": self.version,
+            "interval": round(self.interval, 1),
+            "subscribers": len(self.subscribers),
+            "idle_for": round(time.monotonic() - self.grew_at, 1),
+        }
+
+
+class LiveRefresher:
+    def __init__(self, on_update: Callable[[Key, dict], None], on_finish: Callable[[Key, dict], None]):
+        # on_update a cada mudança; on_finish quando o acompanhamento termina
+        # (para gravar no índice de busca/arquivo)
+        self.on_update = on_update
+        self.on_finish = on_finish
+        self._watches: Dict[Key, LiveWatch] = {}
+        self.stats = {"polls": 0, "not_modified": 0, "tail_parses": 0, "full_parses": 0, "changes": 0, "errors": 0, "ended": 0}
+
+    async def _watch(self, video_id: str, url: str, language: Optional[str]) -> LiveWatch:
+        key = (video_id, language)
+        self._expire()
+        watch = self._watches.get(key)
+        if watch is None:
+            if len(self._watches) >= LIVE_MAX_WATCHES:
+                raise HTTPException(status_code=503, detail="Too many live transcripts being watched")
+            watch = self._watches[key] = LiveWatch(video_id, url, language)
+            # Quem criou faz a carga inicial segurando o lock (adquirido sem
+            # ceder o loop, então ninguém passa na frente); os demais esperam
+            async with watch.lock:
+                try:
+                    await self._seed(watch)
+                except BaseException as e:
+                    watch.error = e
+                    if self._watches.get(key) is watch:
+                        del self._watches[key]
+                    raise
+            return watch
+
+        async with watch.lock:
+            pass
+        if watch.error is not None:
+            raise watch.error
+        return watch
+
+    async def _seed(self, watch: LiveWatch):
+        """
+        Estado inicial a partir do mesmo arquivo bruto que os refreshes vão
+        baixar: assim a primeira comparação não é contra uma transcrição de
+        outra fonte (com outros tempos) e o offset já fica registrado.
+        """
+        r = await self._download(watch)
+        watch.etag = r.headers.get("ETag")
+        watch.last_modified = r.headers.get("Last-Modified")
+        _, transcript, _ = await sources.run_blocking(self._apply, watch, r.content)
+        if not transcript:
+            raise sources.TranscriptUnavailable("Legenda vazia ou sem eventos")
+        watch.transcript = transcript
+        self.stats["full_parses"] += 1
+
+    # Consulta
+
+    async def _download(self, watch: LiveWatch):
+        if watch.caption_url is None:
+            watch.source, watch.caption_url, watch.fmt, watch.headers = await sources.resolve_caption_url(
+                watch.video_id, watch.url, watch.language
+            )
+            watch.etag = watch.last_modified = watch.offset = watch.prefix_digest = None
+        headers = dict(watch.headers)
+        if watch.etag:
+            headers["If-None-Match"] = watch.etag
+        if watch.last_modified:
+            headers["If-Modified-Since"] = watch.last_modified
+        r = await sources.limited_get(watch.caption_url, headers=headers)
+        if r.status_code in (403, 404, 410):
+            # URL assinada expirou: resolve de novo na próxima consulta
+            sources.caption_metadata.invalidate("ytdlp", watch.video_id)
+            watch.caption_url = None
+        r.raise_for_status()
+        return r
+
+    def _apply(self, watch: LiveWatch, body: bytes) -> Tuple[str, Optional[Transcript], int]:
+        """Roda no executor: parse parcial ou completo. Retorna (modo, nova transcrição, replace_from)."""
+        fmt = watch.fmt = watch.fmt or detect_format(body)
+        if (
+            watch.offset is not None
+            and len(body) > watch.offset
+            and _digest(body[:watch.offset]) == watch.prefix_digest
+        ):
+            mode = "tail"
+            tail = parse_tail(body[watch.offset:], fmt)
+            merged, replace_from = merge_tail(watch.transcript, tail) if tail else (watch.transcript, len(watch.transcript))
+        else:
+            mode = "full"
+            merged = Transcript.from_segments(parse(body, fmt))
+            replace_from = first_difference(watch.transcript, merged)
+
+        watch.offset = resume_offset(body, fmt)
+        watch.prefix_digest = _digest(body[:watch.offset]) if watch.offset is not None else None
+        if replace_from == len(merged) == len(watch.transcript):
+            return mode, None, replace_from
+        return mode, merged, replace_from
+
+    async def poll(self, watch: LiveWatch) -> Optional[dict]:
+        """Uma consulta; devolve o evento de delta, ou None se nada mudou."""
+        async with watch.lock:
+            self.stats["polls"] += 1
+            now = time.monotonic()
+            elapsed, watch.polled_at = now - watch.polled_at, now
+            before = len(watch.transcript)
+            try:
+                with metrics.stage("live_poll", watch.fmt or ""):
+                    r = await self._download(watch)
+                    if r.status_code == 304:
+                        self.stats["not_modified"] += 1
+                        mode, merged, replace_from = "not_modified", None, before
+                    else:
+                        watch.etag = r.headers.get("ETag")
+                        watch.last_modified = r.headers.get("Last-Modified")
+                        mode, merged, replace_from = await sources.run_blocking(self._apply, watch, r.content)
+                        self.stats[f"{mode}_parses"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Live refresh failed for {watch.video_id}: {e}")
+                watch.interval = next_interval(watch.interval, 0, elapsed)
+                raise
+
+            added = len(merged) - before if merged is not None else 0
+            watch.interval = next_interval(watch.interval, added, elapsed)
+            if merged is None:
+                return None
+
+            watch.transcript = merged
+            watch.version += 1
+            if added > 0:
+                watch.grew_at = now
+            self.stats["changes"] += 1
+            self.on_update((watch.video_id, watch.language), watch.result())
+            return {
+                "version": watch.version,
+                "mode": mode,
+                "replace_from": replace_from,
+                "segments": merged.slice(replace_from, len(merged)).to_dicts(),
+                "segment_count": len(merged),
+                "next_poll": round(watch.interval, 1),
+            }
+
+    async def refresh(self, video_id: str, url: str, language: Optional[str]) -> dict:
+        """Refresh avulso (sem inscrição): consulta uma vez e devolve o delta."""
+        try:
+            watch = await self._watch(video_id, url, language)
+            delta = await self.poll(watch)
+        except Exception as e:
+            error = http_error(e)
+            if error is None:
+                raise
+            raise error from e
+        if delta is not None:
+            self._publish(watch, "delta", delta)
+        return delta or {"version": watch.version, "segment_count": len(watch.transcript), "next_poll": round(watch.interval, 1)}
+
+    # Inscritos
+
+    def _publish(self, watch: LiveWatch, event: str, payload: Optional[dict]):
+        for q in list(watch.subscribers):
+            try:
+                q.put_nowait((event, payload))
+            except asyncio.QueueFull:
+                # Inscrito atrasado: descarta a fila e manda uma foto completa
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(("snapshot", None))
+
+    async def subscribe(self, video_id: str, url: str, language: Optional[str], heartbeat: float = 15.0) -> AsyncIterator[Tuple[str, dict]]:
+        """Foto completa, depois os deltas, até a live encerrar ou o cliente sair."""
+        try:
+            watch = await self._watch(video_id, url, language)
+        except Exception as e:
+            error = http_error(e)
+            if error is None:
+                raise
+            yield "error", {"status_code": error.status_code, "detail": error.detail}
+            return
+        q: asyncio.Queue = asyncio.Queue(maxsize=LIVE_SUBSCRIBER_QUEUE)
+        watch.subscribers.add(q)
+        if watch.task is None:
+            watch.task = asyncio.ensure_future(self._run(watch))
+        try:
+            yield "snapshot", watch.snapshot_event()
+            while True:
+                try:
+                    event, payload = await asyncio.wait_for(q.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield "heartbeat", {"version": watch.version, "next_poll": round(watch.interval, 1)}
+                    continue
+                if event == "snapshot":
+                    payload = watch.snapshot_event()
+                yield event, payload
+                if event == "ended":
+                    return
+        finally:
+            watch.subscribers.discard(q)
+
+    async def _run(self, watch: LiveWatch):
+        try:
+            while watch.subscribers:
+                await asyncio.sleep(watch.interval)
+                if not watch.subscribers:
+                    break
+                try:
+                    delta = await self.poll(watch)
+                except Exception as e:
+                    # A live continua sendo acompanhada; os inscritos ficam sabendo da falha
+                    error = http_error(e) or HTTPException(status_code=500, detail=str(e))
+                    self._publish(watch, "error", {"status_code": error.status_code, "detail": error.detail, "next_poll": round(watch.interval, 1)})
+                    continue
+                if delta is not None:
+                    self._publish(watch, "delta", delta)
+                if time.monotonic() - watch.grew_at > LIVE_IDLE_TIMEOUT:
+                    self.stats["ended"] += 1
+                    self._publish(watch, "ended", {"version": watch.version, "segment_count": len(watch.transcript)})
+                    break
+        finally:
+            watch.task = None
+            # Continua disponível para refresh avulso até expirar, exceto se a live acabou
+            if time.monotonic() - watch.grew_at > LIVE_IDLE_TIMEOUT:
+                self._finish(watch)
+
+    def _expire(self):
+        now = time.monotonic()
+        for watch in list(self._watches.values()):
+            if watch.task is None and not watch.subscribers and now - watch.polled_at > LIVE_WATCH_TTL:
+                self._finish(watch)
+
+    def _finish(self, watch: LiveWatch):
+        key = (watch.video_id, watch.language)
+        if self._watches.get(key) is watch:
+            del self._watches[key]
+            if watch.version:
+                self.on_finish(key, watch.result())
+
+    async def stop(self):
+        tasks = [watch.task for watch in self._watches.values() if watch.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for watch in list(self._watches.values()):
+            self._finish(watch)
+
+    def snapshot(self) -> dict:
+        self._expire()
+        return dict(self.stats, watching=[watch.info() for watch in self._watches.values()])
@@ -0,0 +1,35 @@
+"""
+Pool de clientes LLM (compatíveis com a API da OpenAI) por processo.
+
+Criar um `OpenAI(...)` a cada clique refaz o pool de conexões HTTP e o
+handshake TLS; aqui cada (base_url, api_key) tem um único cliente reaproveitado
+entre reruns do Streamlit e requisições do FastAPI.
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from openai import OpenAI
+
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 120))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+
+_clients: Dict[Tuple[str, str], OpenAI] = {}
+_lock = threading.Lock()
+
+
+def get_llm_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    key = (base_url or LLM_BASE_URL, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = OpenAI(
+                    base_url=key[0],
+                    api_key=api_key,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=LLM_MAX_RETRIES,
+                )
+    return client
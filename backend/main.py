@@ -1,10 +1,66 @@
-from fastapi import FastAPI, HTTPException, Query
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from pydantic import BaseModel
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from typing import List, Optional
 
-app = FastAPI()
+from cache import NegativeEntry, get_cache
+import archive
+import batch
+import exports
+import jobs
+import live
+import metrics
+import prefetch
+import summarizer
+from llm import get_llm_client
+from search_index import SearchIndex
+import sources
+import streaming
+from singleflight import SingleFlight
+from strategy import AllSourcesFailed, SourceSpec, run_strategy, source_timeout
+from subtitles import IndexCache
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sources.invidious_pool.start_probing(sources.limited_get)
+    sources.warm_up()
+    transcript_cache.start()
+    search_index.start()
+    if transcript_archive is not None:
+        transcript_archive.start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await prefetcher.stop()
+    await live_refresher.stop()
+    search_index.stop()
+    transcript_cache.stop()
+    if transcript_archive is not None:
+        transcript_archive.close()
+    await sources.invidious_pool.stop_probing()
+    await sources.close_http_client()
+    sources.shutdown_executor()
+    sources.ytdlp_pool.close()
+
+app = FastAPI(lifespan=lifespan)
+transcript_cache = get_cache()
+# Requisições simultâneas para o mesmo vídeo compartilham uma única busca upstream
+inflight = SingleFlight()
+# Índices de busca dos vídeos consultados recentemente
+transcript_indexes = IndexCache()
+# Busca entre vídeos: alimentada em background a cada transcrição nova
+search_index = SearchIndex()
+# Arquivos exportados (já comprimidos), endereçados pelo ETag
+export_cache = exports.ExportCache()
+# Arquivo compactado de longo prazo, alimentado em background (TRANSCRIPT_ARCHIVE=0 desliga)
+transcript_archive = archive.TranscriptArchive() if archive.ARCHIVE_ENABLED else None
 
 # Allow CORS for development
 app.add_middleware(
@@ -15,9 +71,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    # Em respostas em streaming a latência medida é até o início do corpo
+    trace = metrics.start_trace(f"{request.method} {request.url.path}", force=request.headers.get("x-trace") == "1")
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        duration = time.perf_counter() - started
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_SECONDS.observe(duration, method=request.method, route=route, status=status)
+        if trace is not None:
+            metrics.finish_trace(trace, duration, status)
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
 class VideoRequest(BaseModel):
     url: str
     language: Optional[str] = None
+    # "ndjson" ou "sse" para receber os segmentos em streaming
+    stream: Optional[str] = None
+    # Padrão: incluído na resposta JSON, omitido no streaming
+    include_full_text: Optional[bool] = None
+    layout: str = "segments"
+    # /check-video: já busca em background as legendas mais prováveis (padrão: PREFETCH_ON_CHECK_VIDEO)
+    prefetch: Optional[bool] = None
+
+class SummaryRequest(BaseModel):
+    url: str
+    language: Optional[str] = None
+    model: Optional[str] = None
+
+class JobRequest(BaseModel):
+    # "transcript" ou "summary"
+    kind: str = "transcript"
+    url: str
+    language: Optional[str] = None
+    # Maior = processado antes
+    priority: int = 0
+    model: Optional[str] = None
+    include_full_text: bool = True
+    layout: str = "segments"
+
+class BatchRequest(BaseModel):
+    video_ids: List[str] = []
+    urls: List[str] = []
+    # URL de playlist ou canal (expandida via yt-dlp)
+    playlist_url: Optional[str] = None
+    language: Optional[str] = None
+    format: str = "ndjson"
+    max_concurrency: Optional[int] = None
+    include_full_text: bool = False
+    layout: str = "segments"
 
 def extract_video_id(url: str) -> str:
     # Supports standard https://www.youtube.com/watch?v=VIDEO_ID and https://youtu.be/VIDEO_ID
@@ -27,266 +136,663 @@ def extract_video_id(url: str) -> str:
         return url.split("youtu.be/")[1].split("?")[0]
     return ""
 
+def parse_time_param(value: str) -> float:
+    # Aceita segundos ("720", "720.5") ou relógio ("12:00", "1:02:03")
+    try:
+        if ":" not in value:
+            return float(value)
+        seconds = 0.0
+        for part in value.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {value}")
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+async def cache_get(video_id: str, language: Optional[str], source: str):
+    """Memória direto no event loop; a camada SQLite só no executor."""
+    cached = transcript_cache.get(video_id, language, source, memory_only=True)
+    if cached is None:
+        cached = await sources.run_blocking(transcript_cache.get, video_id, language, source)
+    return cached
+
+def raise_if_cached(cached):
+    if isinstance(cached, NegativeEntry):
+        raise HTTPException(status_code=cached.status_code, detail=cached.detail)
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "YouTube Transcript API is running"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    return transcript_cache.stats()
+
+def collect_app_stats():
+    """Estatísticas que os módulos já mantêm, expostas no /metrics."""
+    cache = transcript_cache.stats()
+    yield "yt_cache_lookups_total", "counter", "Consultas ao cache de transcrições por resultado.", [
+        ({"result": "memory_hit"}, cache["memory_hits"]),
+        ({"result": "disk_hit"}, cache["disk_hits"]),
+        ({"result": "miss"}, cache["misses"]),
+    ]
+    yield "yt_cache_negative_hits_total", "counter", "Hits em erros cacheados.", [({}, cache["negative_hits"])]
+    yield "yt_cache_hit_ratio", "gauge", "Fração das consultas ao cache que foram hits.", [({}, cache["hit_ratio"])]
+    yield "yt_cache_entries", "gauge", "Entradas no cache por camada.", [
+        ({"tier": "memory"}, cache["memory_entries"]),
+        ({"tier": "disk"}, cache.get("disk_entries", 0)),
+    ]
+    yield "yt_cache_write_queue", "gauge", "Gravações do cache esperando a thread de disco.", [({}, cache.get("write_queue", 0))]
+    yield "yt_cache_write_failures_total", "counter", "Gravações do cache em disco descartadas ou com erro.", [
+        ({"reason": "dropped"}, cache["write_dropped"]),
+        ({"reason": "error"}, cache["write_errors"]),
+    ]
+
+    flights = inflight.stats()
+    yield "yt_singleflight_requests_total", "counter", "Requisições coalescidas (leader = fez a busca upstream).", [
+        ({"role": "leader"}, flights["leaders"]),
+        ({"role": "follower"}, flights["followers"]),
+    ]
+    yield "yt_singleflight_inflight", "gauge", "Buscas upstream em andamento.", [({}, flights["inflight"])]
+
+    pool = sources.invidious_pool.snapshot()["instances"]
+    yield "yt_invidious_instance_score", "gauge", "Pontuação de saúde de cada instância Invidious.", [
+        ({"instance": i["url"], "state": i["state"]}, i["score"]) for i in pool
+    ]
+
+    limiter = sources.upstream_limiter.snapshot()
+    yield "yt_upstream_rate", "gauge", "Taxa atual permitida por host upstream (req/s).", [
+        ({"host": host}, bucket["rate"]) for host, bucket in limiter["hosts"].items()
+    ]
+    yield "yt_upstream_throttled_total", "counter", "Respostas 429 recebidas por host upstream.", [
+        ({"host": host}, bucket["throttled"]) for host, bucket in limiter["hosts"].items()
+    ]
+    yield "yt_upstream_wait_seconds_total", "counter", "Tempo total esperando o limitador de taxa.", [({}, limiter["waited_seconds"])]
+
+    queue = job_queue.info()
+    yield "yt_jobs_total", "counter", "Jobs em background por evento.", [
+        ({"event": event}, queue[event]) for event in ("submitted", "completed", "failed", "retries")
+    ]
+    yield "yt_jobs", "gauge", "Jobs no SQLite por status.", [
+        ({"status": status}, count) for status, count in queue["jobs"].items()
+    ]
+
+    metadata = sources.caption_metadata.snapshot()
+    yield "yt_caption_metadata_lookups_total", "counter", "Consultas ao cache de metadados de legendas.", [
+        ({"result": "hit"}, metadata["hits"]),
+        ({"result": "miss"}, metadata["misses"]),
+    ]
+
+    prefetched = prefetcher.snapshot()
+    yield "yt_prefetch_total", "counter", "Prefetch especulativo por resultado (hits/joined = usados, wasted = expiraram sem uso).", [
+        ({"result": result}, prefetched[result])
+        for result in ("scheduled", "completed", "failed", "skipped", "hits", "joined", "wasted", "cancelled")
+    ]
+    yield "yt_prefetch_hit_ratio", "gauge", "Fração dos prefetches concluídos que foram usados.", [({}, prefetched["hit_rate"])]
+
+    refreshed = live_refresher.snapshot()
+    yield "yt_live_polls_total", "counter", "Consultas de refresh incremental por resultado.", [
+        ({"result": result}, refreshed[result])
+        for result in ("not_modified", "tail_parses", "full_parses", "errors")
+    ]
+    yield "yt_live_watching", "gauge", "Vídeos com refresh incremental ativo.", [({}, len(refreshed["watching"]))]
+
+    exported = export_cache.snapshot()
+    yield "yt_export_requests_total", "counter", "Exportações por resultado do cache.", [
+        ({"result": "hit"}, exported["hits"]),
+        ({"result": "miss"}, exported["misses"]),
+        ({"result": "not_modified"}, exported["not_modified"]),
+    ]
+
+    search = search_index.info()
+    yield "yt_search_index_total", "counter", "Transcrições processadas pelo índice de busca.", [
+        ({"result": result}, search[result]) for result in ("indexed", "skipped", "dropped", "errors")
+    ]
+
+    if transcript_archive is not None:
+        archived = transcript_archive.info()
+        yield "yt_archive_writes_total", "counter", "Transcrições enviadas ao arquivo compactado por resultado.", [
+            ({"result": result}, archived[result]) for result in ("archived", "unchanged", "dropped", "errors")
+        ]
+        yield "yt_archive_bytes", "gauge", "Tamanho do arquivo de dados do arquivo compactado.", [({}, archived["bytes"])]
+
+metrics.registry.add_collector(collect_app_stats)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    text = await sources.run_blocking(metrics.registry.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+async def recent_traces(limit: int = Query(20, ge=1, le=metrics.TRACE_MAX_RECENT)):
+    traces = list(metrics.recent_traces)[-limit:]
+    return {"sample_rate": metrics.TRACE_SAMPLE_RATE, "traces": traces[::-1]}
+
+@app.get("/metrics/invidious")
+async def invidious_metrics():
+    return sources.invidious_pool.snapshot()
+
+@app.get("/metrics/extractors")
+async def extractor_metrics():
+    return {
+        "ytdlp_pool": sources.ytdlp_pool.snapshot(),
+        "caption_metadata": sources.caption_metadata.snapshot(),
+    }
+
+@app.get("/metrics/prefetch")
+async def prefetch_metrics():
+    return prefetcher.snapshot()
+
+@app.get("/metrics/live")
+async def live_metrics():
+    return live_refresher.snapshot()
+
+@app.get("/metrics/ratelimit")
+async def ratelimit_metrics():
+    return sources.upstream_limiter.snapshot()
+
 @app.post("/check-video")
-def check_video(request: VideoRequest):
+async def check_video(request: VideoRequest):
     video_id = extract_video_id(request.url)
     if not video_id:
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-    
+
+    cached = await cache_get(video_id, None, "languages")
+    raise_if_cached(cached)
+    if cached is not None:
+        result = cached
+    else:
+        result = await inflight.do((video_id, None, "languages"), lambda: fetch_languages(video_id))
+
+    if request.prefetch if request.prefetch is not None else prefetch.PREFETCH_ON_CHECK_VIDEO:
+        available = result["available_languages"]
+        languages = prefetch.likely_languages(request.language, available)
+        cached_keys = set()
+        for language in languages:
+            if await cache_get(video_id, language, "transcript") is not None:
+                cached_keys.add((video_id, language))
+        prefetcher.schedule(
+            video_id,
+            request.url,
+            languages,
+            lambda key: key in cached_keys,
+            prefetch.default_language(available),
+        )
+    return result
+
+async def fetch_languages(video_id: str):
     try:
-        api = YouTubeTranscriptApi()
-        transcript_list = api.list(video_id)
-        
-        languages = []
-        for t in transcript_list:
-            languages.append({
-                "code": t.language_code,
-                "name": t.language,
-                "is_generated": t.is_generated
-            })
-            
-        return {
+        languages = await sources.list_languages(video_id)
+        result = {
             "video_id": video_id,
             "available_languages": languages
         }
+        transcript_cache.set(video_id, None, "languages", result, ttl=6 * 3600)
+        return result
     except TranscriptsDisabled:
+        transcript_cache.set_negative(video_id, None, "languages", 400, "Transcripts are disabled for this video.")
         raise HTTPException(status_code=400, detail="Transcripts are disabled for this video.")
     except NoTranscriptFound:
+        transcript_cache.set_negative(video_id, None, "languages", 404, "No transcript found for this video.")
         raise HTTPException(status_code=404, detail="No transcript found for this video.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/transcript")
-def get_transcript(request: VideoRequest):
+async def get_transcript(request: VideoRequest):
     video_id = extract_video_id(request.url)
     if not video_id:
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
 
-    # Headers que simulam um navegador real para evitar bloqueios de IP
-    browser_headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Referer': 'https://www.youtube.com/',
+    if request.stream and request.stream not in streaming.STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid stream format. Use one of: {', '.join(streaming.STREAM_FORMATS)}")
+    if request.layout not in streaming.TRANSCRIPT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Invalid layout. Use one of: {', '.join(streaming.TRANSCRIPT_LAYOUTS)}")
+
+    result = await load_transcript(video_id, request.url, request.language)
+
+    if request.stream:
+        include_full_text = bool(request.include_full_text)
+        return StreamingResponse(
+            streaming.iter_transcript_stream(result, request.stream, request.layout, include_full_text),
+            media_type=streaming.MEDIA_TYPES[request.stream],
+            headers=streaming.STREAM_HEADERS,
+        )
+
+    include_full_text = request.include_full_text is None or request.include_full_text
+    with metrics.stage("serialize", request.layout):
+        return streaming.render_transcript(result, include_full_text, request.layout)
+
+async def load_transcript(video_id: str, url: str, language: Optional[str]):
+    """Cache -> prefetch do /check-video -> busca compartilhada (single-flight) -> fontes upstream."""
+    cached = await cache_get(video_id, language, "transcript")
+    raise_if_cached(cached)
+    if cached is not None:
+        return cached
+
+    prefetched = await prefetcher.claim(video_id, language)
+    if prefetched is not None:
+        store_transcript(video_id, language, prefetched)
+        return prefetched
+
+    return await inflight.do(
+        (video_id, language, "transcript"),
+        lambda: fetch_and_cache_transcript(video_id, url, language),
+    )
+
+async def fetch_and_cache_transcript(video_id: str, url: str, language: Optional[str]):
+    result = await fetch_transcript(video_id, url, language)
+    store_transcript(video_id, language, result)
+    return result
+
+def store_transcript(video_id: str, language: Optional[str], result: dict):
+    transcript_cache.set(video_id, language, "transcript", result)
+    search_index.submit(video_id, language, result.get("source"), result["transcript"])
+    if transcript_archive is not None:
+        transcript_archive.submit(video_id, language, result["transcript"], result.get("source"))
+
+FETCH_SOURCES = [s.strip() for s in os.environ.get("FETCH_SOURCES", "transcript_api,ytdlp,invidious").split(",") if s.strip()]
+
+def build_source_specs(video_id: str, url: str, language: Optional[str]) -> List[SourceSpec]:
+    # Ordem de preferência: método oficial -> yt-dlp com headers de navegador -> Invidious
+    factories = {
+        "transcript_api": (lambda: sources.fetch_from_transcript_api(video_id, language), 15.0),
+        "ytdlp": (lambda: sources.fetch_from_ytdlp(video_id, url, language), 20.0),
+        "invidious": (lambda: sources.fetch_from_invidious(video_id, language), 30.0),
     }
+    return [
+        SourceSpec(name, factories[name][0], source_timeout(name, factories[name][1]))
+        for name in FETCH_SOURCES
+        if name in factories
+    ]
 
-    # 1. Tentar método oficial (com headers injetados se possível pela lib)
+async def fetch_transcript(video_id: str, url: str, language: Optional[str]):
     try:
-        # A lib youtube-transcript-api infelizmente não permite passar headers customizados facilmente
-        # sem mexer no core, mas vamos tentar o básico primeiro.
-        api = YouTubeTranscriptApi()
-        languages_to_try = [request.language] if request.language else ['pt', 'en']
-        transcript_data_objects = api.fetch(video_id, languages=languages_to_try)
-        
-        transcript = [
-            {"text": e.text, "start": e.start, "duration": e.duration}
-            for e in transcript_data_objects
-        ]
-        
-        full_text = " ".join([t['text'] for t in transcript])
-        return {"video_id": video_id, "transcript": transcript, "full_text": full_text}
-
-    except Exception as e_primary:
-        print(f"Primary API failed: {e_primary}. Trying advanced fallback...")
-        
-        # 2. Fallback com yt-dlp e headers de navegador
+        source, transcript = await run_strategy(build_source_specs(video_id, url, language))
+        # full_text não vai para o cache: é derivado dos segmentos na hora da resposta
+        return {
+            "video_id": video_id,
+            "source": source,
+            "transcript": transcript,
+        }
+    except AllSourcesFailed as e:
+        for name, err in e.errors.items():
+            print(f"Source {name} failed: {err}")
+
+        # Legendas desativadas ou inexistentes é uma resposta definitiva do YouTube,
+        # não um bloqueio temporário: 404 e vai para o cache negativo
+        official = e.errors.get("transcript_api")
+        if isinstance(official, (TranscriptsDisabled, NoTranscriptFound)):
+            if isinstance(official, TranscriptsDisabled):
+                detail = "Transcripts are disabled for this video."
+            else:
+                detail = "No transcript found for this video."
+            transcript_cache.set_negative(video_id, language, "transcript", 404, detail)
+            raise HTTPException(status_code=404, detail=detail)
+
+        detail_msg = "O YouTube bloqueou o acesso vindo deste servidor cloud (Render/AWS)."
+        if e.deadline_exceeded:
+            detail_msg += " Tempo limite da requisição esgotado."
+        if any("429" in str(err) for err in e.errors.values()):
+            detail_msg += " Erro 429: Muitas requisições detectadas pelo YouTube."
+
+        detail = f"{detail_msg} Invidious Fail: {str(e.errors.get('invidious'))}"
+        raise HTTPException(status_code=500, detail=detail)
+
+# Buscas especulativas disparadas pelo /check-video (resultados ficam em memória por pouco tempo)
+# Pela mesma chave do single-flight: não duplica um /transcript já em andamento
+prefetcher = prefetch.Prefetcher(
+    lambda video_id, url, language: inflight.do(
+        (video_id, language, "transcript"),
+        lambda: fetch_transcript(video_id, url, language),
+    )
+)
+
+# Lives e vídeos recentes: cada mudança atualiza o cache; índice de busca e
+# arquivo só recebem a versão final, quando o acompanhamento termina
+live_refresher = live.LiveRefresher(
+    on_update=lambda key, result: transcript_cache.set(key[0], key[1], "transcript", result),
+    on_finish=lambda key, result: store_transcript(key[0], key[1], result),
+)
+
+@app.post("/transcripts/batch")
+async def get_transcripts_batch(request: BatchRequest):
+    if request.format not in streaming.STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(streaming.STREAM_FORMATS)}")
+    if request.layout not in streaming.TRANSCRIPT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Invalid layout. Use one of: {', '.join(streaming.TRANSCRIPT_LAYOUTS)}")
+
+    items = [(video_id, batch.watch_url(video_id)) for video_id in request.video_ids]
+    invalid_urls = []
+    for url in request.urls:
+        video_id = extract_video_id(url)
+        if video_id:
+            items.append((video_id, url))
+        else:
+            invalid_urls.append(url)
+
+    if request.playlist_url:
         try:
-            import yt_dlp
-            import requests
-
-            # Configurações do yt-dlp para parecer um navegador
-            ydl_opts = {
-                'skip_download': True,
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'quiet': True,
-                'no_warnings': True,
-                'user_agent': browser_headers['User-Agent'],
-                'referer': browser_headers['Referer'],
-                'nocheckcertificate': True,
+            playlist_ids = await batch.expand_playlist(request.playlist_url)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not read playlist/channel: {e}")
+        items.extend((video_id, batch.watch_url(video_id)) for video_id in playlist_ids)
+
+    if not items and not invalid_urls:
+        raise HTTPException(status_code=400, detail="No videos to fetch")
+    if len(items) > batch.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many videos (max {batch.BATCH_MAX_ITEMS})")
+
+    max_concurrency = min(request.max_concurrency or batch.BATCH_MAX_CONCURRENCY, batch.BATCH_MAX_CONCURRENCY)
+    fmt = request.format
+
+    async def events():
+        ok = errors = 0
+        for url in invalid_urls:
+            errors += 1
+            yield streaming.encode({"url": url, "status": "error", "status_code": 400, "detail": "Invalid YouTube URL"}, fmt, "item")
+        async for event in batch.run_batch(items, load_transcript, request.language, max(1, max_concurrency)):
+            if event["status"] == "ok":
+                ok += 1
+                event["result"] = streaming.render_transcript(event["result"], request.include_full_text, request.layout)
+            else:
+                errors += 1
+            yield streaming.encode(event, fmt, "item")
+        yield streaming.encode({"done": True, "total": ok + errors, "ok": ok, "errors": errors}, fmt, "done")
+
+    return StreamingResponse(events(), media_type=streaming.MEDIA_TYPES[fmt], headers=streaming.STREAM_HEADERS)
+
+@app.get("/transcript/{video_id}/range")
+async def get_transcript_range(
+    video_id: str,
+    start: str = Query("0"),
+    end: Optional[str] = Query(None),
+    language: Optional[str] = None,
+    include_full_text: bool = True,
+    layout: str = "segments",
+):
+    if layout not in streaming.TRANSCRIPT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Invalid layout. Use one of: {', '.join(streaming.TRANSCRIPT_LAYOUTS)}")
+    start_s = parse_time_param(start)
+    end_s = parse_time_param(end) if end is not None else float("inf")
+    if end_s < start_s:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+
+    result = await load_transcript(video_id, batch.watch_url(video_id), language)
+    sliced = dict(result, transcript=result["transcript"].slice_time(start_s, end_s))
+    body = streaming.render_transcript(sliced, include_full_text, layout)
+    body["range"] = {"start": start_s, "end": None if end is None else end_s}
+    return body
+
+@app.get("/archive/stats")
+async def archive_stats():
+    if transcript_archive is None:
+        raise HTTPException(status_code=404, detail="Transcript archive is disabled")
+    return await sources.run_blocking(transcript_archive.info)
+
+@app.get("/archive/{video_id}")
+async def get_archived_transcript(
+    video_id: str,
+    start: str = Query("0"),
+    end: Optional[str] = Query(None),
+    language: Optional[str] = None,
+    include_full_text: bool = True,
+    layout: str = "segments",
+):
+    """Transcrição (ou intervalo) lida só do arquivo, sem ir ao upstream."""
+    if transcript_archive is None:
+        raise HTTPException(status_code=404, detail="Transcript archive is disabled")
+    if layout not in streaming.TRANSCRIPT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Invalid layout. Use one of: {', '.join(streaming.TRANSCRIPT_LAYOUTS)}")
+    start_s = parse_time_param(start)
+    end_s = parse_time_param(end) if end is not None else float("inf")
+    if end_s < start_s:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+
+    try:
+        with metrics.stage("archive_read"):
+            if start_s <= 0 and end is None:
+                transcript = await sources.run_blocking(transcript_archive.get, video_id, language)
+            else:
+                transcript = await sources.run_blocking(transcript_archive.get_range, video_id, language, start_s, end_s)
+    except archive.ArchiveError as e:
+        raise HTTPException(status_code=500, detail=f"Archived transcript is unreadable: {e}")
+    if transcript is None:
+        raise HTTPException(status_code=404, detail="Transcript not archived")
+    body = streaming.render_transcript({"transcript": transcript, "source": "archive"}, include_full_text, layout)
+    body["range"] = {"start": start_s, "end": None if end is None else end_s}
+    return body
+
+@app.post("/transcript/{video_id}/refresh")
+async def refresh_transcript(video_id: str, language: Optional[str] = None):
+    """Busca só o que mudou desde o último refresh (lives e vídeos recentes)."""
+    return await live_refresher.refresh(video_id, batch.watch_url(video_id), language)
+
+@app.get("/transcript/{video_id}/live")
+async def live_transcript(video_id: str, language: Optional[str] = None):
+    """SSE: foto completa da transcrição, depois os deltas conforme ela cresce."""
+    updates = live_refresher.subscribe(video_id, batch.watch_url(video_id), language)
+    # Erros da carga inicial (vídeo sem legendas, limite de vídeos) viram resposta HTTP normal
+    first = await updates.__anext__()
+    if first[0] == "error":
+        await updates.aclose()
+        raise HTTPException(status_code=first[1]["status_code"], detail=first[1]["detail"])
+
+    async def events():
+        try:
+            yield streaming.sse_event(first[1], first[0])
+            async for event, payload in updates:
+                yield streaming.sse_event(payload, event)
+        finally:
+            await updates.aclose()
+
+    return StreamingResponse(events(), media_type=streaming.MEDIA_TYPES["sse"], headers=streaming.STREAM_HEADERS)
+
+@app.get("/transcript/{video_id}.{fmt}")
+async def export_transcript(
+    video_id: str,
+    fmt: str,
+    request: Request,
+    language: Optional[str] = None,
+    # Só para txt: "[HH:MM:SS] texto" em cada linha
+    timestamps: bool = False,
+    # Só para md: título do documento
+    title: Optional[str] = None,
+    download: bool = False,
+):
+    if fmt not in exports.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use one of: {', '.join(exports.EXPORT_FORMATS)}")
+
+    result = await load_transcript(video_id, batch.watch_url(video_id), language)
+    transcript = result["transcript"]
+
+    options, variant = {}, ""
+    if fmt == "txt" and timestamps:
+        options, variant = {"timestamps": True}, "-ts"
+    elif fmt == "md":
+        options = {"title": title, "url": batch.watch_url(video_id)}
+        variant = "-" + hashlib.sha256((title or "").encode("utf-8")).hexdigest()[:8] if title else ""
+
+    encoding = exports.negotiate_encoding(request.headers.get("accept-encoding"), transcript)
+    etag = exports.make_etag(video_id, transcript, fmt, variant, encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if download:
+        headers["Content-Disposition"] = f'attachment; filename="{video_id}{variant}.{fmt}"'
+
+    if exports.etag_matches(request.headers.get("if-none-match"), etag):
+        export_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    media_type = exports.EXPORT_FORMATS[fmt].media_type
+    cached = export_cache.get(etag)
+    if cached is not None:
+        return Response(cached[0], media_type=media_type, headers=headers)
+
+    def body():
+        # Gerador síncrono: o Starlette o consome num threadpool, fora do event loop
+        with metrics.stage("serialize", fmt):
+            yield from exports.render_stream(transcript, fmt, encoding, cache=export_cache, etag=etag, **options)
+
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+@app.get("/transcript/{video_id}/search")
+async def search_transcript(
+    video_id: str,
+    q: str = Query(..., min_length=1),
+    language: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    result = await load_transcript(video_id, batch.watch_url(video_id), language)
+    transcript = result["transcript"]
+    index = transcript_indexes.peek((video_id, language), transcript)
+    if index is None:
+        # Construir o índice percorre a transcrição inteira: fora do event loop
+        index = await sources.run_blocking(transcript_indexes.get, (video_id, language), transcript)
+    matches = index.search(q, limit)
+    return {
+        "video_id": video_id,
+        "query": q,
+        "total": len(matches),
+        "matches": [
+            {
+                "index": i,
+                "start": transcript.starts[i],
+                "duration": transcript.durations[i],
+                "timestamp": format_timestamp(transcript.starts[i]),
+                "text": transcript.text_at(i),
             }
-            
-            # Tentar usar cookies se o arquivo existir
-            import os
-            if os.path.exists("cookies.txt"):
-                print("Using cookies.txt for authentication")
-                ydl_opts['cookiefile'] = 'cookies.txt'
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Tenta extrair info com headers de navegador
-                info = ydl.extract_info(request.url, download=False)
-                
-                subs = info.get('automatic_captions') or info.get('subtitles')
-                if not subs:
-                    raise HTTPException(status_code=404, detail="Legendas não encontradas no YouTube (Fallback)")
-
-                # Lógica de seleção de idioma aprimorada
-                target_lang = request.language if request.language and request.language in subs else None
-                if not target_lang:
-                    # Prioridade: pt > en > qualquer um
-                    priority = ['pt', 'pt-BR', 'pt-PT', 'en']
-                    for p in priority:
-                        if p in subs:
-                            target_lang = p
-                            break
-                    if not target_lang:
-                        target_lang = list(subs.keys())[0]
-
-                # Pegar URL do formato JSON3
-                sub_tracks = subs[target_lang]
-                json3_track = next((t for t in sub_tracks if t.get('ext') == 'json3'), None)
-                
-                if not json3_track:
-                     raise HTTPException(status_code=404, detail="Formato JSON3 não disponível")
-
-                # Baixar o JSON da legenda usando os mesmos headers de navegador
-                session = requests.Session()
-                r = session.get(json3_track['url'], headers=browser_headers, timeout=10)
-                r.raise_for_status()
-                data = r.json()
-                
-                transcript = []
-                # Formato JSON3 do YouTube (Google)
-                for event in data.get('events', []):
-                    if 'segs' not in event: continue
-                    text = "".join([s.get('utf8', '') for s in event['segs']]).strip()
-                    if not text: continue
-                    
-                    transcript.append({
-                        "text": text,
-                        "start": event.get('tStartMs', 0) / 1000.0,
-                        "duration": event.get('dDurationMs', 0) / 1000.0
-                    })
-
-                if not transcript:
-                    raise HTTPException(status_code=404, detail="Legenda vazia ou sem eventos")
-
-                full_text = " ".join([t['text'] for t in transcript])
-                return {"video_id": video_id, "transcript": transcript, "full_text": full_text}
-
-        except Exception as e_fallback:
-             print(f"Fallback 1 failed: {e_fallback}. Trying Invidious fallback...")
-
-             # 3. Fallback com Invidious (Instâncias Públicas)
-             # Isso usa servidores de terceiros para buscar os dados, evitando nosso IP bloqueado.
-             try:
-                import requests
-                # Lista de instâncias públicas que costumam funcionar
-                # (Rotacionar se falhar)
-                invidious_instances = [
-                    "https://inv.tux.pizza",
-                    "https://invidious.projectsegfau.lt",
-                    "https://invidious.fdn.fr",
-                    "https://vid.puffyan.us",
-                    "https://invidious.jing.rocks"
-                ]
-
-                last_error = None
-                
-                for instance in invidious_instances:
-                    try:
-                        print(f"Trying Invidious instance: {instance}")
-                        # Endpoint de API do Invidious para pegar info do vídeo
-                        # (Algumas instâncias exigem ?local=true para não usar googlevideo direto proxy)
-                        api_url = f"{instance}/api/v1/videos/{video_id}"
-                        
-                        r = requests.get(api_url, timeout=10)
-                        if r.status_code != 200:
-                            continue
-                            
-                        data = r.json()
-                        captions = data.get('captions', [])
-                        
-                        if not captions:
-                            continue
-
-                        # Escolher idioma (mesma lógica)
-                        target_caption = None
-                        # Procurar exato
-                        if request.language:
-                            target_caption = next((c for c in captions if c['languageCode'] == request.language), None)
-                        
-                        # Se não achou exato, procura prioridade
-                        if not target_caption:
-                            priority = ['pt', 'pt-BR', 'en']
-                            for p in priority:
-                                target_caption = next((c for c in captions if c['languageCode'] == p), None)
-                                if target_caption: break
-                        
-                        # Pegar qualquer um se ainda nulo
-                        if not target_caption:
-                             target_caption = captions[0]
-
-                        # Obter o conteúdo da legenda (formato VTT geralmente)
-                        # A URL geralmente é relativa ao dominio da instancia
-                        caption_url = instance + target_caption['url']
-                        
-                        r_cap = requests.get(caption_url, timeout=10)
-                        if r_cap.status_code != 200:
-                            continue
-                            
-                        # Parse VTT simples (o Invidious retorna VTT)
-                        vtt_content = r_cap.text
-                        
-                        # Parser super simplificado de webvtt para nosso formato
-                        # Ignora detalhes complexos, foca em pegar o texto e timestamp basico
-                        lines = vtt_content.splitlines()
-                        transcript = []
-                        current_entry = None
-                        
-                        import re
-                        # Regex para timestamp: 00:00:00.000 --> 00:00:02.000
-                        ts_pattern = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3})\s-->\s(\d{2}:\d{2}:\d{2}\.\d{3})')
-                        
-                        for line in lines:
-                            line = line.strip()
-                            if not line: continue
-                            if 'WEBVTT' in line: continue
-                            if 'X-TIMESTAMP-MAP' in line: continue
-                            
-                            match = ts_pattern.match(line)
-                            if match:
-                                start_str, end_str = match.groups()
-                                # Converter para segundos
-                                def parse_ts(ts):
-                                    h, m, s = ts.split(':')
-                                    s, ms = s.split('.')
-                                    return int(h)*3600 + int(m)*60 + int(s) + int(ms)/1000.0
-
-                                start = parse_ts(start_str)
-                                end = parse_ts(end_str)
-                                current_entry = {"text": "", "start": start, "duration": end - start}
-                                transcript.append(current_entry)
-                            elif current_entry and not line.isdigit(): # Evita numeros de sequencia se houver
-                                current_entry["text"] += line + " "
-
-                        # Limpar espaços extras
-                        for t in transcript:
-                            t['text'] = t['text'].strip()
-                        
-                        # Filtra vazios
-                        transcript = [t for t in transcript if t['text']]
-
-                        full_text = " ".join([t['text'] for t in transcript])
-                        return {"video_id": video_id, "transcript": transcript, "full_text": full_text}
-
-                    except Exception as e_inst:
-                        print(f"Instance {instance} failed: {e_inst}")
-                        last_error = e_inst
-                        continue
-
-                # Se saiu do loop, falhou em todas
-                raise HTTPException(status_code=500, detail="Todos os métodos falharam (YouTube IP Block e Invidious Fallback exausto). Tente rodar localmente.")
-
-             except Exception as e_final:
-                 # Se ambos falharem, retorna o erro original ou combinado
-                 print(f"Final fallback failed: {e_final}")
-                 detail_msg = "O YouTube bloqueou o acesso vindo deste servidor cloud (Render/AWS)."
-                 if "429" in str(e_fallback):
-                     detail_msg += " Erro 429: Muitas requisições detectadas pelo YouTube."
-                 
-                 raise HTTPException(status_code=500, detail=f"{detail_msg} Invidious Fail: {str(e_final)}")
+            for i in matches
+        ],
+    }
+
+@app.get("/search")
+async def search_transcripts(
+    q: str = Query(..., min_length=1),
+    language: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    found = await sources.run_blocking(search_index.search, q, limit, offset, language)
+    for hit in found["results"]:
+        hit["timestamp"] = format_timestamp(hit["start"])
+        hit["url"] = f"{batch.watch_url(hit['video_id'])}&t={int(hit['start'])}s"
+    return {
+        "query": q,
+        "total": found["total"],
+        "limit": limit,
+        "offset": offset,
+        "results": found["results"],
+    }
+
+@app.get("/search/stats")
+async def search_stats():
+    return await sources.run_blocking(search_index.info)
+
+@app.post("/summary")
+async def stream_summary(request: SummaryRequest):
+    video_id = extract_video_id(request.url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=503, detail="GROQ_API_KEY is not configured on the server.")
+
+    result = await load_transcript(video_id, request.url, request.language)
+    stream = summarizer.SummaryStream(
+        get_llm_client(api_key),
+        result["transcript"],
+        model=request.model or summarizer.DEFAULT_MODEL,
+        video_id=video_id,
+        language=request.language,
+    )
+
+    # Gerador síncrono: o Starlette o consome num threadpool, fora do event loop
+    return StreamingResponse(stream.sse(), media_type=streaming.MEDIA_TYPES["sse"], headers=streaming.STREAM_HEADERS)
+
+@app.get("/summary/stats")
+async def summary_stats():
+    return {"time_to_first_token": summarizer.ttft_stats()}
+
+async def run_transcript_job(params: dict, progress) -> dict:
+    progress("Buscando legendas...")
+    result = await load_transcript(params["video_id"], params["url"], params["language"])
+    return streaming.render_transcript(result, params["include_full_text"], params["layout"])
+
+async def run_summary_job(params: dict, progress) -> dict:
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        raise jobs.ConfigurationError("GROQ_API_KEY is not configured on the server.")
+    progress("Buscando legendas...")
+    result = await load_transcript(params["video_id"], params["url"], params["language"])
+    summary, from_cache = await sources.run_blocking(
+        lambda: summarizer.summarize_cached(
+            get_llm_client(api_key),
+            params["video_id"],
+            params["language"],
+            result["transcript"],
+            model=params["model"] or summarizer.DEFAULT_MODEL,
+            on_progress=progress,
+        )
+    )
+    return {
+        "video_id": params["video_id"],
+        "summary": summary.text,
+        "cached": from_cache,
+        "chunks": summary.chunks,
+        "stages": summary.stages,
+        "usage": summary.usage,
+    }
+
+# Jobs em background: o cliente recebe o ID na hora e consulta/assina o resultado
+job_queue = jobs.JobQueue({"transcript": run_transcript_job, "summary": run_summary_job})
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    if request.kind not in job_queue.handlers:
+        raise HTTPException(status_code=400, detail=f"Invalid job kind. Use one of: {', '.join(job_queue.handlers)}")
+    if request.layout not in streaming.TRANSCRIPT_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Invalid layout. Use one of: {', '.join(streaming.TRANSCRIPT_LAYOUTS)}")
+    video_id = extract_video_id(request.url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+    if request.kind == "summary" and not os.environ.get("GROQ_API_KEY"):
+        # Falharia em todas as tentativas: recusa já na criação
+        raise HTTPException(status_code=503, detail="GROQ_API_KEY is not configured on the server.")
+
+    params = {
+        "video_id": video_id,
+        "url": request.url,
+        "language": request.language,
+        "model": request.model,
+        "include_full_text": request.include_full_text,
+        "layout": request.layout,
+    }
+    job = await job_queue.submit(request.kind, params, request.priority)
+    return jobs.public_view(job)
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return await sources.run_blocking(job_queue.info)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.public_view(job)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            yield streaming.sse_event(jobs.public_view(job), job["status"])
 
+    return StreamingResponse(events(), media_type=streaming.MEDIA_TYPES["sse"], headers=streaming.STREAM_HEADERS)
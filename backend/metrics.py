@@ -0,0 +1,240 @@
+"""
+Métricas no formato texto do Prometheus e spans de trace por requisição.
+
+Sem dependências: contadores e histogramas simples com labels, mais
+"coletores" que leem, na hora do scrape, as estatísticas que os módulos
+já mantêm (cache, single-flight, jobs, pool Invidious...).
+
+Trace: quando ativo para a requisição (amostragem via TRACE_SAMPLE_RATE ou
+header `X-Trace: 1`), cada `stage()` vira um span. Os spans vão no header
+`Server-Timing` da resposta e os traces recentes ficam em memória.
+"""
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.0))
+TRACE_MAX_RECENT = int(os.environ.get("TRACE_MAX_RECENT", 100))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 45.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (contagem por bucket, soma, total)
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+# Coletor: devolve (nome, tipo, ajuda, [(labels, valor), ...]) lidos na hora do scrape
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Collector] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "yt_fetch_stage_seconds",
+    "Duração de cada etapa da busca (transcript_api, ytdlp_extract, json3_download, invidious, parse, serialize).",
+    ("stage", "target", "outcome"),
+))
+SOURCE_SECONDS = registry.register(Histogram(
+    "yt_source_seconds",
+    "Duração de cada fonte dentro da estratégia de busca.",
+    ("source", "outcome"),
+))
+SOURCE_RESULTS = registry.register(Counter(
+    "yt_source_results_total",
+    "Resultados por fonte (ok, error, timeout, empty, cancelled).",
+    ("source", "outcome"),
+))
+LLM_TTFT_SECONDS = registry.register(Histogram(
+    "yt_llm_time_to_first_token_seconds",
+    "Tempo até o primeiro token do resumo em streaming.",
+))
+HTTP_SECONDS = registry.register(Histogram(
+    "yt_http_request_seconds",
+    "Latência das requisições HTTP por rota.",
+    ("method", "route", "status"),
+))
+
+
+# Trace
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+class Trace:
+    __slots__ = ("name", "started", "spans")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        # (nome, início relativo em s, duração em s, outcome)
+        self.spans: List[Tuple[str, float, float, str]] = []
+
+    def add(self, name: str, started: float, duration: float, outcome: str):
+        self.spans.append((name, started - self.started, duration, outcome))
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f'{i}-{_TOKEN_RE.sub("-", name)};dur={duration * 1000:.1f};desc="{outcome}"'
+            for i, (name, _, duration, outcome) in enumerate(self.spans)
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "spans": [
+                {"name": name, "offset_ms": round(offset * 1000, 2), "duration_ms": round(duration * 1000, 2), "outcome": outcome}
+                for name, offset, duration, outcome in self.spans
+            ],
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+recent_traces: "deque[dict]" = deque(maxlen=TRACE_MAX_RECENT)
+
+
+def start_trace(name: str, force: bool = False) -> Optional[Trace]:
+    if not force and (TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE):
+        return None
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace, duration: float, status: int):
+    data = trace.as_dict()
+    data["duration_ms"] = round(duration * 1000, 2)
+    data["status"] = status
+    recent_traces.append(data)
+
+
+@contextmanager
+def stage(name: str, target: str = ""):
+    """Mede uma etapa no histograma e, se houver trace ativo, registra o span."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = "cancelled" if type(e).__name__ == "CancelledError" else "error"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.observe(duration, stage=name, target=target, outcome=outcome)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(f"{name}:{target}" if target else name, started, duration, outcome)
@@ -0,0 +1,191 @@
+"""
+Prefetch especulativo de transcrições.
+
+Depois do /check-video, o próximo passo quase sempre é um /transcript para um
+dos idiomas listados. O Prefetcher já começa essas buscas em background, com
+concorrência limitada, e guarda os resultados num armazenamento em memória de
+vida curta; o /transcript seguinte "reivindica" o resultado (ou espera a busca
+que já está em andamento) em vez de começar do zero.
+
+Só buscas que já estão rodando são reivindicadas: uma ainda na fila do
+semáforo é cancelada e quem pediu busca direto, sem esperar pelo trabalho
+especulativo dos outros.
+
+Contadores: hits (resultado usado), joined (usado ainda em andamento),
+wasted (expirou sem uso), cancelled (ainda na fila quando pedida), failed e
+skipped (limite de pendentes atingido).
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+PREFETCH_ON_CHECK_VIDEO = os.environ.get("PREFETCH_ON_CHECK_VIDEO", "1") not in ("0", "false", "no")
+PREFETCH_MAX_CONCURRENCY = int(os.environ.get("PREFETCH_MAX_CONCURRENCY", 4))
+PREFETCH_MAX_PENDING = int(os.environ.get("PREFETCH_MAX_PENDING", 32))
+PREFETCH_MAX_TRACKS = int(os.environ.get("PREFETCH_MAX_TRACKS", 2))
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL", 120))
+PREFETCH_MAX_ENTRIES = int(os.environ.get("PREFETCH_MAX_ENTRIES", 64))
+
+# Mesma ordem que o backend usa quando o idioma não é informado
+PREFERRED_LANGUAGES = ("pt", "en")
+
+Key = Tuple[str, Optional[str]]
+Fetch = Callable[[str, str, Optional[str]], Awaitable]
+
+
+def default_language(available: List[dict]) -> Optional[str]:
+    """Código que um /transcript sem idioma acaba buscando (None = qualquer um)."""
+    codes = [language["code"] for language in available]
+    return next((code for code in PREFERRED_LANGUAGES if code in codes), None)
+
+
+def likely_languages(
+    requested: Optional[str],
+    available: List[dict],
+    max_tracks: int = PREFETCH_MAX_TRACKS,
+) -> List[Optional[str]]:
+    """
+    Idiomas mais prováveis do próximo /transcript: o pedido, depois pt/en,
+    depois a primeira legenda manual. None vira o código que o backend
+    escolheria, para não buscar a mesma legenda duas vezes.
+    """
+    codes = [language["code"] for language in available]
+    candidates: List[Optional[str]] = [requested if requested is not None else default_language(available)]
+    candidates.extend(code for code in PREFERRED_LANGUAGES if code in codes)
+    candidates.extend(language["code"] for language in available if not language.get("is_generated"))
+
+    picked: List[Optional[str]] = []
+    for code in candidates:
+        if code in picked or (code is not None and code not in codes):
+            continue
+        picked.append(code)
+        if len(picked) >= max_tracks:
+            break
+    return picked
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        fetch: Fetch,
+        max_concurrency: int = PREFETCH_MAX_CONCURRENCY,
+        max_pending: int = PREFETCH_MAX_PENDING,
+        ttl: float = PREFETCH_TTL,
+        max_entries: int = PREFETCH_MAX_ENTRIES,
+    ):
+        self.fetch = fetch
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        # key -> (expira_em, resultado)
+        self._store: "OrderedDict[Key, Tuple[float, object]]" = OrderedDict()
+        self._tasks: Dict[Key, asyncio.Task] = {}
+        # Buscas que já passaram do semáforo (as únicas que podem ser reivindicadas)
+        self._running: Set[Key] = set()
+        # video_id -> idioma buscado no lugar de None
+        self._defaults: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self.stats = {
+            "scheduled": 0, "completed": 0, "failed": 0, "skipped": 0,
+            "hits": 0, "joined": 0, "wasted": 0, "cancelled": 0,
+        }
+
+    def schedule(
+        self,
+        video_id: str,
+        url: str,
+        languages: List[Optional[str]],
+        is_cached: Callable[[Key], bool],
+        default: Optional[str] = None,
+    ):
+        self._expire()
+        if default is not None:
+            self._defaults[video_id] = default
+            self._defaults.move_to_end(video_id)
+            while len(self._defaults) > self.max_entries:
+                self._defaults.popitem(last=False)
+        for language in languages:
+            key = (video_id, language)
+            if key in self._tasks or key in self._store or is_cached(key):
+                continue
+            if len(self._tasks) >= self.max_pending:
+                self.stats["skipped"] += 1
+                continue
+            self.stats["scheduled"] += 1
+            task = asyncio.ensure_future(self._run(key, url))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, key=key: self._tasks.pop(key, None))
+
+    async def _run(self, key: Key, url: str):
+        video_id, language = key
+        async with self._semaphore:
+            self._running.add(key)
+            try:
+                result = await self.fetch(video_id, url, language)
+            except Exception:
+                self.stats["failed"] += 1
+                return None
+            finally:
+                self._running.discard(key)
+        self.stats["completed"] += 1
+        self._store[key] = (time.monotonic() + self.ttl, result)
+        self._store.move_to_end(key)
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+            self.stats["wasted"] += 1
+        return result
+
+    async def claim(self, video_id: str, language: Optional[str]):
+        """Resultado pré-buscado (removido do armazenamento), ou None."""
+        if language is None:
+            language = self._defaults.get(video_id)
+        key = (video_id, language)
+        self._expire()
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry[1]
+
+        task = self._tasks.get(key)
+        if task is None:
+            return None
+        if key not in self._running and not task.done():
+            # Ainda na fila: quem pediu não deve pagar pela espera
+            task.cancel()
+            self.stats["cancelled"] += 1
+            return None
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        if result is None or self._store.pop(key, None) is None:
+            return None
+        self.stats["joined"] += 1
+        return result
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._store.items() if expires_at <= now]
+        for key in expired:
+            del self._store[key]
+        self.stats["wasted"] += len(expired)
+
+    async def stop(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        self._expire()
+        used = self.stats["hits"] + self.stats["joined"]
+        finished = used + self.stats["wasted"]
+        return dict(
+            self.stats,
+            pending=len(self._tasks),
+            stored=len(self._store),
+            hit_rate=used / finished if finished else 0.0,
+        )
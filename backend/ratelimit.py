@@ -0,0 +1,197 @@
+"""
+Limitadores de taxa (token bucket) para chamadas upstream.
+
+Quem chama `acquire()` espera na fila até haver um token, em vez de falhar.
+`UpstreamLimiter` combina um orçamento global com um por host e desacelera
+sozinho quando o upstream responde 429 (respeitando o Retry-After).
+"""
+import asyncio
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        # rate: tokens por segundo; burst: capacidade máxima do balde
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        # Durante uma pausa updated_at fica no futuro: nada a repor (nem a descontar)
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated_at = max(self.updated_at, now)
+
+    def _wait_time(self, now: float) -> float:
+        return 0.0
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                paused = self._wait_time(now)
+                if paused > 0:
+                    await asyncio.sleep(paused)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """Um token bucket por host, criados sob demanda."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, host: str, tokens: float = 1.0):
+        await self.bucket(host).acquire(tokens)
+
+
+UPSTREAM_GLOBAL_RATE = float(os.environ.get("UPSTREAM_GLOBAL_RATE", 20.0))
+UPSTREAM_GLOBAL_BURST = float(os.environ.get("UPSTREAM_GLOBAL_BURST", 40.0))
+# Uma transcrição via Invidious custa 2 GETs (vídeo + legenda): com 5/s cada
+# instância atendia ~2,5 transcrições/s e a fila dominava o p95 sob carga.
+# O teto real continua sendo o orçamento global e o recuo automático em 429.
+UPSTREAM_HOST_RATE = float(os.environ.get("UPSTREAM_HOST_RATE", 10.0))
+UPSTREAM_HOST_BURST = float(os.environ.get("UPSTREAM_HOST_BURST", 20.0))
+# Pausa usada num 429 sem Retry-After (dobra a cada 429 seguido)
+UPSTREAM_BACKOFF_BASE = float(os.environ.get("UPSTREAM_BACKOFF_BASE", 5.0))
+UPSTREAM_BACKOFF_MAX = float(os.environ.get("UPSTREAM_BACKOFF_MAX", 300.0))
+
+
+def parse_host_limits(value: str) -> Dict[str, tuple]:
+    """ "youtube.com=2:4,yewtu.be=1:2" -> {"youtube.com": (2.0, 4.0), ...} (rate:burst)."""
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        host, spec = item.split("=", 1)
+        rate, _, burst = spec.partition(":")
+        limits[host.strip().lower()] = (float(rate), float(burst or rate))
+    return limits
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos ou como data HTTP."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    Token bucket que reage a 429: pausa pelo Retry-After (ou backoff
+    exponencial) e corta a taxa pela metade; cada sucesso devolve 10% da
+    taxa original, até voltar ao normal.
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate_factor: float = 0.05):
+        super().__init__(rate, burst)
+        self.base_rate = rate
+        self.min_rate = rate * min_rate_factor
+        self.paused_until = 0.0
+        self.consecutive_429 = 0
+        self.throttled = 0
+
+    def _wait_time(self, now: float) -> float:
+        return self.paused_until - now
+
+    def throttle(self, retry_after: Optional[float] = None):
+        now = time.monotonic()
+        self._refill(now)
+        self.consecutive_429 += 1
+        self.throttled += 1
+        if retry_after is None:
+            retry_after = min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** (self.consecutive_429 - 1))
+        self.paused_until = max(self.paused_until, now + retry_after)
+        self.rate = max(self.min_rate, self.rate / 2)
+        # Sem rajada logo depois da pausa: o balde só volta a encher quando ela acaba
+        self.tokens = min(self.tokens, 0.0)
+        self.updated_at = self.paused_until
+
+    def recover(self):
+        self.consecutive_429 = 0
+        if self.rate < self.base_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "base_rate": self.base_rate,
+            "tokens": round(self.tokens, 3),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "throttled": self.throttled,
+        }
+
+
+class UpstreamLimiter:
+    """Orçamento global + um bucket adaptativo por host upstream."""
+
+    def __init__(
+        self,
+        global_rate: float = UPSTREAM_GLOBAL_RATE,
+        global_burst: float = UPSTREAM_GLOBAL_BURST,
+        host_rate: float = UPSTREAM_HOST_RATE,
+        host_burst: float = UPSTREAM_HOST_BURST,
+        host_limits: Optional[Dict[str, tuple]] = None,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.host_limits = host_limits if host_limits is not None else parse_host_limits(
+            os.environ.get("UPSTREAM_HOST_LIMITS", "")
+        )
+        self.buckets: Dict[str, AdaptiveTokenBucket] = {}
+        self.waited = 0.0
+
+    def bucket(self, host: str) -> AdaptiveTokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate, burst = self.host_limits.get(host, (self.host_rate, self.host_burst))
+            bucket = self.buckets[host] = AdaptiveTokenBucket(rate, burst)
+        return bucket
+
+    async def acquire(self, host: str):
+        started = time.monotonic()
+        # O host primeiro: um host pausado não deve segurar tokens do orçamento global
+        await self.bucket(host).acquire()
+        await self.global_bucket.acquire()
+        self.waited += time.monotonic() - started
+
+    def throttle(self, host: str, retry_after: Optional[float] = None):
+        self.bucket(host).throttle(retry_after)
+
+    def recover(self, host: str):
+        self.bucket(host).recover()
+
+    def snapshot(self) -> dict:
+        return {
+            "global": {"rate": self.global_bucket.rate, "tokens": round(self.global_bucket.tokens, 3)},
+            "hosts": {host: bucket.snapshot() for host, bucket in self.buckets.items()},
+            "waited_seconds": round(self.waited, 3),
+        }
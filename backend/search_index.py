@@ -0,0 +1,214 @@
+"""
+Índice de busca full-text entre vídeos (SQLite FTS5).
+
+Toda transcrição buscada com sucesso entra numa fila e é indexada por uma
+thread em background, fora do caminho da requisição. Cada segmento vira uma
+linha do índice, então cada resultado aponta para (video_id, timestamp).
+
+As colunas video_id/language do FTS5 não têm índice: para reindexar um vídeo
+sem varrer a tabela inteira, os segmentos de cada (video_id, language) recebem
+rowids contíguos, guardados em `indexed_videos`, e são apagados pelo rowid.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from subtitles import Transcript
+
+DEFAULT_DB_PATH = os.environ.get(
+    "TRANSCRIPT_SEARCH_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_search.db"),
+)
+QUEUE_MAX_SIZE = int(os.environ.get("TRANSCRIPT_SEARCH_QUEUE_SIZE", 1000))
+
+
+def build_match_query(q: str) -> str:
+    """
+    Converte a busca do usuário numa query FTS5 segura: todas as palavras
+    precisam aparecer; texto entre aspas vira uma frase exata.
+    """
+    q = q.strip()
+    if len(q) > 1 and q[0] == '"' and q[-1] == '"':
+        return '"' + q[1:-1].replace('"', '""') + '"'
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"' for t in terms if t)
+
+
+class SearchIndex:
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self.available = True
+        self._queue: "queue.Queue" = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._read_lock = threading.Lock()
+        self.stats = {"indexed": 0, "skipped": 0, "dropped": 0, "errors": 0}
+        try:
+            self._read_db = self._connect()
+            self._read_db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_videos (
+                    video_id TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    source TEXT,
+                    segment_count INTEGER NOT NULL,
+                    fingerprint TEXT,
+                    first_rowid INTEGER,
+                    last_rowid INTEGER,
+                    indexed_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, language)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+                    text,
+                    video_id UNINDEXED,
+                    language UNINDEXED,
+                    start UNINDEXED,
+                    duration UNINDEXED,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                );
+                """
+            )
+            columns = {row[1] for row in self._read_db.execute("PRAGMA table_info(indexed_videos)")}
+            # Índices criados antes das colunas: sem fingerprint são reindexados na
+            # próxima vez; sem a faixa de rowids, essa reindexação apaga pelo video_id
+            for column in ("fingerprint TEXT", "first_rowid INTEGER", "last_rowid INTEGER"):
+                if column.split()[0] not in columns:
+                    self._read_db.execute(f"ALTER TABLE indexed_videos ADD COLUMN {column}")
+        except sqlite3.Error as e:
+            # SQLite compilado sem FTS5, disco somente leitura, etc.
+            print(f"Transcript search index disabled: {e}")
+            self.available = False
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # Escrita (thread em background)
+
+    def submit(self, video_id: str, language: Optional[str], source: Optional[str], transcript: Transcript):
+        """Enfileira para indexação; nunca bloqueia quem chamou."""
+        if not self.available or not transcript:
+            return
+        try:
+            self._queue.put_nowait((video_id, language or "*", source, transcript))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _index(self, db: sqlite3.Connection, video_id: str, language: str, source: Optional[str], transcript: Transcript):
+        # Mesmo número de segmentos não quer dizer mesmo texto (legenda corrigida, outra fonte)
+        fingerprint = transcript.fingerprint()
+        row = db.execute(
+            "SELECT fingerprint, first_rowid, last_rowid FROM indexed_videos WHERE video_id = ? AND language = ?",
+            (video_id, language),
+        ).fetchone()
+        if row is not None and row[0] == fingerprint:
+            self.stats["skipped"] += 1
+            return
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if row is not None and row[1] is not None:
+                db.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?", (row[1], row[2]))
+            elif row is not None:
+                db.execute("DELETE FROM segments WHERE video_id = ? AND language = ?", (video_id, language))
+            # Rowids explícitos: a faixa fica contígua mesmo que outro processo escreva no mesmo arquivo
+            first = db.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM segments").fetchone()[0]
+            db.executemany(
+                "INSERT INTO segments (rowid, text, video_id, language, start, duration) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (first + i, segment.text, video_id, language, segment.start, segment.duration)
+                    for i, segment in enumerate(transcript)
+                ),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO indexed_videos "
+                "(video_id, language, source, segment_count, fingerprint, first_rowid, last_rowid, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, language, source, len(transcript), fingerprint, first, first + len(transcript) - 1, time.time()),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.stats["indexed"] += 1
+
+    def _worker(self):
+        db = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._index(db, *item)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Search indexing failed for {item[0]}: {e}")
+        db.close()
+
+    def start(self):
+        if self.available and self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="search-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Leitura
+
+    def search(self, q: str, limit: int = 20, offset: int = 0, language: Optional[str] = None) -> dict:
+        match = build_match_query(q)
+        if not self.available or not match:
+            return {"total": 0, "results": []}
+
+        where = "segments MATCH ?"
+        params: List = [match]
+        if language:
+            where += " AND language = ?"
+            params.append(language)
+
+        with self._read_lock:
+            total = self._read_db.execute(
+                f"SELECT COUNT(*) FROM segments WHERE {where}", params
+            ).fetchone()[0]
+            rows = self._read_db.execute(
+                f"""
+                SELECT video_id, language, start, duration, text,
+                       snippet(segments, 0, '[', ']', '…', 16), bm25(segments)
+                FROM segments
+                WHERE {where}
+                ORDER BY bm25(segments)
+                LIMIT ? OFFSET ?
+                """,
+                params + [limit, offset],
+            ).fetchall()
+
+        return {
+            "total": total,
+            "results": [
+                {
+                    "video_id": video_id,
+                    "language": None if language == "*" else language,
+                    "start": start,
+                    "duration": duration,
+                    "text": text,
+                    "snippet": snippet,
+                    # bm25 do SQLite é negativo (menor = melhor); invertido para ficar intuitivo
+                    "score": round(-rank, 4),
+                }
+                for video_id, language, start, duration, text, snippet, rank in rows
+            ],
+        }
+
+    def info(self) -> dict:
+        info = dict(self.stats, available=self.available, queued=self._queue.qsize())
+        if self.available:
+            with self._read_lock:
+                info["videos"] = self._read_db.execute("SELECT COUNT(*) FROM indexed_videos").fetchone()[0]
+        return info
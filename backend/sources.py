@@ -0,0 +1,495 @@
+"""
+Fontes de transcrição usadas pelo backend.
+
+Tudo aqui é async: as chamadas HTTP usam um httpx.AsyncClient compartilhado
+(pool de conexões com keep-alive) e as bibliotecas bloqueantes
+(youtube-transcript-api e yt-dlp) rodam num executor com tamanho limitado,
+para não ocupar o threadpool do FastAPI nem travar o event loop.
+
+Toda chamada de saída passa antes pelo `upstream_limiter` (orçamento global +
+por host), que desacelera quando o upstream responde 429.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
+from youtube_transcript_api import Transcript as CaptionTrack
+
+from invidious_pool import InvidiousPool, load_instances
+import metrics
+from ratelimit import UpstreamLimiter, parse_retry_after
+from singleflight import SingleFlight
+from subtitles import Transcript, parse
+from ytdlp_pool import YtdlpPool
+
+# Headers que simulam um navegador real para evitar bloqueios de IP
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Referer': 'https://www.youtube.com/',
+}
+
+HTTP_TIMEOUT = float(os.environ.get("FETCH_HTTP_TIMEOUT", 10))
+EXECUTOR_WORKERS = int(os.environ.get("FETCH_EXECUTOR_WORKERS", 8))
+CAPTION_METADATA_TTL = float(os.environ.get("CAPTION_METADATA_TTL", 15 * 60))
+
+# Executor limitado para as chamadas bloqueantes
+_executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="fetch")
+_http_client: Optional[httpx.AsyncClient] = None
+_local = threading.local()
+
+invidious_pool = InvidiousPool(load_instances())
+upstream_limiter = UpstreamLimiter()
+
+YOUTUBE_HOST = "youtube.com"
+
+
+class TranscriptUnavailable(Exception):
+    pass
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def run_blocking(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Limite de taxa
+
+def upstream_host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    # youtu.be, m.youtube.com, timedtext etc. dividem o mesmo orçamento
+    if host.endswith("youtu.be") or host.endswith("youtube.com"):
+        return YOUTUBE_HOST
+    return host or YOUTUBE_HOST
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    # youtube-transcript-api e yt-dlp não expõem o status HTTP de forma uniforme
+    message = str(exc)
+    return "429" in message or "Too Many Requests" in message
+
+
+async def limited_get(url: str, **kwargs) -> httpx.Response:
+    """GET pelo cliente compartilhado, respeitando o orçamento do host."""
+    host = upstream_host(url)
+    await upstream_limiter.acquire(host)
+    r = await get_http_client().get(url, **kwargs)
+    if r.status_code == 429:
+        upstream_limiter.throttle(host, parse_retry_after(r.headers.get("Retry-After")))
+    else:
+        upstream_limiter.recover(host)
+    return r
+
+
+async def run_limited(host: str, func, *args):
+    """`run_blocking` para bibliotecas que fazem HTTP por conta própria."""
+    await upstream_limiter.acquire(host)
+    try:
+        result = await run_blocking(func, *args)
+    except Exception as e:
+        if is_rate_limited(e):
+            upstream_limiter.throttle(host)
+        raise
+    upstream_limiter.recover(host)
+    return result
+
+
+def _parse_transcript(content: bytes, fmt: Optional[str] = None) -> Transcript:
+    return Transcript.from_segments(parse(content, fmt))
+
+
+async def parse_transcript(content: bytes, fmt: Optional[str] = None) -> Transcript:
+    with metrics.stage("parse", fmt or "auto"):
+        return await run_blocking(_parse_transcript, content, fmt)
+
+
+# Metadados de legendas (compartilhados entre /check-video e /transcript)
+
+class CaptionMetadata:
+    """
+    Listagens de legendas por vídeo, em memória e com TTL curto (as URLs
+    assinadas expiram): as trilhas da youtube-transcript-api e do yt-dlp.
+    Só dados simples (nada preso à sessão HTTP de uma thread), mas com URLs
+    assinadas de vida curta, então não vão para o SQLite.
+    """
+
+    def __init__(self, ttl: float = CAPTION_METADATA_TTL, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, kind: str, video_id: str):
+        entry = self._entries.get((kind, video_id))
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop((kind, video_id), None)
+            return None
+        self._entries.move_to_end((kind, video_id))
+        return entry[1]
+
+    def set(self, kind: str, video_id: str, value):
+        self._entries[(kind, video_id)] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end((kind, video_id))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, kind: str, video_id: str):
+        self._entries.pop((kind, video_id), None)
+
+    async def load(self, kind: str, video_id: str, loader: Callable[[], Awaitable]):
+        """Do cache, ou uma única extração mesmo com várias requisições simultâneas."""
+        value = self.get(kind, video_id)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        async def load_and_store():
+            self.stats["misses"] += 1
+            value = await loader()
+            self.set(kind, video_id, value)
+            return value
+
+        return await _metadata_flights.do((kind, video_id), load_and_store)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, entries=len(self._entries), ttl=self.ttl)
+
+
+caption_metadata = CaptionMetadata()
+_metadata_flights = SingleFlight()
+
+
+# Fontes
+
+def _transcript_api() -> YouTubeTranscriptApi:
+    # Uma instância (e sessão HTTP) por thread do executor
+    api = getattr(_local, "transcript_api", None)
+    if api is None:
+        _local.transcript_session = requests.Session()
+        api = _local.transcript_api = YouTubeTranscriptApi(http_client=_local.transcript_session)
+    return api
+
+
+def _transcript_session() -> requests.Session:
+    # A sessão da YouTubeTranscriptApi desta thread (headers e cookies de consentimento)
+    _transcript_api()
+    return _local.transcript_session
+
+
+# O TranscriptList guarda a sessão HTTP da thread que listou, então o cache fica
+# só com os dados de cada trilha e a trilha é remontada na thread que baixa. A
+# URL (`_url`) e o construtor não são API pública: a versão da biblioteca está
+# fixada em requirements.txt e tests/test_sources.py cobre a ida e volta.
+
+def _track_info(caption: CaptionTrack) -> dict:
+    return {
+        "code": caption.language_code,
+        "name": caption.language,
+        "is_generated": caption.is_generated,
+        "url": caption._url,
+    }
+
+
+def _caption_track(session: requests.Session, video_id: str, track: dict) -> CaptionTrack:
+    return CaptionTrack(
+        http_client=session,
+        video_id=video_id,
+        url=track["url"],
+        language=track["name"],
+        language_code=track["code"],
+        is_generated=track["is_generated"],
+        translation_languages=[],
+    )
+
+
+def _list_transcripts_sync(video_id: str) -> List[dict]:
+    return [_track_info(t) for t in _transcript_api().list(video_id)]
+
+
+async def get_transcript_list(video_id: str) -> List[dict]:
+    async def load():
+        with metrics.stage("caption_list"):
+            return await run_limited(YOUTUBE_HOST, _list_transcripts_sync, video_id)
+
+    return await caption_metadata.load("transcript_list", video_id, load)
+
+
+def _track_name(tracks: list, fallback: str) -> str:
+    return (tracks[0].get("name") if tracks else None) or fallback
+
+
+def _languages_from_ytdlp(captions: dict) -> Optional[List[dict]]:
+    """
+    Idiomas a partir das trilhas do yt-dlp: legendas manuais mais a legenda
+    automática original ("<lang>-orig"; as demais automáticas são traduções).
+    Nomes no mesmo formato da youtube-transcript-api ("English (auto-generated)").
+    """
+    automatic = captions["automatic_captions"]
+    original = [code for code in automatic if code.endswith("-orig")]
+    if automatic and not original:
+        return None
+    languages = [
+        {"code": code, "name": _track_name(tracks, code), "is_generated": False}
+        for code, tracks in captions["subtitles"].items()
+        if code != "live_chat"
+    ]
+    for code in original:
+        base = code[:-len("-orig")]
+        # yt-dlp chama a original de "English (Original)"; a tradução "en" tem o nome puro
+        name = _track_name(automatic.get(base), "") or _track_name(automatic[code], base)
+        if name.endswith(" (Original)"):
+            name = name[:-len(" (Original)")]
+        languages.append({"code": base, "name": f"{name} (auto-generated)", "is_generated": True})
+    return languages
+
+
+def _tracks_summary(tracks: List[dict]) -> str:
+    return ", ".join(f'{t["code"]} ("{t["name"]}")' for t in tracks) or "(nenhuma)"
+
+
+async def list_languages(video_id: str) -> List[dict]:
+    with metrics.stage("list_languages"):
+        # Se o /transcript já extraiu os metadados via yt-dlp, não buscamos de novo
+        if caption_metadata.get("transcript_list", video_id) is None:
+            captions = caption_metadata.get("ytdlp", video_id)
+            languages = _languages_from_ytdlp(captions) if captions is not None else None
+            if languages:
+                return languages
+
+        tracks = await get_transcript_list(video_id)
+        return [{"code": t["code"], "name": t["name"], "is_generated": t["is_generated"]} for t in tracks]
+
+
+def find_track(video_id: str, tracks: List[dict], languages: List[str]) -> dict:
+    """Como o TranscriptList.find_transcript: por idioma, manual antes da automática."""
+    for code in languages:
+        for generated in (False, True):
+            for track in tracks:
+                if track["code"] == code and track["is_generated"] == generated:
+                    return track
+    raise NoTranscriptFound(video_id, languages, _tracks_summary(tracks))
+
+
+def _fetch_from_list_sync(video_id: str, tracks: List[dict], language: Optional[str]) -> Transcript:
+    languages_to_try = [language] if language else ['pt', 'en']
+    track = find_track(video_id, tracks, languages_to_try)
+    caption = _caption_track(_transcript_session(), video_id, track)
+    return Transcript.from_segments(
+        (e.start, e.duration, e.text) for e in caption.fetch()
+    )
+
+
+async def fetch_from_transcript_api(video_id: str, language: Optional[str]) -> Transcript:
+    with metrics.stage("transcript_api"):
+        # Reaproveita a listagem do /check-video: só falta baixar a legenda escolhida
+        tracks = await get_transcript_list(video_id)
+        try:
+            return await run_limited(YOUTUBE_HOST, _fetch_from_list_sync, video_id, tracks, language)
+        except Exception as e:
+            if not isinstance(e, NoTranscriptFound):
+                # URL assinada expirada, bloqueio etc.: a próxima tentativa lista de novo
+                caption_metadata.invalidate("transcript_list", video_id)
+            raise
+
+
+YTDLP_OPTIONS = {
+    'skip_download': True,
+    'writesubtitles': True,
+    'writeautomaticsub': True,
+    'quiet': True,
+    'no_warnings': True,
+    'user_agent': BROWSER_HEADERS['User-Agent'],
+    'referer': BROWSER_HEADERS['Referer'],
+    'nocheckcertificate': True,
+}
+ytdlp_pool = YtdlpPool(YTDLP_OPTIONS)
+
+
+def _extract_captions_sync(url: str) -> dict:
+    with ytdlp_pool.instance() as ydl:
+        # process=False: só o resultado do extrator, sem seleção de formatos
+        info = ydl.extract_info(url, download=False, process=False)
+    # Guardamos só as trilhas de legenda, não o info inteiro (formatos, thumbnails...)
+    return {
+        "automatic_captions": info.get('automatic_captions') or {},
+        "subtitles": info.get('subtitles') or {},
+    }
+
+
+async def get_ytdlp_captions(video_id: str, url: str) -> dict:
+    async def load():
+        with metrics.stage("ytdlp_extract"):
+            return await run_limited(upstream_host(url), _extract_captions_sync, url)
+
+    return await caption_metadata.load("ytdlp", video_id, load)
+
+
+def warm_up():
+    """Pré-aquece o pool do yt-dlp sem atrasar a subida."""
+    future = _executor.submit(ytdlp_pool.warm)
+    future.add_done_callback(lambda f: f.exception() and print(f"yt-dlp warm-up failed: {f.exception()}"))
+
+
+def pick_ytdlp_json3(captions: dict, language: Optional[str]) -> dict:
+    """Trilha json3 do idioma pedido (ou pt > en > qualquer um)."""
+    subs = captions['automatic_captions'] or captions['subtitles']
+    if not subs:
+        raise TranscriptUnavailable("Legendas não encontradas no YouTube (Fallback)")
+
+    # Lógica de seleção de idioma aprimorada
+    target_lang = language if language and language in subs else None
+    if not target_lang:
+        # Prioridade: pt > en > qualquer um
+        priority = ['pt', 'pt-BR', 'pt-PT', 'en']
+        for p in priority:
+            if p in subs:
+                target_lang = p
+                break
+        if not target_lang:
+            target_lang = list(subs.keys())[0]
+
+    # Pegar URL do formato JSON3
+    sub_tracks = subs[target_lang]
+    json3_track = next((t for t in sub_tracks if t.get('ext') == 'json3'), None)
+    if not json3_track:
+        raise TranscriptUnavailable("Formato JSON3 não disponível")
+    return json3_track
+
+
+async def fetch_from_ytdlp(video_id: str, url: str, language: Optional[str]) -> Transcript:
+    json3_track = pick_ytdlp_json3(await get_ytdlp_captions(video_id, url), language)
+
+    # Baixar o JSON da legenda usando os mesmos headers de navegador
+    with metrics.stage("json3_download"):
+        r = await limited_get(json3_track['url'], headers=BROWSER_HEADERS)
+        if r.status_code == 403:
+            # URL assinada expirou enquanto estava no cache de metadados
+            caption_metadata.invalidate("ytdlp", video_id)
+        r.raise_for_status()
+    transcript = await parse_transcript(r.content, "json3")
+
+    if not transcript:
+        raise TranscriptUnavailable("Legenda vazia ou sem eventos")
+    return transcript
+
+
+def pick_invidious_caption(captions: List[dict], language: Optional[str]) -> dict:
+    target_caption = None
+    # Procurar exato
+    if language:
+        target_caption = next((c for c in captions if c['languageCode'] == language), None)
+
+    # Se não achou exato, procura prioridade
+    if not target_caption:
+        priority = ['pt', 'pt-BR', 'en']
+        for p in priority:
+            target_caption = next((c for c in captions if c['languageCode'] == p), None)
+            if target_caption: break
+
+    # Pegar qualquer um se ainda nulo
+    return target_caption or captions[0]
+
+
+class InstanceUnhealthy(Exception):
+    pass
+
+
+async def fetch_from_invidious_instance(instance: str, video_id: str, language: Optional[str]) -> Transcript:
+    # Endpoint de API do Invidious para pegar info do vídeo
+    r = await limited_get(f"{instance}/api/v1/videos/{video_id}")
+    if r.status_code != 200:
+        raise InstanceUnhealthy(f"HTTP {r.status_code}")
+
+    captions = r.json().get('captions', [])
+    if not captions:
+        raise TranscriptUnavailable("Sem legendas")
+
+    target_caption = pick_invidious_caption(captions, language)
+
+    # Obter o conteúdo da legenda (formato VTT geralmente)
+    # A URL geralmente é relativa ao dominio da instancia
+    r_cap = await limited_get(instance + target_caption['url'])
+    if r_cap.status_code != 200:
+        raise InstanceUnhealthy(f"HTTP {r_cap.status_code}")
+
+    # O formato é detectado pelo conteúdo (algumas instâncias devolvem TTML/XML)
+    return await parse_transcript(r_cap.content)
+
+
+async def fetch_from_invidious(video_id: str, language: Optional[str]) -> Transcript:
+    # Isso usa servidores de terceiros para buscar os dados, evitando nosso IP bloqueado.
+    # As instâncias são tentadas da mais saudável para a menos saudável.
+    for instance in invidious_pool.ordered():
+        started = time.monotonic()
+        try:
+            print(f"Trying Invidious instance: {instance}")
+            with metrics.stage("invidious", instance):
+                transcript = await fetch_from_invidious_instance(instance, video_id, language)
+            invidious_pool.record_success(instance, time.monotonic() - started)
+            return transcript
+        except TranscriptUnavailable as e_inst:
+            # A instância respondeu corretamente, o vídeo é que não tem legendas
+            invidious_pool.record_success(instance, time.monotonic() - started)
+            print(f"Instance {instance} failed: {e_inst}")
+            continue
+        except Exception as e_inst:
+            invidious_pool.record_failure(instance, e_inst, time.monotonic() - started)
+            print(f"Instance {instance} failed: {e_inst}")
+            continue
+
+    # Se saiu do loop, falhou em todas
+    raise TranscriptUnavailable("Todos os métodos falharam (YouTube IP Block e Invidious Fallback exausto). Tente rodar localmente.")
+
+
+async def resolve_caption_url(video_id: str, url: str, language: Optional[str]) -> Tuple[str, str, Optional[str], dict]:
+    """
+    URL do arquivo de legenda bruto, para quem precisa baixá-lo de novo
+    (refresh de lives): json3 do yt-dlp, senão a legenda do Invidious.
+    Retorna (fonte, url, formato ou None para detectar, headers).
+    """
+    try:
+        track = pick_ytdlp_json3(await get_ytdlp_captions(video_id, url), language)
+        return "ytdlp", track['url'], "json3", BROWSER_HEADERS
+    except Exception as e:
+        print(f"yt-dlp caption URL unavailable for {video_id}: {e}")
+
+    for instance in invidious_pool.ordered():
+        try:
+            r = await limited_get(f"{instance}/api/v1/videos/{video_id}")
+            captions = r.json().get('captions', []) if r.status_code == 200 else []
+        except Exception as e:
+            print(f"Instance {instance} failed: {e}")
+            continue
+        if captions:
+            return "invidious", instance + pick_invidious_caption(captions, language)['url'], None, {}
+    raise TranscriptUnavailable("Nenhuma URL de legenda disponível")
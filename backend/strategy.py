@@ -0,0 +1,138 @@
+"""
+Motor de estratégia para as fontes de transcrição.
+
+Em vez de tentar uma fonte de cada vez até o fim, as fontes podem rodar:
+
+- "sequential": a próxima só começa quando a anterior falha
+- "parallel":   todas começam juntas
+- "hedged":     a próxima começa quando a anterior falha OU depois de `hedge_delay` segundos
+
+Em todos os modos vence o primeiro resultado válido e as outras tarefas são canceladas.
+Cada fonte tem seu próprio timeout e o pedido inteiro tem um deadline geral.
+"""
+import asyncio
+import math
+import os
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+import metrics
+
+STRATEGIES = ("sequential", "parallel", "hedged")
+
+FETCH_STRATEGY = os.environ.get("FETCH_STRATEGY", "hedged")
+HEDGE_DELAY = float(os.environ.get("FETCH_HEDGE_DELAY", 2.0))
+REQUEST_DEADLINE = float(os.environ.get("FETCH_REQUEST_DEADLINE", 45.0))
+
+
+class SourceSpec(NamedTuple):
+    name: str
+    fetch: Callable[[], Awaitable]
+    timeout: float
+
+
+class AllSourcesFailed(Exception):
+    def __init__(self, errors: Dict[str, BaseException], deadline_exceeded: bool = False):
+        self.errors = errors
+        self.deadline_exceeded = deadline_exceeded
+        summary = "; ".join(f"{name}: {err!r}" for name, err in errors.items())
+        if deadline_exceeded:
+            summary = f"deadline exceeded ({summary})" if summary else "deadline exceeded"
+        super().__init__(summary or "no sources configured")
+
+
+def source_timeout(name: str, default: float) -> float:
+    return float(os.environ.get(f"FETCH_TIMEOUT_{name.upper()}", default))
+
+
+def _is_valid(result) -> bool:
+    return bool(result)
+
+
+async def run_strategy(
+    specs: List[SourceSpec],
+    strategy: str = FETCH_STRATEGY,
+    hedge_delay: float = HEDGE_DELAY,
+    deadline: float = REQUEST_DEADLINE,
+    is_valid: Callable[[object], bool] = _is_valid,
+) -> Tuple[str, object]:
+    """Retorna (nome_da_fonte, resultado) do primeiro resultado válido."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown fetch strategy: {strategy}")
+    if strategy == "parallel":
+        hedge_delay = 0.0
+    elif strategy == "sequential":
+        hedge_delay = math.inf
+
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + deadline
+    pending: Dict[asyncio.Task, str] = {}
+    started: Dict[str, float] = {}
+    errors: Dict[str, BaseException] = {}
+    next_index = 0
+
+    def record(name: str, outcome: str):
+        metrics.SOURCE_RESULTS.inc(source=name, outcome=outcome)
+        metrics.SOURCE_SECONDS.observe(loop.time() - started[name], source=name, outcome=outcome)
+
+    def launch():
+        nonlocal next_index
+        spec = specs[next_index]
+        next_index += 1
+        task = asyncio.ensure_future(asyncio.wait_for(spec.fetch(), timeout=spec.timeout))
+        pending[task] = spec.name
+        started[spec.name] = loop.time()
+
+    try:
+        if specs:
+            launch()
+        while pending or next_index < len(specs):
+            remaining = ends_at - loop.time()
+            if remaining <= 0:
+                # Sem isso o detalhe do erro mostraria as fontes em andamento como "None"
+                for name in pending.values():
+                    errors[name] = TimeoutError(f"{name} timed out (request deadline)")
+                for spec in specs[next_index:]:
+                    errors[spec.name] = TimeoutError(f"{spec.name} not started before the request deadline")
+                raise AllSourcesFailed(errors, deadline_exceeded=True)
+
+            if not pending:
+                launch()
+                continue
+
+            timeout = min(remaining, hedge_delay) if next_index < len(specs) else remaining
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Fonte atual está lenta: dispara a próxima (hedge)
+                if next_index < len(specs) and loop.time() < ends_at:
+                    launch()
+                continue
+
+            for task in done:
+                name = pending.pop(task)
+                if task.cancelled():
+                    record(name, "cancelled")
+                    errors[name] = asyncio.CancelledError()
+                    continue
+                exc = task.exception()
+                if exc is not None:
+                    if isinstance(exc, asyncio.TimeoutError):
+                        record(name, "timeout")
+                        exc = TimeoutError(f"{name} timed out")
+                    else:
+                        record(name, "error")
+                    errors[name] = exc
+                    continue
+                result = task.result()
+                if is_valid(result):
+                    record(name, "ok")
+                    return name, result
+                record(name, "empty")
+                errors[name] = ValueError(f"{name} returned an empty result")
+
+        raise AllSourcesFailed(errors)
+    finally:
+        # Perdedoras do hedge (ou interrompidas pelo deadline)
+        for task, name in pending.items():
+            task.cancel()
+            record(name, "cancelled")
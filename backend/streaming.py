@@ -0,0 +1,75 @@
+"""
+Helpers para respostas em streaming (NDJSON e Server-Sent Events).
+"""
+import json
+from typing import Optional
+
+STREAM_FORMATS = ("ndjson", "sse")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+# Evita que proxies (nginx, Render, etc) segurem o stream em buffer
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def ndjson_line(obj) -> str:
+    return dumps(obj) + "\n"
+
+
+def sse_event(obj, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps(obj)}\n\n"
+
+
+def encode(obj, fmt: str, event: Optional[str] = None) -> str:
+    if fmt == "sse":
+        return sse_event(obj, event)
+    return ndjson_line(obj)
+
+
+# Respostas de transcrição
+
+TRANSCRIPT_LAYOUTS = ("segments", "columnar")
+STREAM_CHUNK_SIZE = 200
+
+
+def render_transcript(result: dict, include_full_text: bool = True, layout: str = "segments") -> dict:
+    transcript = result["transcript"]
+    body = {key: value for key, value in result.items() if key != "transcript"}
+    body["transcript"] = transcript.to_columnar() if layout == "columnar" else transcript.to_dicts()
+    if include_full_text:
+        body["full_text"] = transcript.full_text
+    return body
+
+
+def iter_transcript_stream(result: dict, fmt: str, layout: str = "segments", include_full_text: bool = False):
+    """
+    Gera a transcrição em pedaços: um evento "meta", depois os segmentos
+    (um por linha, ou em blocos colunares) e, se pedido, o full_text no final.
+    """
+    transcript = result["transcript"]
+    meta = {key: value for key, value in result.items() if key != "transcript"}
+    meta["segment_count"] = len(transcript)
+    meta["layout"] = layout
+    yield encode(meta, fmt, "meta")
+
+    for i in range(0, len(transcript), STREAM_CHUNK_SIZE):
+        chunk = transcript.slice(i, i + STREAM_CHUNK_SIZE)
+        if layout == "columnar":
+            yield encode(chunk.to_columnar(), fmt, "segments")
+        else:
+            yield "".join(encode(segment, fmt, "segment") for segment in chunk.to_dicts())
+
+    if include_full_text:
+        yield encode({"full_text": transcript.full_text}, fmt, "full_text")
+    yield encode({"done": True}, fmt, "done")
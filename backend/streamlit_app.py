@@ -2,10 +2,13 @@ import streamlit as st
 import yt_dlp
 import requests
 import os
-import time
 import re
 from youtube_transcript_api import YouTubeTranscriptApi
-from openai import OpenAI
+
+from cache import NegativeEntry, get_cache
+from subtitles import Transcript, parse_json3
+from llm import get_llm_client
+from summarizer import SummaryStream
 
 # Configuração da Página
 st.set_page_config(
@@ -23,10 +26,8 @@ def get_groq_client():
         st.error("🔑 **Chave API da Groq não encontrada!** Por favor, configure `GROQ_API_KEY` nos Secrets do Streamlit.")
         st.info("💡 Como configurar: Vá em Settings -> Secrets no painel do Streamlit Cloud.")
         return None
-    return OpenAI(
-        base_url="https://api.groq.com/openai/v1",
-        api_key=GROQ_API_KEY
-    )
+    # Cliente único por processo, reaproveitado entre reruns
+    return get_llm_client(GROQ_API_KEY)
 
 # Estilização Customizada (CSS)
 st.markdown("""
@@ -93,38 +94,101 @@ def extract_video_id(url):
             return match.group(1)
     return None
 
-def resumir_transcricao(texto_completo):
-    """Gera um resumo estruturado usando Groq (Llama 3)"""
+def resumir_transcricao(video_id, transcript):
+    """Gera um resumo estruturado usando Groq (Llama 3), em map-reduce para vídeos longos"""
     client = get_groq_client()
     if not client:
         return "Erro: Chave API não configurada corretamente."
 
-    # Limite seguro de caracteres
-    texto_para_resumir = texto_completo[:15000]
-    
-    prompt = f"""
-    Atue como um assistente especialista em resumir vídeos do YouTube.
-    Faça um resumo estruturado e profissional do texto abaixo.
-    Use tópicos (bullet points) claros e destaque as conclusões principais.
-    Responda SEMPRE em Português do Brasil.
-    
-    Texto do vídeo:
-    {texto_para_resumir}
-    """
-    
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile", # Modelo atualizado e mais potente
-            messages=[
-                {"role": "system", "content": "Você é um assistente útil que resume vídeos com precisão."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-        )
-        return response.choices[0].message.content
+        # O texto aparece conforme os tokens chegam
+        stream = SummaryStream(client, transcript, on_progress=st.caption, video_id=video_id)
+        st.write_stream(stream)
+        result = stream.result
+        st.session_state['resumo_stats'] = {
+            "cache": stream.from_cache,
+            "trechos": result.chunks,
+            "tempo_por_etapa_s": {k: round(v, 2) for k, v in result.stages.items()},
+            "tokens": result.usage,
+        }
+        return result.text
     except Exception as e:
         return f"Erro ao gerar resumo: {str(e)}"
 
+def buscar_legendas(url, video_id):
+    """Busca as legendas no formato json3 (yt-dlp primeiro, YouTubeTranscriptApi como backup)"""
+    st.write("🔍 Conectando ao YouTube...")
+    
+    # 1. Configurar Cookies e Headers
+    cookies_content = st.secrets.get("YOUTUBE_COOKIES", None)
+    cookie_file = "cookies.txt"
+    if cookies_content and not os.path.exists(cookie_file):
+        with open(cookie_file, "w") as f:
+            f.write(cookies_content)
+    
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': 'https://www.youtube.com/',
+    }
+
+    # 2. TENTATIVA 1: yt-dlp (Método mais robusto)
+    data = None
+    try:
+        st.write("📡 Conectando ao YouTube (Primário)...")
+        ydl_opts = {
+            'skip_download': True,
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+            'quiet': True,
+            'no_warnings': True,
+            'cookiefile': cookie_file if os.path.exists(cookie_file) else None,
+            'user_agent': headers['User-Agent'],
+        }
+        
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            subs = info.get('automatic_captions') or info.get('subtitles')
+            
+            if subs:
+                # Tenta pegar qualquer idioma disponível (prioridade PT, depois EN)
+                target_sub_lang = 'pt' if 'pt' in subs else ('en' if 'en' in subs else next(iter(subs.keys())))
+                sub_tracks = subs[target_sub_lang]
+                json3_track = next((t for t in sub_tracks if t.get('ext') == 'json3'), sub_tracks[0])
+                
+                r = requests.get(json3_track['url'], headers=headers, timeout=10)
+                if r.status_code == 200:
+                    data = r.json()
+                    st.write(f"✅ Legendas obtidas (Base: {target_sub_lang})")
+    except Exception as e_dlp:
+        st.write(f"⚠️ Método primário falhou. Tentando backup...")
+
+    # 3. TENTATIVA 2: YouTubeTranscriptApi (Backup)
+    if not data:
+        try:
+            st.write("📡 Conectando via canais alternativos...")
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id, cookies=cookie_file if os.path.exists(cookie_file) else None)
+            
+            # Tenta PT, depois EN, depois qualquer uma
+            try:
+                t_obj = transcript_list.find_transcript(['pt', 'en'])
+            except:
+                t_obj = next(iter(transcript_list))
+            
+            raw_data = t_obj.fetch()
+            data = {'events': []}
+            for entry in raw_data:
+                data['events'].append({
+                    'tStartMs': entry['start'] * 1000,
+                    'dDurationMs': entry.get('duration', 0) * 1000,
+                    'segs': [{'utf8': entry['text']}]
+                })
+            st.write(f"✅ Legendas obtidas via backup ({t_obj.language_code})")
+        except Exception as e_api:
+             raise Exception("Não foi possível obter legendas. O YouTube pode estar bloqueando o acesso temporariamente (Erro 429).")
+
+    return data
+
 # Título e Cabeçalho
 st.title("YT Transcrib 🎙️ + AI")
 st.write("Transcreva vídeos e gere resumos inteligentes com Inteligência Artificial.")
@@ -145,94 +209,34 @@ if st.button("🚀 Transcrever Vídeo", use_container_width=True):
     else:
         with st.status("Processando...", expanded=True) as status:
             try:
-                st.write("🔍 Conectando ao YouTube...")
-                
-                # 1. Configurar Cookies e Headers
-                cookies_content = st.secrets.get("YOUTUBE_COOKIES", None)
-                cookie_file = "cookies.txt"
-                if cookies_content and not os.path.exists(cookie_file):
-                    with open(cookie_file, "w") as f:
-                        f.write(cookies_content)
-                
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                    'Referer': 'https://www.youtube.com/',
-                }
+                # Cache compartilhado com o backend FastAPI
+                transcript_cache = get_cache()
+                cached = transcript_cache.get(video_id, None, "transcript")
+                if isinstance(cached, NegativeEntry):
+                    raise Exception(cached.detail)
 
-                # 2. TENTATIVA 1: yt-dlp (Método mais robusto)
-                data = None
-                try:
-                    st.write("📡 Conectando ao YouTube (Primário)...")
-                    ydl_opts = {
-                        'skip_download': True,
-                        'writesubtitles': True,
-                        'writeautomaticsub': True,
-                        'quiet': True,
-                        'no_warnings': True,
-                        'cookiefile': cookie_file if os.path.exists(cookie_file) else None,
-                        'user_agent': headers['User-Agent'],
-                    }
-                    
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(url, download=False)
-                        subs = info.get('automatic_captions') or info.get('subtitles')
-                        
-                        if subs:
-                            # Tenta pegar qualquer idioma disponível (prioridade PT, depois EN)
-                            target_sub_lang = 'pt' if 'pt' in subs else ('en' if 'en' in subs else next(iter(subs.keys())))
-                            sub_tracks = subs[target_sub_lang]
-                            json3_track = next((t for t in sub_tracks if t.get('ext') == 'json3'), sub_tracks[0])
-                            
-                            r = requests.get(json3_track['url'], headers=headers, timeout=10)
-                            if r.status_code == 200:
-                                data = r.json()
-                                st.write(f"✅ Legendas obtidas (Base: {target_sub_lang})")
-                except Exception as e_dlp:
-                    st.write(f"⚠️ Método primário falhou. Tentando backup...")
+                if cached is not None:
+                    st.write("⚡ Transcrição encontrada no cache")
+                    transcript = cached['transcript']
+                else:
+                    data = buscar_legendas(url, video_id)
+                    if not data:
+                        raise Exception("Nenhuma legenda encontrada para este vídeo.")
 
-                # 3. TENTATIVA 2: YouTubeTranscriptApi (Backup)
-                if not data:
-                    try:
-                        st.write("📡 Conectando via canais alternativos...")
-                        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id, cookies=cookie_file if os.path.exists(cookie_file) else None)
-                        
-                        # Tenta PT, depois EN, depois qualquer uma
-                        try:
-                            t_obj = transcript_list.find_transcript(['pt', 'en'])
-                        except:
-                            t_obj = next(iter(transcript_list))
-                        
-                        raw_data = t_obj.fetch()
-                        data = {'events': []}
-                        for entry in raw_data:
-                            data['events'].append({
-                                'tStartMs': entry['start'] * 1000,
-                                'segs': [{'utf8': entry['text']}]
-                            })
-                        st.write(f"✅ Legendas obtidas via backup ({t_obj.language_code})")
-                    except Exception as e_api:
-                         raise Exception("Não foi possível obter legendas. O YouTube pode estar bloqueando o acesso temporariamente (Erro 429).")
+                    # 4. Processamento do texto
+                    st.write("📝 Organizando transcrição...")
+                    transcript = Transcript.from_segments(parse_json3(data))
 
-                if not data:
-                    raise Exception("Nenhuma legenda encontrada para este vídeo.")
+                    transcript_cache.set(video_id, None, "transcript", {
+                        "video_id": video_id,
+                        "transcript": transcript
+                    })
 
-                # 4. Processamento do texto
-                st.write("📝 Organizando transcrição...")
-                full_transcript = []
-                temp_text = []
-                for event in data.get('events', []):
-                    if 'segs' not in event: continue
-                    text = "".join([s.get('utf8', '') for s in event['segs']]).strip()
-                    if text:
-                        start = event.get('tStartMs', 0) / 1000.0
-                        timestamp = time.strftime('%H:%M:%S', time.gmtime(start))
-                        full_transcript.append({'timestamp': timestamp, 'text': text})
-                        temp_text.append(text)
-                
-                transcript_text = " ".join(temp_text)
-                st.session_state['transcript_text'] = transcript_text
-                st.session_state['full_transcript'] = full_transcript
+                st.session_state['transcript_text'] = transcript.full_text
+                # Montado uma vez aqui, e não a cada rerun da página
+                st.session_state['transcript_ts_text'] = "".join(transcript.iter_text(timestamps=True))
+                st.session_state['transcript'] = transcript
+                st.session_state['video_id'] = video_id
                 
                 status.update(label="Transcrição Concluída!", state="complete", expanded=False)
                 st.success("✅ Texto extraído com sucesso!")
@@ -248,15 +252,23 @@ if 'transcript_text' in st.session_state:
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        if st.button("✨ Gerar Resumo com IA", use_container_width=True, type="secondary"):
-            with st.spinner("🤖 Groq está analisando o vídeo..."):
-                resumo = resumir_transcricao(st.session_state['transcript_text'])
-                st.session_state['resumo_ia'] = resumo
+        gerar_resumo = st.button("✨ Gerar Resumo com IA", use_container_width=True, type="secondary")
+
+    if gerar_resumo:
+        st.markdown("### 📝 Resumo Inteligente")
+        st.caption("🤖 Groq está analisando o vídeo...")
+        resumo = resumir_transcricao(st.session_state['video_id'], st.session_state['transcript'])
+        st.session_state['resumo_ia'] = resumo
+        # Redesenha com o resumo final na caixa de destaque
+        st.rerun()
 
     # Exibição do Resumo
     if 'resumo_ia' in st.session_state:
         st.markdown("### 📝 Resumo Inteligente")
         st.info(st.session_state['resumo_ia'])
+        if 'resumo_stats' in st.session_state:
+            with st.expander("📊 Detalhes do resumo"):
+                st.json(st.session_state['resumo_stats'])
         st.download_button("📥 Baixar Resumo", st.session_state['resumo_ia'], "resumo_ia.txt")
 
     # Tabs para Transcrição
@@ -269,7 +281,7 @@ if 'transcript_text' in st.session_state:
         st.download_button("Baixar Texto", st.session_state['transcript_text'], "transcricao.txt")
         
     with tab2:
-        ts_text = "\n".join([f"[{e['timestamp']}] {e['text']}" for e in st.session_state['full_transcript']])
+        ts_text = st.session_state['transcript_ts_text']
         st.code(ts_text, language="text")
         st.download_button("Baixar com Tempo", ts_text, "transcricao_timestamps.txt")
 
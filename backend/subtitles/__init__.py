@@ -0,0 +1,61 @@
+"""
+Parsers de legendas (json3, WebVTT, SRV3/XML e TTML).
+
+Todos são geradores que produzem `Segment`, então dá para processar
+legendas de horas sem montar estruturas intermediárias na memória.
+"""
+from .segment import Segment
+from .json3 import parse_json3
+from .webvtt import parse_webvtt
+from .srv3 import parse_srv3
+from .ttml import parse_ttml
+from .transcript import Transcript
+from .index import IndexCache, TranscriptIndex
+
+PARSERS = {
+    "json3": parse_json3,
+    "vtt": parse_webvtt,
+    "srv3": parse_srv3,
+    "ttml": parse_ttml,
+}
+
+
+def detect_format(content) -> str:
+    if isinstance(content, dict):
+        return "json3"
+    head = content[:512]
+    if isinstance(head, bytes):
+        head = head.decode("utf-8", "ignore")
+    head = head.lstrip("﻿ \t\r\n")
+    if head.startswith("WEBVTT"):
+        return "vtt"
+    if head.startswith("{"):
+        return "json3"
+    if "<tt" in head:
+        return "ttml"
+    if "<timedtext" in head or "<transcript" in head:
+        return "srv3"
+    raise ValueError("Unknown subtitle format")
+
+
+def parse(content, fmt: str = None):
+    """Escolhe o parser pelo formato (ou detecta pelo conteúdo)."""
+    fmt = fmt or detect_format(content)
+    if fmt not in PARSERS:
+        raise ValueError(f"Unsupported subtitle format: {fmt}")
+    return PARSERS[fmt](content)
+
+
+__all__ = [
+    "Segment",
+    "Transcript",
+    "TranscriptIndex",
+    "IndexCache",
+    "parse",
+    "detect_format",
+    "parse_json3",
+    "parse_webvtt",
+    "parse_srv3",
+    "parse_ttml",
+    "PARSERS",
+]
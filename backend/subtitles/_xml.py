@@ -0,0 +1,58 @@
+import io
+import xml.etree.ElementTree as ET
+from typing import Iterator, List, Optional, Tuple, Union
+
+
+def iterparse_end(content: Union[str, bytes, io.IOBase]) -> Iterator[Tuple[str, ET.Element, Optional[ET.Element], ET.Element]]:
+    """
+    iterparse que entrega (tag_sem_namespace, elemento, pai, raiz) a cada
+    elemento fechado. Quem consome deve chamar `release` depois de usar.
+    """
+    if isinstance(content, str):
+        content = io.BytesIO(content.encode("utf-8"))
+    elif isinstance(content, bytes):
+        content = io.BytesIO(content)
+
+    # Elementos abertos, da raiz até o atual
+    stack: List[ET.Element] = []
+    for event, elem in ET.iterparse(content, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        tag = elem.tag
+        if tag[0] == "{":
+            tag = tag.rsplit("}", 1)[1]
+        yield tag, elem, stack[-1] if stack else None, stack[0] if stack else elem
+
+
+def release(elem: ET.Element, parent: Optional[ET.Element]):
+    """
+    Libera um elemento já processado. Só `clear()` não basta: o elemento vazio
+    continua pendurado no pai (<body>, <div>), que cresceria até o fim do arquivo.
+    """
+    elem.clear()
+    if parent is not None:
+        # O elemento recém-fechado é o único filho restante, então a busca é O(1)
+        parent.remove(elem)
+
+
+def element_text(elem: ET.Element) -> str:
+    """Texto de um elemento incluindo filhos (<s>, <span>), com <br/> virando espaço."""
+    if not len(elem):
+        return elem.text or ""
+    # O texto fica em .text/.tail dos filhos (<span> pode aninhar)
+    parts: List[str] = []
+
+    def walk(node: ET.Element):
+        if node.tag.endswith("br"):
+            parts.append(" ")
+        elif node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(elem)
+    return " ".join("".join(parts).split())
@@ -0,0 +1,115 @@
+"""
+Índice invertido por transcrição (palavra -> segmentos) para busca rápida.
+
+O índice é montado uma vez por Transcript; `IndexCache` guarda os índices
+dos vídeos consultados recentemente, então buscas repetidas no mesmo vídeo
+não varrem o texto de novo.
+"""
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+from .transcript import Transcript
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos ("Ação" -> "acao")."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(normalize(text))
+
+
+class TranscriptIndex:
+    """
+    Índice posicional: cada palavra aponta para suas posições globais no texto
+    (contando palavras), e `segment_of` diz a qual segmento cada posição pertence.
+    Frases são confirmadas por busca binária nas posições seguintes, então
+    também acham frases cortadas entre dois segmentos.
+    """
+    __slots__ = ("transcript", "postings", "segment_of")
+
+    def __init__(self, transcript: Transcript):
+        self.transcript = transcript
+        postings: Dict[str, array] = {}
+        segment_of = array("I")
+        position = 0
+        for i in range(len(transcript)):
+            for token in tokenize(transcript.text_at(i)):
+                bucket = postings.get(token)
+                if bucket is None:
+                    bucket = postings[token] = array("I")
+                bucket.append(position)
+                segment_of.append(i)
+                position += 1
+        self.postings = postings
+        self.segment_of = segment_of
+
+    def search(self, query: str, limit: int = 100) -> List[int]:
+        """Índices dos segmentos onde a palavra/frase começa, em ordem."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        term_postings = []
+        for term in terms:
+            positions = self.postings.get(term)
+            if positions is None:
+                return []
+            term_postings.append(positions)
+
+        matches: List[int] = []
+        segment_of = self.segment_of
+        following = list(enumerate(term_postings[1:], 1))
+        for p in term_postings[0]:
+            if all(_contains(positions, p + offset) for offset, positions in following):
+                segment = segment_of[p]
+                if not matches or matches[-1] != segment:
+                    matches.append(segment)
+                    if len(matches) >= limit:
+                        break
+        return matches
+
+
+def _contains(positions: array, value: int) -> bool:
+    i = bisect_left(positions, value)
+    return i < len(positions) and positions[i] == value
+
+
+class IndexCache:
+    """LRU de índices, invalidado quando a Transcript da chave muda."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, TranscriptIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, key: Hashable, transcript: Transcript) -> Optional[TranscriptIndex]:
+        """Índice já construído para esta Transcript, ou None (nunca constrói)."""
+        with self._lock:
+            index: Optional[TranscriptIndex] = self._entries.get(key)
+            if index is not None and index.transcript is transcript:
+                self._entries.move_to_end(key)
+                return index
+        return None
+
+    def get(self, key: Hashable, transcript: Transcript) -> TranscriptIndex:
+        index = self.peek(key, transcript)
+        if index is not None:
+            return index
+
+        index = TranscriptIndex(transcript)
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
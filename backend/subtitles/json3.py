@@ -0,0 +1,28 @@
+import json
+from typing import Iterator, Union
+
+from .segment import Segment, unescape
+
+
+def parse_json3(content: Union[dict, str, bytes]) -> Iterator[Segment]:
+    """Formato JSON3 do YouTube (timedtext fmt=json3)."""
+    data = content if isinstance(content, dict) else json.loads(content)
+    for event in data.get('events', ()):
+        segs = event.get('segs')
+        if not segs:
+            continue
+        if len(segs) == 1:
+            text = segs[0].get('utf8', '')
+        else:
+            text = "".join([s.get('utf8', '') for s in segs])
+        if "&" in text:
+            text = unescape(text)
+        # Legendas automáticas usam "\n" para quebrar linha dentro do evento
+        text = " ".join(text.split())
+        if not text:
+            continue
+        yield Segment(
+            event.get('tStartMs', 0) / 1000.0,
+            event.get('dDurationMs', 0) / 1000.0,
+            text,
+        )
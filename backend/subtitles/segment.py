@@ -0,0 +1,37 @@
+import html
+import re
+from typing import NamedTuple
+
+# Tags inline (<c>, <v Fulano>, <00:00:01.000>, <i>, ...)
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+class Segment(NamedTuple):
+    """Segmento compacto (tupla, sem __dict__) com tempos em segundos."""
+    start: float
+    duration: float
+    text: str
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def as_dict(self) -> dict:
+        return {"text": self.text, "start": self.start, "duration": self.duration}
+
+
+def unescape(text: str) -> str:
+    """Decodifica entidades HTML, inclusive as escapadas duas vezes ("&amp;#39;")."""
+    text = html.unescape(text)
+    if "&" in text:
+        text = html.unescape(text)
+    return text
+
+
+def clean_text(text: str) -> str:
+    """Remove tags inline, decodifica entidades e normaliza espaços."""
+    if "<" in text:
+        text = _TAG_RE.sub("", text)
+    if "&" in text:
+        text = unescape(text)
+    return " ".join(text.split())
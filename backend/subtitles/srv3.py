@@ -0,0 +1,26 @@
+from typing import Iterator, Union
+
+from ._xml import element_text, iterparse_end, release
+from .segment import Segment, clean_text
+
+
+def parse_srv3(content: Union[str, bytes]) -> Iterator[Segment]:
+    """
+    XML do timedtext do YouTube:
+    - srv3: <timedtext format="3"><body><p t="ms" d="ms"><s>...</s></p>
+    - srv1: <transcript><text start="s" dur="s">...</text>
+    """
+    for tag, elem, parent, _ in iterparse_end(content):
+        if tag == "p":
+            start = int(elem.get("t", 0)) / 1000.0
+            duration = int(elem.get("d", 0)) / 1000.0
+        elif tag == "text":
+            start = float(elem.get("start", 0))
+            duration = float(elem.get("dur", 0))
+        else:
+            continue
+
+        text = clean_text(element_text(elem))
+        release(elem, parent)
+        if text:
+            yield Segment(start, duration, text)
@@ -0,0 +1,62 @@
+"""
+Parse incremental de arquivos de legenda que só crescem (lives).
+
+`resume_offset` marca onde o próximo parse parcial deve começar, `parse_tail`
+parseia só esse trecho e `merge_tail` troca o fim da transcrição guardada pelo
+trecho novo. Usado pelo live.py a cada consulta.
+"""
+import json
+from bisect import bisect_left
+from typing import Optional, Tuple
+
+from .json3 import parse_json3
+from .transcript import Transcript
+from .webvtt import parse_webvtt
+
+
+def resume_offset(body: bytes, fmt: str) -> Optional[int]:
+    """
+    Posição a partir da qual o próximo parse parcial começa: o último evento
+    do json3, a penúltima cue do WebVTT (None = formato sem parse parcial).
+    """
+    if fmt == "json3":
+        # Só os eventos têm tStartMs (os "segs" internos usam tOffsetMs)
+        key = body.rfind(b'"tStartMs"')
+        start = body.rfind(b"{", 0, key) if key > 0 else -1
+        return start if start > 0 else None
+    if fmt == "vtt":
+        # Uma cue antes da última: o parse do trecho precisa das linhas dela para
+        # descartar as repetições das legendas rolantes (ver parse_tail)
+        cut = len(body.rstrip())
+        for _ in range(2):
+            cut = max(body.rfind(b"\n\n", 0, cut), body.rfind(b"\r\n\r\n", 0, cut))
+            if cut <= 0:
+                return None
+        return cut + 1
+    return None
+
+
+def parse_tail(tail: bytes, fmt: str) -> Transcript:
+    """
+    Parseia só os eventos a partir de `resume_offset`. No WebVTT a primeira
+    cue do trecho já está na transcrição guardada e só serve de contexto.
+    """
+    if fmt == "json3":
+        events = tail[:tail.rindex(b"]")].rstrip()
+        return Transcript.from_segments(parse_json3({"events": json.loads(b"[" + events + b"]")}))
+    return Transcript.from_segments(parse_webvtt(tail, context_cues=1))
+
+
+def first_difference(old: Transcript, new: Transcript, index: int = 0) -> int:
+    """Índice do primeiro segmento diferente a partir de `index` (== len dos dois se forem iguais)."""
+    limit = min(len(old), len(new))
+    while index < limit and old.starts[index] == new.starts[index] and old.text_at(index) == new.text_at(index):
+        index += 1
+    return index
+
+
+def merge_tail(stored: Transcript, tail: Transcript) -> Tuple[Transcript, int]:
+    """Troca os segmentos a partir do início do primeiro segmento do trecho novo."""
+    keep = bisect_left(stored.starts, tail.starts[0])
+    merged = Transcript.concat([stored.slice(0, keep), tail])
+    return merged, first_difference(stored, merged, keep)
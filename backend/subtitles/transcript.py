@@ -0,0 +1,286 @@
+"""
+Estrutura compacta para transcrições.
+
+Em vez de uma lista de dicts (um dict + 3 objetos por segmento) e de uma
+cópia separada do texto completo, guardamos:
+
+- `starts` e `durations` em arrays tipados (8 bytes por número)
+- todo o texto num único buffer, com os segmentos separados por espaço
+- `offsets` com a posição de início de cada segmento no buffer
+
+Como os segmentos já estão separados por espaço, o `full_text` é o próprio buffer.
+"""
+import hashlib
+import json
+import re
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional, Union
+
+from .segment import Segment
+
+_dumps = json.dumps
+
+
+def _clock(seconds: float, separator: str) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separator}{ms:03d}"
+
+
+# Pontuação que o Markdown interpretaria (ênfase, links, HTML, entidades, tabelas)
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>#|~&])")
+
+
+def _md_escape(text: str) -> str:
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", text.replace("\n", " "))
+
+
+def _hms(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Transcript:
+    __slots__ = ("starts", "durations", "offsets", "text", "_max_duration", "_fingerprint")
+
+    def __init__(self, starts: array, durations: array, offsets: array, text: str):
+        self.starts = starts
+        self.durations = durations
+        # len(offsets) == len(starts) + 1; o último aponta para o fim do buffer (+1 do separador)
+        self.offsets = offsets
+        self.text = text
+        self._max_duration: Optional[float] = None
+        self._fingerprint: Optional[str] = None
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Union[Segment, dict]]) -> "Transcript":
+        starts = array("d")
+        durations = array("d")
+        offsets = array("I", [0])
+        texts: List[str] = []
+        position = 0
+        for segment in segments:
+            if isinstance(segment, dict):
+                start, duration, text = segment["start"], segment["duration"], segment["text"]
+            else:
+                start, duration, text = segment
+            starts.append(start)
+            durations.append(duration)
+            texts.append(text)
+            position += len(text) + 1
+            offsets.append(position)
+        return cls(starts, durations, offsets, " ".join(texts))
+
+    @classmethod
+    def empty(cls) -> "Transcript":
+        return cls(array("d"), array("d"), array("I", [0]), "")
+
+    @classmethod
+    def concat(cls, parts: List["Transcript"]) -> "Transcript":
+        """Junta transcrições consecutivas sem recriar os segmentos um a um."""
+        parts = [part for part in parts if part]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        starts = array("d")
+        durations = array("d")
+        offsets = array("I", [0])
+        base = 0
+        for part in parts:
+            starts.extend(part.starts)
+            durations.extend(part.durations)
+            offsets.extend(o + base for o in part.offsets[1:])
+            base += part.offsets[-1]
+        return cls(starts, durations, offsets, " ".join(part.text for part in parts))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+
+    def text_at(self, index: int) -> str:
+        return self.text[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def __getitem__(self, index: int) -> Segment:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return Segment(self.starts[index], self.durations[index], self.text_at(index))
+
+    def __iter__(self) -> Iterator[Segment]:
+        starts, durations, offsets, text = self.starts, self.durations, self.offsets, self.text
+        for i in range(len(starts)):
+            yield Segment(starts[i], durations[i], text[offsets[i]:offsets[i + 1] - 1])
+
+    @property
+    def full_text(self) -> str:
+        return self.text
+
+    @property
+    def duration(self) -> float:
+        if not self.starts:
+            return 0.0
+        return max(self.starts[-1] + self.durations[-1], self.starts[-1])
+
+    def fingerprint(self) -> str:
+        """Hash curto do conteúdo (texto + tempos), calculado uma vez."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(self.text.encode("utf-8"))
+            digest.update(self.starts.tobytes())
+            self._fingerprint = digest.hexdigest()[:16]
+        return self._fingerprint
+
+    # Fatias
+
+    def slice(self, first: int, last: int) -> "Transcript":
+        """Segmentos [first, last) como uma nova Transcript."""
+        first = max(0, first)
+        last = min(len(self), last)
+        if first >= last:
+            return Transcript.empty()
+        base = self.offsets[first]
+        offsets = array("I", (o - base for o in self.offsets[first:last + 1]))
+        text = self.text[base:self.offsets[last] - 1]
+        return Transcript(self.starts[first:last], self.durations[first:last], offsets, text)
+
+    def index_range(self, start: float, end: float):
+        """
+        Índices [first, last): do primeiro segmento que se sobrepõe a [start, end)
+        até o último que começa antes de `end`. Quando um segmento longo cobre
+        `start`, segmentos curtos depois dele que já terminaram antes de `start`
+        ficam dentro da faixa; `slice_time` os remove.
+        """
+        if self._max_duration is None:
+            self._max_duration = max(self.durations) if self.durations else 0.0
+        # Um segmento que começa antes de `start - maior duração` não pode alcançar `start`
+        first = bisect_left(self.starts, start - self._max_duration)
+        starts, durations = self.starts, self.durations
+        while first < len(starts) and starts[first] + durations[first] <= start and starts[first] < start:
+            first += 1
+        last = bisect_left(starts, end)
+        return first, max(first, last)
+
+    def slice_time(self, start: float, end: float) -> "Transcript":
+        """Só os segmentos que se sobrepõem a [start, end)."""
+        first, last = self.index_range(start, end)
+        starts, durations = self.starts, self.durations
+        stale = set()
+        for i in range(first, last):
+            if starts[i] >= start:
+                break
+            if starts[i] + durations[i] <= start:
+                stale.add(i)
+        if not stale:
+            return self.slice(first, last)
+        return Transcript.from_segments(self[i] for i in range(first, last) if i not in stale)
+
+    # Serialização
+
+    def to_dicts(self) -> List[dict]:
+        return [{"text": t, "start": s, "duration": d} for s, d, t in self]
+
+    def to_columnar(self) -> dict:
+        return {
+            "start": self.starts.tolist(),
+            "duration": self.durations.tolist(),
+            "text": [segment.text for segment in self],
+        }
+
+    def to_compact(self) -> dict:
+        """Forma usada no cache em disco (JSON): texto inteiro + offsets."""
+        return {
+            "starts": self.starts.tolist(),
+            "durations": self.durations.tolist(),
+            "offsets": self.offsets.tolist(),
+            "text": self.text,
+        }
+
+    @classmethod
+    def from_compact(cls, data: dict) -> "Transcript":
+        return cls(
+            array("d", data["starts"]),
+            array("d", data["durations"]),
+            array("I", data["offsets"]),
+            data["text"],
+        )
+
+    def iter_json(self, chunk_size: int = 500) -> Iterator[str]:
+        """Lista JSON de segmentos gerada em pedaços, sem montar os dicts."""
+        yield "["
+        starts, durations = self.starts, self.durations
+        n = len(self)
+        for first in range(0, n, chunk_size):
+            parts = []
+            for i in range(first, min(n, first + chunk_size)):
+                parts.append(
+                    f'{"," if i else ""}{{"text":{_dumps(self.text_at(i), ensure_ascii=False)},'
+                    f'"start":{starts[i]!r},"duration":{durations[i]!r}}}'
+                )
+            yield "".join(parts)
+        yield "]"
+
+    def iter_srt(self, chunk_size: int = 500) -> Iterator[str]:
+        starts, durations = self.starts, self.durations
+        n = len(self)
+        for first in range(0, n, chunk_size):
+            parts = []
+            for i in range(first, min(n, first + chunk_size)):
+                parts.append(
+                    f"{i + 1}\n{_clock(starts[i], ',')} --> {_clock(starts[i] + durations[i], ',')}\n"
+                    f"{self.text_at(i)}\n\n"
+                )
+            yield "".join(parts)
+
+    def iter_vtt(self, chunk_size: int = 500) -> Iterator[str]:
+        yield "WEBVTT\n\n"
+        starts, durations = self.starts, self.durations
+        n = len(self)
+        for first in range(0, n, chunk_size):
+            parts = []
+            for i in range(first, min(n, first + chunk_size)):
+                parts.append(
+                    f"{_clock(starts[i], '.')} --> {_clock(starts[i] + durations[i], '.')}\n"
+                    f"{self.text_at(i)}\n\n"
+                )
+            yield "".join(parts)
+
+    def iter_text(self, timestamps: bool = False, chunk_size: int = 500) -> Iterator[str]:
+        """Um segmento por linha, opcionalmente com "[HH:MM:SS] " na frente."""
+        starts = self.starts
+        n = len(self)
+        for first in range(0, n, chunk_size):
+            last = min(n, first + chunk_size)
+            if timestamps:
+                yield "".join(f"[{_hms(starts[i])}] {self.text_at(i)}\n" for i in range(first, last))
+            else:
+                yield "".join(f"{self.text_at(i)}\n" for i in range(first, last))
+
+    def iter_markdown(self, title: Optional[str] = None, url: Optional[str] = None, chunk_size: int = 500) -> Iterator[str]:
+        """Markdown com um item por segmento; com `url`, os tempos viram links para o vídeo."""
+        if title:
+            yield f"# {_md_escape(title)}\n\n"
+        starts = self.starts
+        n = len(self)
+        for first in range(0, n, chunk_size):
+            parts = []
+            for i in range(first, min(n, first + chunk_size)):
+                stamp = _hms(starts[i])
+                if url:
+                    stamp = f"[{stamp}]({url}&t={int(starts[i])}s)"
+                parts.append(f"- **{stamp}** {_md_escape(self.text_at(i))}\n")
+            yield "".join(parts)
+
+    def to_srt(self) -> str:
+        return "".join(self.iter_srt())
+
+    def to_vtt(self) -> str:
+        return "".join(self.iter_vtt())
+
+    def to_json(self) -> str:
+        return "".join(self.iter_json())
@@ -0,0 +1,64 @@
+import re
+from typing import Iterator, Optional, Union
+
+from ._xml import element_text, iterparse_end, release
+from .segment import Segment, clean_text
+
+_TTP_NS = "{http://www.w3.org/ns/ttml#parameter}"
+_CLOCK_RE = re.compile(r"^(\d+):(\d{2}):(\d{2})(?:([.:])(\d+))?$")
+_OFFSET_RE = re.compile(r"^([\d.]+)(h|m|s|ms|f|t)$")
+
+
+def parse_time(value: Optional[str], frame_rate: float = 30.0, tick_rate: float = 1.0) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    m = _CLOCK_RE.match(value)
+    if m:
+        h, mi, s, sep, frac = m.groups()
+        seconds = int(h) * 3600 + int(mi) * 60 + int(s)
+        if frac:
+            # "hh:mm:ss.fff" (fração) ou "hh:mm:ss:ff" (frames)
+            seconds += float("0." + frac) if sep == "." else int(frac) / frame_rate
+        return seconds
+    m = _OFFSET_RE.match(value)
+    if m:
+        number, unit = float(m.group(1)), m.group(2)
+        if unit == "h":
+            return number * 3600
+        if unit == "m":
+            return number * 60
+        if unit == "s":
+            return number
+        if unit == "ms":
+            return number / 1000.0
+        if unit == "f":
+            return number / frame_rate
+        return number / tick_rate
+    raise ValueError(f"Invalid TTML time expression: {value}")
+
+
+def parse_ttml(content: Union[str, bytes]) -> Iterator[Segment]:
+    """TTML / DFXP: <tt><body><div><p begin=".." end=".." | dur="..">."""
+    frame_rate = 30.0
+    tick_rate = 1.0
+    rates_read = False
+
+    for tag, elem, parent, root in iterparse_end(content):
+        if not rates_read:
+            frame_rate = float(root.get(_TTP_NS + "frameRate", frame_rate))
+            tick_rate = float(root.get(_TTP_NS + "tickRate", tick_rate))
+            rates_read = True
+        if tag != "p":
+            continue
+
+        start = parse_time(elem.get("begin"), frame_rate, tick_rate) or 0.0
+        end = parse_time(elem.get("end"), frame_rate, tick_rate)
+        duration = parse_time(elem.get("dur"), frame_rate, tick_rate)
+        if duration is None:
+            duration = (end - start) if end is not None else 0.0
+
+        text = clean_text(element_text(elem))
+        release(elem, parent)
+        if text:
+            yield Segment(start, duration, text)
@@ -0,0 +1,115 @@
+import re
+from typing import Iterable, Iterator, List, Optional, Union
+
+from .segment import Segment, clean_text
+
+# 00:00:01.000 --> 00:00:02.000 [configurações da cue]; as horas são opcionais
+_CUE_TIMING_RE = re.compile(
+    r"^(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})"
+)
+
+
+def _seconds(h, m, s, ms) -> float:
+    return (int(h) * 3600 if h else 0) + int(m) * 60 + int(s) + int(ms) / 1000.0
+
+
+# As cues de transição das legendas rolantes duram ~10ms
+_ROLLING_CUE_MAX = 0.05
+
+
+def parse_webvtt(content: Union[str, bytes, Iterable[str]], context_cues: int = 0) -> Iterator[Segment]:
+    """
+    WebVTT: ignora cabeçalho, blocos NOTE/STYLE/REGION, identificadores de cue
+    e configurações de posição; remove tags inline (<c>, <v>, timestamps de palavra).
+
+    Legendas automáticas do YouTube são "rolantes": cada cue repete na primeira
+    linha a última linha da cue anterior, e entre elas há cues de ~10ms só com
+    a linha repetida. As linhas repetidas são descartadas, então cada fala
+    aparece uma vez. Só nesse caso: quando a cue anterior se sobrepõe a esta
+    ou uma das duas é uma cue de transição. Em legendas manuais, uma fala
+    repetida em cues seguidas ("Não." / "Não.") é mantida.
+
+    As primeiras `context_cues` cues só servem de "cue anterior" para esse
+    descarte e não geram segmentos (parse de um trecho do arquivo).
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    lines = content.splitlines() if isinstance(content, str) else content
+
+    timing_match = _CUE_TIMING_RE.match
+    start = end = None
+    parts: List[str] = []
+    previous: List[str] = []
+    previous_start = previous_end = 0.0
+    skipping_block = False
+
+    def finish_cue() -> Optional[Segment]:
+        nonlocal previous, previous_start, previous_end, context_cues
+        cue_lines = [text for text in (clean_text(part) for part in parts) if text]
+        if not cue_lines:
+            return None
+        rolling = previous and (
+            previous_end > start
+            or end - start <= _ROLLING_CUE_MAX
+            or previous_end - previous_start <= _ROLLING_CUE_MAX
+        )
+        candidates = previous if rolling else []
+        previous, previous_start, previous_end = cue_lines, start, end
+        if context_cues > 0:
+            context_cues -= 1
+            return None
+        # Linhas do começo que só repetem o fim da cue anterior
+        overlap = min(len(cue_lines), len(candidates))
+        while overlap and cue_lines[:overlap] != candidates[-overlap:]:
+            overlap -= 1
+        if overlap == len(cue_lines):
+            return None
+        return Segment(start, end - start, " ".join(cue_lines[overlap:]))
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            # Linha vazia termina a cue (ou o bloco NOTE/STYLE)
+            if parts:
+                segment = finish_cue()
+                if segment:
+                    yield segment
+                parts = []
+            start = None
+            skipping_block = False
+            continue
+        line = line.strip()
+        if skipping_block or not line:
+            # Linhas só com espaços (comuns nas legendas automáticas) não terminam a cue
+            continue
+
+        if start is None:
+            m = timing_match(line)
+            if m:
+                g = m.groups()
+                start = _seconds(*g[:4])
+                end = _seconds(*g[4:])
+            elif line.startswith(("NOTE", "STYLE", "REGION")):
+                skipping_block = True
+            # Cabeçalho WEBVTT, X-TIMESTAMP-MAP e identificadores de cue são ignorados
+            continue
+
+        m = timing_match(line)
+        if m:
+            # Cue sem linha em branco antes da próxima (arquivos mal formados)
+            if parts:
+                segment = finish_cue()
+                if segment:
+                    yield segment
+                parts = []
+            g = m.groups()
+            start = _seconds(*g[:4])
+            end = _seconds(*g[4:])
+            continue
+
+        parts.append(line)
+
+    if parts and start is not None:
+        segment = finish_cue()
+        if segment:
+            yield segment
@@ -0,0 +1,448 @@
+"""
+Resumo de transcrições longas em map-reduce.
+
+1. Divide a transcrição em blocos nos limites dos segmentos, com tamanho
+   estimado em tokens (e marcações de tempo para o modelo se situar)
+2. Resume os blocos em paralelo, com um número limitado de chamadas simultâneas
+3. Junta os resumos parciais num resumo final (em mais de uma rodada se preciso)
+
+O cliente é qualquer cliente compatível com a API da OpenAI (Groq, local, etc).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from cache import get_cache
+import metrics
+import streaming
+from subtitles import Transcript
+
+DEFAULT_MODEL = os.environ.get("LLM_MODEL", "llama-3.3-70b-versatile")
+CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 6000))
+MAX_PARALLEL = int(os.environ.get("SUMMARY_MAX_PARALLEL", 4))
+TEMPERATURE = 0.5
+SUMMARY_CACHE_TTL = int(os.environ.get("SUMMARY_CACHE_TTL", 7 * 24 * 3600))
+
+SYSTEM_PROMPT = "Você é um assistente útil que resume vídeos com precisão."
+
+FINAL_PROMPT = """
+Atue como um assistente especialista em resumir vídeos do YouTube.
+Faça um resumo estruturado e profissional do texto abaixo.
+Use tópicos (bullet points) claros e destaque as conclusões principais.
+Responda SEMPRE em Português do Brasil.
+
+Texto do vídeo:
+{text}
+"""
+
+MAP_PROMPT = """
+Este é o trecho {index} de {total} da transcrição de um vídeo do YouTube ({start} a {end}).
+Resuma os pontos principais deste trecho em tópicos curtos, mantendo nomes,
+números e as marcações de tempo mais importantes. Não escreva introdução nem conclusão.
+Responda em Português do Brasil.
+
+Trecho:
+{text}
+"""
+
+REDUCE_PROMPT = """
+Atue como um assistente especialista em resumir vídeos do YouTube.
+Abaixo estão resumos parciais, em ordem, de trechos consecutivos de um mesmo vídeo.
+Combine-os num único resumo estruturado e profissional do vídeo inteiro.
+Use tópicos (bullet points) claros e destaque as conclusões principais.
+Responda SEMPRE em Português do Brasil.
+
+Resumos parciais:
+{text}
+"""
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def estimate_tokens(text: str) -> int:
+        return len(_encoding.encode(text, disallowed_special=()))
+except ImportError:
+    def estimate_tokens(text: str) -> int:
+        # Aproximação comum para texto em português/inglês: ~4 caracteres por token
+        return len(text) // 4 + 1
+
+
+def _clock(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Chunk(NamedTuple):
+    start: float
+    end: float
+    text: str
+    tokens: int
+
+
+class SummaryResult(NamedTuple):
+    text: str
+    chunks: int
+    # Segundos por etapa: chunking, map, reduce, total
+    stages: Dict[str, float]
+    # prompt_tokens, completion_tokens, total_tokens, calls, reduce_rounds
+    usage: Dict[str, int]
+
+
+def chunk_transcript(transcript: Transcript, max_tokens: int = CHUNK_TOKENS, marker_every: float = 60.0) -> List[Chunk]:
+    """Agrupa segmentos inteiros em blocos de até `max_tokens` tokens estimados."""
+    chunks: List[Chunk] = []
+    parts: List[str] = []
+    tokens = 0
+    chunk_start = None
+    last_marker = None
+    end = 0.0
+
+    for segment in transcript:
+        # Marca de tempo a cada minuto, para o modelo poder citar momentos do vídeo
+        piece = segment.text
+        if last_marker is None or segment.start - last_marker >= marker_every:
+            piece = f"[{_clock(segment.start)}] {piece}"
+            last_marker = segment.start
+        piece_tokens = estimate_tokens(piece) + 1
+
+        if parts and tokens + piece_tokens > max_tokens:
+            chunks.append(Chunk(chunk_start, end, " ".join(parts), tokens))
+            parts, tokens, chunk_start = [], 0, None
+            piece = f"[{_clock(segment.start)}] {segment.text}"
+            last_marker = segment.start
+            piece_tokens = estimate_tokens(piece) + 1
+
+        if chunk_start is None:
+            chunk_start = segment.start
+        parts.append(piece)
+        tokens += piece_tokens
+        end = segment.start + segment.duration
+
+    if parts:
+        chunks.append(Chunk(chunk_start, end, " ".join(parts), tokens))
+    return chunks
+
+
+class _Usage:
+    # Somado a partir das threads do map, por isso o lock
+    def __init__(self):
+        self.totals = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "calls": 0, "reduce_rounds": 0}
+        self._lock = threading.Lock()
+
+    def add(self, usage):
+        with self._lock:
+            self.totals["calls"] += 1
+            if usage is None:
+                return
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                self.totals[key] += getattr(usage, key, 0) or 0
+
+
+def _chat_kwargs(model: str, prompt: str) -> dict:
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=TEMPERATURE,
+    )
+
+
+def _complete(client, model: str, prompt: str, usage: _Usage) -> str:
+    response = client.chat.completions.create(**_chat_kwargs(model, prompt))
+    usage.add(getattr(response, "usage", None))
+    return response.choices[0].message.content
+
+
+def _stream_usage(chunk):
+    # OpenAI manda `usage` no último chunk; a Groq manda em `x_groq.usage`
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        x_groq = getattr(chunk, "x_groq", None)
+        usage = x_groq.get("usage") if isinstance(x_groq, dict) else getattr(x_groq, "usage", None)
+    if isinstance(usage, dict):
+        usage = SimpleNamespace(**usage)
+    return usage
+
+
+def _complete_stream(client, model: str, prompt: str, usage: _Usage) -> Iterator[str]:
+    reported = None
+    completion_chars = 0
+    for chunk in client.chat.completions.create(stream=True, **_chat_kwargs(model, prompt)):
+        reported = _stream_usage(chunk) or reported
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            completion_chars += len(delta)
+            yield delta
+    if reported is None:
+        # Servidor não informou o uso no stream: estimativa
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = completion_chars // 4 + 1
+        reported = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+    usage.add(reported)
+
+
+def _reduce_prompt(client, model: str, partials: List[str], max_tokens: int, max_parallel: int, usage: _Usage) -> str:
+    """
+    Junta os parciais e devolve o prompt da chamada final. Se não couberem numa
+    chamada, reduz antes em grupos (várias rodadas).
+    """
+    while True:
+        joined = "\n\n".join(partials)
+        if estimate_tokens(joined) <= max_tokens or len(partials) <= 2:
+            return REDUCE_PROMPT.format(text=joined)
+
+        groups: List[List[str]] = [[]]
+        group_tokens = 0
+        for partial in partials:
+            partial_tokens = estimate_tokens(partial)
+            if groups[-1] and group_tokens + partial_tokens > max_tokens:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(partial)
+            group_tokens += partial_tokens
+
+        if len(groups) == len(partials):
+            # Cada parcial sozinho já estoura o limite: junta de dois em dois
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+
+        usage.totals["reduce_rounds"] += 1
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            partials = list(pool.map(
+                lambda group: _complete(client, model, REDUCE_PROMPT.format(text="\n\n".join(group)), usage),
+                groups,
+            ))
+
+
+# Tempo até o primeiro token dos resumos recentes (segundos)
+_ttft_samples = deque(maxlen=500)
+_ttft_lock = threading.Lock()
+
+
+def record_ttft(seconds: float):
+    with _ttft_lock:
+        _ttft_samples.append(seconds)
+    metrics.LLM_TTFT_SECONDS.observe(seconds)
+
+
+def ttft_stats() -> dict:
+    with _ttft_lock:
+        samples = sorted(_ttft_samples)
+    if not samples:
+        return {"count": 0}
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))]
+
+    return {
+        "count": len(samples),
+        "avg": sum(samples) / len(samples),
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "max": samples[-1],
+    }
+
+
+class SummaryStream:
+    """
+    Resumo com a resposta final em streaming.
+
+    O map (e rodadas intermediárias do reduce) roda como antes; só a última
+    chamada é transmitida token a token. Iterar sobre o objeto gera os trechos
+    de texto (serve direto no `st.write_stream`); `events()` também inclui
+    mensagens de progresso. No fim, `result` tem o SummaryResult completo.
+
+    Com `video_id` informado, usa o cache de resumos.
+    """
+
+    def __init__(
+        self,
+        client,
+        transcript: Transcript,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = CHUNK_TOKENS,
+        max_parallel: int = MAX_PARALLEL,
+        on_progress: Optional[Callable[[str], None]] = None,
+        video_id: Optional[str] = None,
+        language: Optional[str] = None,
+    ):
+        self.client = client
+        self.transcript = transcript
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_parallel = max(1, max_parallel)
+        self.on_progress = on_progress or (lambda message: None)
+        self.video_id = video_id
+        self.language = language
+        self.result: Optional[SummaryResult] = None
+        self.from_cache = False
+
+    def events(self) -> Iterator[Tuple[str, str]]:
+        if self.video_id is not None:
+            cached = get_cached_summary(self.video_id, self.language, self.transcript, self.model, self.max_tokens)
+            if cached is not None:
+                self.result, self.from_cache = cached, True
+                yield ("delta", cached.text)
+                return
+
+        usage = _Usage()
+        stages: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        chunks = chunk_transcript(self.transcript, self.max_tokens)
+        stages["chunking"] = time.perf_counter() - started
+        if not chunks:
+            self.result = SummaryResult("", 0, stages, usage.totals)
+            return
+
+        if len(chunks) == 1:
+            # Vídeo curto: uma chamada só, sem map-reduce
+            stages["map"] = 0.0
+            reduce_started = time.perf_counter()
+            prompt = FINAL_PROMPT.format(text=chunks[0].text)
+        else:
+            yield ("progress", f"Resumindo {len(chunks)} trechos...")
+            t0 = time.perf_counter()
+
+            def summarize_chunk(item):
+                index, chunk = item
+                prompt = MAP_PROMPT.format(
+                    index=index + 1, total=len(chunks), start=_clock(chunk.start), end=_clock(chunk.end), text=chunk.text
+                )
+                return _complete(self.client, self.model, prompt, usage)
+
+            with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+                partials = list(pool.map(summarize_chunk, enumerate(chunks)))
+            stages["map"] = time.perf_counter() - t0
+
+            yield ("progress", "Combinando os resumos parciais...")
+            reduce_started = time.perf_counter()
+            prompt = _reduce_prompt(self.client, self.model, partials, self.max_tokens, self.max_parallel, usage)
+
+        parts: List[str] = []
+        for delta in _complete_stream(self.client, self.model, prompt, usage):
+            if not parts:
+                stages["ttft"] = time.perf_counter() - started
+                record_ttft(stages["ttft"])
+            parts.append(delta)
+            yield ("delta", delta)
+
+        stages["reduce"] = time.perf_counter() - reduce_started
+        stages["total"] = time.perf_counter() - started
+        self.result = SummaryResult("".join(parts), len(chunks), stages, usage.totals)
+        if self.video_id is not None:
+            store_summary(self.video_id, self.language, self.transcript, self.result, self.model, self.max_tokens)
+
+    def sse(self) -> Iterator[str]:
+        """Eventos SSE do endpoint /summary: progress*, delta*, done (ou error no fim)."""
+        try:
+            for kind, payload in self.events():
+                if kind == "delta":
+                    yield streaming.sse_event({"text": payload}, "delta")
+                else:
+                    yield streaming.sse_event({"message": payload}, "progress")
+            yield streaming.sse_event({
+                "video_id": self.video_id,
+                "cached": self.from_cache,
+                "chunks": self.result.chunks,
+                "stages": self.result.stages,
+                "usage": self.result.usage,
+            }, "done")
+        except Exception as e:
+            yield streaming.sse_event({"detail": f"Erro ao gerar resumo: {e}"}, "error")
+
+    def __iter__(self) -> Iterator[str]:
+        for kind, payload in self.events():
+            if kind == "delta":
+                yield payload
+            else:
+                self.on_progress(payload)
+
+
+def summarize(
+    client,
+    transcript: Transcript,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = CHUNK_TOKENS,
+    max_parallel: int = MAX_PARALLEL,
+    on_progress: Optional[Callable[[str], None]] = None,
+) -> SummaryResult:
+    stream = SummaryStream(client, transcript, model, max_tokens, max_parallel, on_progress)
+    for _ in stream:
+        pass
+    return stream.result
+
+
+def prompt_hash(max_tokens: int = CHUNK_TOKENS) -> str:
+    """Muda sempre que os prompts ou o tamanho dos blocos mudam (invalida o cache)."""
+    raw = "\x00".join([SYSTEM_PROMPT, FINAL_PROMPT, MAP_PROMPT, REDUCE_PROMPT, str(max_tokens), str(TEMPERATURE)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def transcript_hash(transcript: Transcript) -> str:
+    return transcript.fingerprint()
+
+
+def summary_cache_source(transcript: Transcript, model: str, max_tokens: int) -> str:
+    return f"summary:{model}:{prompt_hash(max_tokens)}:{transcript_hash(transcript)}"
+
+
+def get_cached_summary(
+    video_id: str,
+    language: Optional[str],
+    transcript: Transcript,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = CHUNK_TOKENS,
+) -> Optional[SummaryResult]:
+    cached = get_cache().get(video_id, language, summary_cache_source(transcript, model, max_tokens))
+    if isinstance(cached, dict):
+        return SummaryResult(cached["text"], cached["chunks"], cached["stages"], cached["usage"])
+    return None
+
+
+def store_summary(
+    video_id: str,
+    language: Optional[str],
+    transcript: Transcript,
+    result: SummaryResult,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = CHUNK_TOKENS,
+):
+    if result.text:
+        get_cache().set(
+            video_id, language, summary_cache_source(transcript, model, max_tokens),
+            result._asdict(), ttl=SUMMARY_CACHE_TTL,
+        )
+
+
+def summarize_cached(
+    client,
+    video_id: str,
+    language: Optional[str],
+    transcript: Transcript,
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = CHUNK_TOKENS,
+    max_parallel: int = MAX_PARALLEL,
+    on_progress: Optional[Callable[[str], None]] = None,
+) -> Tuple[SummaryResult, bool]:
+    """
+    Resumo com cache por (video_id, language, model, hash dos prompts, hash da transcrição).
+    Retorna (resultado, veio_do_cache).
+    """
+    stream = SummaryStream(client, transcript, model, max_tokens, max_parallel, on_progress, video_id, language)
+    for _ in stream:
+        pass
+    return stream.result, stream.from_cache
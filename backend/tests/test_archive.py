@@ -0,0 +1,110 @@
+"""
+Arquivo compactado: ida e volta, leitura por intervalo, compact e registros
+corrompidos, inclusive com dois processos (aqui, duas instâncias) no mesmo
+diretório.
+"""
+import pytest
+
+from archive import CODEC_ZLIB, ArchiveError, TranscriptArchive, decode_record, encode_record
+from subtitles import Transcript
+
+
+def make_transcript(count: int, word: str = "texto") -> Transcript:
+    return Transcript.from_segments((i * 2.0, 1.5, f"{word} {i}") for i in range(count))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = TranscriptArchive(str(tmp_path), block_segments=10)
+    yield archive
+    archive.close()
+
+
+def test_round_trip(archive):
+    transcript = make_transcript(35)
+    assert archive.put("abc", "pt", transcript, "test")
+    assert not archive.put("abc", "pt", make_transcript(35))
+    assert archive.stats["unchanged"] == 1
+
+    loaded = archive.get("abc", "pt")
+    assert loaded.text == transcript.text
+    assert list(loaded.starts) == list(transcript.starts)
+    assert list(loaded.durations) == list(transcript.durations)
+    assert archive.get("abc", "en") is None
+
+
+def test_get_range_matches_slice(archive):
+    transcript = make_transcript(35)
+    archive.put("abc", None, transcript)
+    for start, end in ((0.0, 5.0), (19.0, 41.0), (60.0, float("inf")), (100.0, 200.0)):
+        expected = transcript.slice_time(start, end)
+        assert archive.get_range("abc", None, start, end).to_dicts() == expected.to_dicts()
+
+
+def test_compact_drops_old_versions(archive):
+    archive.put("abc", "pt", make_transcript(30, "antigo"))
+    archive.put("xyz", "pt", make_transcript(12))
+    archive.put("abc", "pt", make_transcript(20, "novo"))
+    assert archive.info()["garbage_bytes"] > 0
+
+    sizes = archive.compact()
+    assert sizes["bytes_after"] < sizes["bytes_before"]
+    assert archive.info()["garbage_bytes"] == 0
+    assert archive.get("abc", "pt").text == make_transcript(20, "novo").text
+    assert archive.get("xyz", "pt").text == make_transcript(12).text
+
+    # Acréscimos depois do compact vão para o arquivo novo
+    archive.put("def", "pt", make_transcript(5))
+    assert archive.get("def", "pt").text == make_transcript(5).text
+
+
+def test_second_process_appends_and_compacts(tmp_path, archive):
+    other = TranscriptArchive(str(tmp_path), block_segments=10)
+    try:
+        archive.put("abc", "pt", make_transcript(30))
+        other.put("xyz", "pt", make_transcript(15))
+        archive.put("def", "pt", make_transcript(8))
+        for reader in (archive, other):
+            assert reader.get("xyz", "pt").text == make_transcript(15).text
+            assert reader.get("def", "pt").text == make_transcript(8).text
+
+        other.put("abc", "pt", make_transcript(10, "novo"))
+        other.compact()
+        # A outra instância troca o arquivo: esta reabre antes de ler ou acrescentar
+        assert archive.get("abc", "pt").text == make_transcript(10, "novo").text
+        archive.put("ghi", "pt", make_transcript(4))
+        assert other.get("ghi", "pt").text == make_transcript(4).text
+        assert other.get("xyz", "pt").text == make_transcript(15).text
+    finally:
+        other.close()
+
+
+def test_corrupt_record_raises_archive_error(archive):
+    archive.put("abc", "pt", make_transcript(30))
+    archive.close()
+    offset = 200  # dentro dos blocos comprimidos, depois do índice de blocos
+    with open(archive.data_path, "r+b") as f:
+        f.seek(offset)
+        data = f.read(16)
+        f.seek(offset)
+        f.write(bytes(b ^ 0xFF for b in data))
+
+    reopened = TranscriptArchive(archive.directory, block_segments=10)
+    try:
+        with pytest.raises(ArchiveError):
+            reopened.get("abc", "pt")
+    finally:
+        reopened.close()
+
+
+@pytest.mark.parametrize("damage", ["magic", "truncated", "payload"])
+def test_decode_record_rejects_damage(damage):
+    record = bytearray(encode_record(make_transcript(25), CODEC_ZLIB, block_segments=10))
+    if damage == "magic":
+        record[:4] = b"XXXX"
+    elif damage == "truncated":
+        record = record[: len(record) // 2]
+    else:
+        record[-8:] = bytes(8)
+    with pytest.raises(ArchiveError):
+        decode_record(bytes(record))
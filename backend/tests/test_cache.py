@@ -0,0 +1,77 @@
+"""
+Cache em duas camadas: gravação em background, totais do disco mantidos sem
+recontar a tabela e erros cacheados.
+"""
+import pytest
+
+from cache import NegativeEntry, TranscriptCache
+from subtitles import Transcript
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def table_totals(cache: TranscriptCache):
+    return cache._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcript_cache").fetchone()
+
+
+def test_write_behind_persists(path):
+    cache = TranscriptCache(path)
+    transcript = Transcript.from_segments([(0.0, 1.0, "olá"), (1.0, 1.0, "mundo")])
+    cache.set("abc", "pt", "transcript", {"video_id": "abc", "transcript": transcript})
+    # A memória responde antes de a thread gravar
+    assert cache.get("abc", "pt", "transcript", memory_only=True)["transcript"] is transcript
+    cache.stop()
+
+    reopened = TranscriptCache(path)
+    assert reopened.get("abc", "pt", "transcript", memory_only=True) is None
+    loaded = reopened.get("abc", "pt", "transcript")
+    assert loaded["transcript"].text == transcript.text
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_memory_only_miss_is_not_counted(path):
+    cache = TranscriptCache(path)
+    assert cache.get("abc", None, "languages", memory_only=True) is None
+    assert cache.stats()["misses"] == 0
+    assert cache.get("abc", None, "languages") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_running_totals_match_table(path):
+    cache = TranscriptCache(path)
+    for i in range(20):
+        cache.set(f"v{i}", None, "languages", {"langs": ["pt"] * i})
+    # Substituir uma entrada troca o tamanho sem contar outra linha
+    cache.set("v3", None, "languages", {"langs": ["en"] * 50})
+    cache.flush()
+    cache.invalidate("v5", None, "languages")
+
+    stats = cache.stats()
+    assert (stats["disk_entries"], stats["disk_bytes"]) == tuple(table_totals(cache))
+    assert stats["disk_entries"] == 19
+    cache.stop()
+
+
+def test_eviction_keeps_limits(path):
+    cache = TranscriptCache(path, disk_max_entries=5)
+    for i in range(12):
+        cache.set(f"v{i}", None, "languages", {"i": i})
+        cache.flush()
+
+    stats = cache.stats()
+    assert stats["disk_entries"] <= 5
+    assert (stats["disk_entries"], stats["disk_bytes"]) == tuple(table_totals(cache))
+    assert stats["evictions"] >= 7
+    cache.stop()
+
+
+def test_negative_entry_round_trip(path):
+    cache = TranscriptCache(path)
+    cache.set_negative("abc", "pt", "transcript", 404, "No transcript found for this video.")
+    cache.stop()
+
+    cached = TranscriptCache(path).get("abc", "pt", "transcript")
+    assert cached == NegativeEntry(404, "No transcript found for this video.")
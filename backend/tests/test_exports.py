@@ -0,0 +1,66 @@
+"""Exportação: compressão incremental, cache por ETag e escape do Markdown."""
+import gzip
+
+import pytest
+
+import exports
+from subtitles import Transcript
+
+
+def make_transcript(count: int = 5000) -> Transcript:
+    return Transcript.from_segments((i * 2.0, 2.0, f"segmento {i} com algum texto") for i in range(count))
+
+
+@pytest.mark.parametrize("fmt", sorted(exports.EXPORT_FORMATS))
+def test_gzip_stream_matches_writer(fmt):
+    transcript = make_transcript()
+    expected = "".join(exports.EXPORT_FORMATS[fmt].writer(transcript)).encode("utf-8")
+    parts = list(exports.render_stream(transcript, fmt, "gzip"))
+    # Sai em vários pedaços, não num único corpo no fim
+    assert len(parts) > 1
+    assert gzip.decompress(b"".join(parts)) == expected
+
+
+def test_brotli_stream_matches_writer():
+    brotli = pytest.importorskip("brotli")
+    transcript = make_transcript()
+    body = exports.render(transcript, "srt", "br")
+    assert brotli.decompress(body) == transcript.to_srt().encode("utf-8")
+
+
+def test_cache_filled_only_after_complete_stream():
+    transcript = make_transcript()
+    cache = exports.ExportCache()
+    stream = exports.render_stream(transcript, "vtt", "gzip", cache=cache, etag='"x"')
+    first = next(stream)
+    assert cache.get('"x"') is None
+    body = first + b"".join(stream)
+    assert cache.get('"x"') == (body, "gzip")
+
+
+def test_cache_skips_bodies_over_limit():
+    cache = exports.ExportCache(max_bytes=1000)
+    body = exports.render_stream(make_transcript(), "txt", "identity", cache=cache, etag='"big"')
+    assert len(b"".join(body)) > 1000
+    assert cache.get('"big"') is None
+
+
+def test_not_modified_is_counted():
+    cache = exports.ExportCache()
+    cache.record_not_modified()
+    cache.record_not_modified()
+    assert cache.snapshot()["not_modified"] == 2
+    assert cache.snapshot()["hits"] == 0
+
+
+def test_short_transcripts_are_not_compressed():
+    short = Transcript.from_segments([(0.0, 1.0, "oi")])
+    assert exports.negotiate_encoding("gzip, br", short) == "identity"
+    assert exports.negotiate_encoding("gzip", make_transcript()) == "gzip"
+
+
+def test_markdown_escapes_title_and_text():
+    transcript = Transcript.from_segments([(0.0, 1.0, "*negrito* [link](x) <b>")])
+    md = "".join(exports.EXPORT_FORMATS["md"].writer(transcript, title="A_B #1"))
+    assert md.startswith("# A\\_B \\#1\n")
+    assert "\\*negrito\\* \\[link\\](x) \\<b\\>" in md
@@ -0,0 +1,47 @@
+"""Circuit breaker do pool Invidious: uma só tentativa de teste por instância half-open."""
+import time
+
+from invidious_pool import CLOSED, HALF_OPEN, OPEN, InvidiousPool
+
+A, B = "https://a.example", "https://b.example"
+
+
+def broken_pool(**kwargs) -> InvidiousPool:
+    pool = InvidiousPool([A, B], failure_threshold=1, open_seconds=0, **kwargs)
+    pool.record_failure(A, RuntimeError("down"))
+    assert pool.instances[A].state == OPEN
+    return pool
+
+
+def test_half_open_goes_to_one_caller_at_a_time():
+    pool = broken_pool()
+    assert A in pool.ordered()
+    assert pool.instances[A].state == HALF_OPEN
+    # Chamadores concorrentes não recebem a instância enquanto o teste não termina
+    assert pool.ordered() == [B]
+    assert pool.ordered() == [B]
+
+    pool.record_success(A, 0.1)
+    assert pool.instances[A].state == CLOSED
+    assert A in pool.ordered()
+    assert A in pool.ordered()
+
+
+def test_failed_trial_reopens_and_releases():
+    pool = broken_pool()
+    assert A in pool.ordered()
+    pool.record_failure(A, RuntimeError("still down"))
+    assert pool.instances[A].state == OPEN
+    assert pool.instances[A].trial_started_at is None
+    # Cooldown zero: a próxima chamada pode testar de novo
+    assert A in pool.ordered()
+    assert pool.ordered() == [B]
+
+
+def test_abandoned_trial_expires():
+    pool = broken_pool(trial_timeout=0.05)
+    assert A in pool.ordered()
+    assert pool.ordered() == [B]
+    time.sleep(0.06)
+    assert A in pool.ordered()
+    assert pool.instances[A].snapshot()["trial_in_flight"] is True
@@ -0,0 +1,157 @@
+"""
+Fila de jobs: ordem por prioridade, repetição com backoff e erros que não
+valem uma nova tentativa.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+import jobs
+from fastapi import HTTPException
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    delays = []
+
+    def record(attempt):
+        delays.append(attempt)
+        return 0.01
+
+    monkeypatch.setattr(jobs, "retry_delay", record)
+    return delays
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def wait_finished(queue: jobs.JobQueue, job_id: str) -> dict:
+    async for job in queue.watch(job_id, heartbeat=0.05):
+        pass
+    return job
+
+
+def test_priority_order():
+    order = []
+
+    async def handler(params, progress):
+        order.append(params["name"])
+        return params["name"]
+
+    async def scenario():
+        queue = jobs.JobQueue({"echo": handler}, store=jobs.JobStore(None), workers=1)
+        # Enviados antes do start: o worker só começa com tudo já na fila
+        low = await queue.submit("echo", {"name": "baixa"}, priority=0)
+        await queue.submit("echo", {"name": "alta"}, priority=5)
+        await queue.submit("echo", {"name": "media"}, priority=1)
+        await queue.submit("echo", {"name": "baixa-2"}, priority=0)
+        await queue.start()
+        await queue._queue.join()
+        done = await queue.get(low["id"])
+        await queue.stop()
+        return done
+
+    done = run(scenario())
+    assert order == ["alta", "media", "baixa", "baixa-2"]
+    assert done["status"] == jobs.DONE
+    assert done["result"] == "baixa"
+
+
+def test_retry_with_backoff(no_backoff):
+    calls = []
+
+    async def flaky(params, progress):
+        calls.append(len(calls))
+        if len(calls) < 3:
+            raise HTTPException(status_code=502, detail="upstream")
+        progress("quase")
+        return {"ok": True}
+
+    async def scenario():
+        queue = jobs.JobQueue({"flaky": flaky}, store=jobs.JobStore(None), workers=1, max_attempts=3)
+        await queue.start()
+        job = await queue.submit("flaky", {})
+        finished = await wait_finished(queue, job["id"])
+        stats = queue.info()
+        await queue.stop()
+        return finished, stats
+
+    finished, stats = run(scenario())
+    assert finished["status"] == jobs.DONE
+    assert finished["attempts"] == 3
+    assert finished["result"] == {"ok": True}
+    assert finished["error"] is None
+    assert no_backoff == [1, 2]
+    assert stats["retries"] == 2
+    assert stats["completed"] == 1
+
+
+def test_retries_exhausted():
+    async def broken(params, progress):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = jobs.JobQueue({"broken": broken}, store=jobs.JobStore(None), workers=1, max_attempts=2)
+        await queue.start()
+        job = await queue.submit("broken", {})
+        finished = await wait_finished(queue, job["id"])
+        await queue.stop()
+        return finished
+
+    finished = run(scenario())
+    assert finished["status"] == jobs.FAILED
+    assert finished["attempts"] == 2
+    assert finished["error"] == {"status_code": 500, "detail": "boom"}
+
+
+@pytest.mark.parametrize(
+    "exc, status_code",
+    [
+        (jobs.ConfigurationError("GROQ_API_KEY not configured"), 503),
+        (HTTPException(status_code=404, detail="No transcript found"), 404),
+    ],
+)
+def test_permanent_errors_are_not_retried(no_backoff, exc, status_code):
+    async def handler(params, progress):
+        raise exc
+
+    async def scenario():
+        queue = jobs.JobQueue({"summary": handler}, store=jobs.JobStore(None), workers=1, max_attempts=3)
+        await queue.start()
+        job = await queue.submit("summary", {})
+        finished = await wait_finished(queue, job["id"])
+        stats = queue.info()
+        await queue.stop()
+        return finished, stats
+
+    finished, stats = run(scenario())
+    assert finished["status"] == jobs.FAILED
+    assert finished["attempts"] == 1
+    assert finished["error"]["status_code"] == status_code
+    assert no_backoff == []
+    assert stats["retries"] == 0
+
+
+def test_purge_runs_on_timer():
+    async def handler(params, progress):
+        return "ok"
+
+    async def scenario():
+        store = jobs.JobStore(None)
+        queue = jobs.JobQueue({"echo": handler}, store=store, workers=1)
+        await queue.start(purge_interval=0.05)
+        job = await queue.submit("echo", {})
+        await wait_finished(queue, job["id"])
+        # Finalizado há mais tempo que o TTL
+        store._db.execute("UPDATE jobs SET updated_at = 0 WHERE id = ?", (job["id"],))
+        await asyncio.sleep(0.2)
+        gone = await queue.get(job["id"])
+        await queue.stop()
+        return gone, queue.stats["purged"]
+
+    gone, purged = run(scenario())
+    assert gone is None
+    assert purged == 1
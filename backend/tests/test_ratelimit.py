@@ -0,0 +1,24 @@
+"""Token bucket adaptativo: pausa por 429 e recuperação da taxa."""
+import time
+
+from ratelimit import AdaptiveTokenBucket
+
+
+def test_recover_during_pause_keeps_tokens_non_negative():
+    bucket = AdaptiveTokenBucket(5, 10)
+    bucket.throttle(retry_after=1.0)
+    paused_until = bucket.updated_at
+    for _ in range(10):
+        bucket.recover()
+    assert bucket.tokens == 0.0
+    # A pausa continua valendo: o relógio do balde não volta para antes dela
+    assert bucket.updated_at == paused_until
+    assert bucket.rate == bucket.base_rate
+
+
+def test_refill_resumes_after_pause():
+    bucket = AdaptiveTokenBucket(100, 10)
+    bucket.throttle(retry_after=0.05)
+    time.sleep(0.1)
+    bucket._refill(time.monotonic())
+    assert 0.0 < bucket.tokens <= bucket.burst
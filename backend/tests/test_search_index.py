@@ -0,0 +1,83 @@
+"""Índice de busca entre vídeos: reindexação quando o conteúdo muda."""
+import sqlite3
+
+import pytest
+
+from search_index import SearchIndex
+from subtitles import Transcript
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    if not index.available:
+        pytest.skip("SQLite sem FTS5")
+    return index
+
+
+def index_now(index: SearchIndex, transcript: Transcript, video_id: str = "abc"):
+    db = index._connect()
+    index._index(db, video_id, "pt", "test", transcript)
+    db.close()
+
+
+def test_same_segment_count_with_new_text_is_reindexed(index):
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "texto antigo"), (1.0, 1.0, "fim")]))
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "texto corrigido"), (1.0, 1.0, "fim")]))
+
+    assert index.stats["indexed"] == 2
+    assert index.search("corrigido")["total"] == 1
+    assert index.search("antigo")["total"] == 0
+
+
+def test_unchanged_transcript_is_skipped(index):
+    transcript = Transcript.from_segments([(0.0, 1.0, "mesmo texto")])
+    index_now(index, transcript)
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "mesmo texto")]))
+    assert index.stats == dict(index.stats, indexed=1, skipped=1)
+
+
+def test_reindex_deletes_only_its_rowids(index):
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "outro vídeo"), (1.0, 1.0, "fim")]), video_id="xyz")
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "texto antigo"), (1.0, 1.0, "fim")]))
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "texto novo"), (1.0, 1.0, "mais"), (2.0, 1.0, "fim")]))
+
+    assert index.search("fim")["total"] == 2
+    assert index.search("outro")["total"] == 1
+    first, last = index._read_db.execute(
+        "SELECT first_rowid, last_rowid FROM indexed_videos WHERE video_id = 'abc'"
+    ).fetchone()
+    rows = index._read_db.execute("SELECT rowid FROM segments WHERE video_id = 'abc'").fetchall()
+    assert [row[0] for row in rows] == list(range(first, last + 1))
+
+
+def test_old_schema_gets_fingerprint_column(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE indexed_videos (video_id TEXT NOT NULL, language TEXT NOT NULL, source TEXT, "
+        "segment_count INTEGER NOT NULL, indexed_at REAL NOT NULL, PRIMARY KEY (video_id, language))"
+    )
+    db.execute("INSERT INTO indexed_videos VALUES ('abc', 'pt', 'test', 1, 0)")
+    db.commit()
+    db.close()
+
+    index = SearchIndex(path)
+    if not index.available:
+        pytest.skip("SQLite sem FTS5")
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "novo")]))
+    assert index.stats["indexed"] == 1
+
+
+def test_old_rows_without_rowid_range_are_replaced(tmp_path):
+    path = str(tmp_path / "old.db")
+    index = SearchIndex(path)
+    if not index.available:
+        pytest.skip("SQLite sem FTS5")
+    # Linha gravada antes da faixa de rowids existir
+    index._read_db.execute("INSERT INTO segments (text, video_id, language, start, duration) VALUES ('velho', 'abc', 'pt', 0, 1)")
+    index._read_db.execute("INSERT INTO indexed_videos (video_id, language, segment_count, indexed_at) VALUES ('abc', 'pt', 1, 0)")
+
+    index_now(index, Transcript.from_segments([(0.0, 1.0, "novo")]))
+    assert index.search("velho")["total"] == 0
+    assert index.search("novo")["total"] == 1
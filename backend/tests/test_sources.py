@@ -0,0 +1,88 @@
+"""
+Trilhas da youtube-transcript-api guardadas como dados simples e remontadas na
+thread que baixa a legenda: a ida e volta depende de detalhes internos da
+biblioteca (versão fixada em requirements.txt), então fica coberta aqui.
+"""
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from youtube_transcript_api import NoTranscriptFound, TranscriptList
+
+pytest.importorskip("httpx")
+
+import sources
+
+CAPTIONS_JSON = {
+    "captionTracks": [
+        {"baseUrl": "https://www.youtube.com/api/timedtext?v=abc&lang=en&kind=asr", "name": {"runs": [{"text": "English (auto-generated)"}]}, "languageCode": "en", "kind": "asr"},
+        {"baseUrl": "https://www.youtube.com/api/timedtext?v=abc&lang=en", "name": {"runs": [{"text": "English"}]}, "languageCode": "en"},
+        {"baseUrl": "https://www.youtube.com/api/timedtext?v=abc&lang=pt", "name": {"runs": [{"text": "Portuguese"}]}, "languageCode": "pt"},
+    ],
+}
+
+TIMEDTEXT = (
+    '<?xml version="1.0" encoding="utf-8" ?><transcript>'
+    '<text start="0.5" dur="1.25">olá</text><text start="2" dur="1">mundo</text>'
+    "</transcript>"
+)
+
+
+class TimedTextAdapter(BaseAdapter):
+    """Responde a qualquer GET com a mesma legenda e guarda as URLs pedidas."""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = TIMEDTEXT.encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def make_session():
+    session = requests.Session()
+    adapter = TimedTextAdapter()
+    session.mount("https://", adapter)
+    return session, adapter
+
+
+def listed_tracks():
+    session, _ = make_session()
+    return [sources._track_info(t) for t in TranscriptList.build(session, "abc", CAPTIONS_JSON)]
+
+
+def test_track_info_is_plain_data():
+    tracks = listed_tracks()
+    assert {(t["code"], t["is_generated"]) for t in tracks} == {("en", True), ("en", False), ("pt", False)}
+    assert all(set(t) == {"code", "name", "is_generated", "url"} for t in tracks)
+    assert all(t["url"].startswith("https://www.youtube.com/api/timedtext") for t in tracks)
+
+
+def test_rebuilt_track_fetches_with_given_session():
+    tracks = listed_tracks()
+    track = sources.find_track("abc", tracks, ["en"])
+    assert track["is_generated"] is False
+
+    session, adapter = make_session()
+    caption = sources._caption_track(session, "abc", track)
+    assert (caption.language_code, caption.language, caption.is_generated) == ("en", "English", False)
+
+    fetched = caption.fetch()
+    assert adapter.urls == [track["url"]]
+    assert [(s.start, s.duration, s.text) for s in fetched] == [(0.5, 1.25, "olá"), (2.0, 1.0, "mundo")]
+
+
+def test_find_track_falls_back_to_generated_and_reports_missing():
+    tracks = [t for t in listed_tracks() if t["is_generated"] or t["code"] == "pt"]
+    assert sources.find_track("abc", tracks, ["en"])["is_generated"] is True
+    with pytest.raises(NoTranscriptFound):
+        sources.find_track("abc", tracks, ["de"])
@@ -0,0 +1,37 @@
+"""Motor de estratégia das fontes: deadline geral e erros por fonte."""
+import asyncio
+
+import pytest
+
+from strategy import AllSourcesFailed, SourceSpec, run_strategy
+
+
+def source(result=None, delay: float = 0.0, error: BaseException = None):
+    async def fetch():
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+    return fetch
+
+
+def test_first_valid_result_wins():
+    specs = [SourceSpec("slow", source("a", delay=1.0), 5), SourceSpec("fast", source("b"), 5)]
+    assert asyncio.run(run_strategy(specs, "parallel")) == ("fast", "b")
+
+
+def test_deadline_records_pending_and_unstarted_sources():
+    specs = [
+        SourceSpec("transcript_api", source(error=RuntimeError("blocked")), 5),
+        SourceSpec("ytdlp", source("x", delay=5.0), 5),
+        SourceSpec("invidious", source("y"), 5),
+    ]
+    with pytest.raises(AllSourcesFailed) as info:
+        asyncio.run(run_strategy(specs, "sequential", deadline=0.2))
+
+    errors = info.value.errors
+    assert info.value.deadline_exceeded
+    assert set(errors) == {"transcript_api", "ytdlp", "invidious"}
+    assert str(errors["ytdlp"]) == "ytdlp timed out (request deadline)"
+    assert "not started" in str(errors["invidious"])
+    assert str(errors.get("invidious")) != "None"
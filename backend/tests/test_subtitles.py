@@ -0,0 +1,133 @@
+"""
+Corpus de correção dos parsers com arquivos reais (fixtures/): legendas
+automáticas rolantes do YouTube, entidades escapadas duas vezes, tempos TTML
+em quadros/ticks e cues malformadas ou vazias.
+"""
+import io
+import os
+import tracemalloc
+
+import pytest
+
+from subtitles import detect_format, parse, parse_srv3, parse_ttml
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def segments(name: str, fmt: str = None):
+    return [(round(s.start, 3), round(s.duration, 3), s.text) for s in parse(load(name), fmt)]
+
+
+def test_youtube_rolling_vtt_drops_repeated_lines():
+    assert segments("youtube_auto_rolling.vtt") == [
+        (0.03, 2.24, "we're going to talk"),
+        (2.28, 2.67, "about rolling captions"),
+        (4.96, 2.15, "today and tomorrow"),
+    ]
+
+
+def test_malformed_vtt():
+    assert segments("malformed.vtt") == [
+        (1.0, 1.5, "sem horas no tempo"),
+        (5.0, 1.0, "primeira cue"),
+        (6.0, 1.0, "colada na anterior sem linha em branco"),
+        (10.0, 1.0, "Tom & Jerry & amigos"),
+    ]
+
+
+def test_vtt_repeated_line_is_kept_when_not_consecutive():
+    content = "WEBVTT\n\n00:00.000 --> 00:01.000\nola\n\n00:01.000 --> 00:02.000\ntchau\n\n00:02.000 --> 00:03.000\nola\n"
+    assert [s.text for s in parse(content, "vtt")] == ["ola", "tchau", "ola"]
+
+
+def test_vtt_manual_consecutive_repeated_line_is_kept():
+    content = "WEBVTT\n\n00:00.000 --> 00:01.000\nNão.\n\n00:01.500 --> 00:02.500\nNão.\n\n00:02.500 --> 00:04.000\nNão.\nChega.\n"
+    assert [s.text for s in parse(content, "vtt")] == ["Não.", "Não.", "Não. Chega."]
+
+
+def test_vtt_overlapping_cues_drop_repeated_line():
+    # Rolante sem as cues de ~10ms: cada cue começa antes de a anterior terminar
+    content = "WEBVTT\n\n00:00.000 --> 00:02.000\num\n\n00:01.000 --> 00:03.000\num\ndois\n"
+    assert [s.text for s in parse(content, "vtt")] == ["um", "dois"]
+
+
+def test_srv3_double_escaped_entities_and_empty_paragraphs():
+    assert segments("entities.srv3.xml") == [
+        (0.0, 1.5, "it's a test"),
+        (2.5, 2.0, 'Tom & Jerry "quoted"'),
+    ]
+
+
+def test_srv1_double_escaped_entities():
+    assert segments("entities.srv1.xml", "srv3") == [
+        (0.5, 1.25, "I'm here"),
+        (1.75, 2.0, "<music>"),
+    ]
+
+
+def test_ttml_frame_and_tick_times():
+    assert segments("frames_ticks.ttml") == [
+        (1.6, 1.4, "quadros a 25 fps"),
+        (3.0, 1.5, "ticks de 10 MHz"),
+        (5.0, 2.0, "offset em segundos e quadros"),
+        (8.0, 1.5, "fração sem milissegundos completos"),
+    ]
+
+
+def test_json3_auto_captions():
+    assert segments("youtube_auto.json3") == [
+        (0.1, 2.0, "it's a test"),
+        (2.1, 1.5, "linha quebrada"),
+        (4.1, 0.9, "Tom & Jerry"),
+    ]
+
+
+@pytest.mark.parametrize("name, fmt", [
+    ("youtube_auto_rolling.vtt", "vtt"),
+    ("malformed.vtt", "vtt"),
+    ("entities.srv3.xml", "srv3"),
+    ("entities.srv1.xml", "srv3"),
+    ("frames_ticks.ttml", "ttml"),
+    ("youtube_auto.json3", "json3"),
+])
+def test_detect_format(name, fmt):
+    assert detect_format(load(name)) == fmt
+
+
+def test_invalid_ttml_time():
+    content = b'<tt xmlns="http://www.w3.org/ns/ttml"><body><div><p begin="soon">x</p></div></body></tt>'
+    with pytest.raises(ValueError):
+        list(parse_ttml(content))
+
+
+def _srv3(cues: int) -> bytes:
+    body = "".join(f'<p t="{i * 2000}" d="2000"><s>fala</s><s t="500"> numero {i}</s></p>' for i in range(cues))
+    return f'<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>{body}</body></timedtext>'.encode()
+
+
+def _ttml(cues: int) -> bytes:
+    body = "".join(f'<p begin="{i * 2}s" dur="2s">fala<br/><span>numero {i}</span></p>' for i in range(cues))
+    return f'<tt xmlns="http://www.w3.org/ns/ttml"><body><div>{body}</div></body></tt>'.encode()
+
+
+def _peak(parser, content: bytes) -> int:
+    stream = io.BytesIO(content)
+    tracemalloc.start()
+    try:
+        for _ in parser(stream):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("parser, build", [(parse_srv3, _srv3), (parse_ttml, _ttml)])
+def test_xml_parsers_memory_does_not_grow_with_file_size(parser, build):
+    small, large = build(2000), build(20000)
+    # 10x mais cues, mas os elementos processados são liberados: o pico quase não muda
+    assert _peak(parser, large) < 2 * _peak(parser, small)
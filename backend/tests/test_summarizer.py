@@ -0,0 +1,116 @@
+"""
+Resumo map-reduce contra o servidor local (benchmarks/fake_llm.py): número de
+blocos, rodadas de reduce, totais de uso e ordem dos eventos SSE.
+
+O fake responde com as primeiras 40 palavras do prompt, em 5 tópicos de 8
+palavras; com tokens estimados por palavra, as contas abaixo são exatas.
+"""
+import json
+
+import pytest
+from openai import OpenAI
+
+import summarizer
+from benchmarks.fake_llm import serve
+from subtitles import Transcript
+
+WORDS = " ".join(f"palavra{i}" for i in range(10))
+
+
+@pytest.fixture
+def fake_llm():
+    log = []
+    server = serve(0, latency=0, background=True, log=log)
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="local", max_retries=0)
+    yield client, log
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Independe de o tiktoken estar instalado
+    monkeypatch.setattr(summarizer, "estimate_tokens", lambda text: len(text.split()))
+
+
+def make_transcript(count: int) -> Transcript:
+    # Um segmento por minuto: cada um ganha marca de tempo e vale 11 + 1 tokens
+    return Transcript.from_segments((i * 60.0, 5.0, WORDS) for i in range(count))
+
+
+def parse_sse(raw: str):
+    events = []
+    for block in raw.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_chunks_follow_token_budget():
+    chunks = summarizer.chunk_transcript(make_transcript(30), max_tokens=40)
+    assert len(chunks) == 10
+    assert all(chunk.tokens == 36 for chunk in chunks)
+    assert [chunk.start for chunk in chunks[:2]] == [0.0, 180.0]
+    assert chunks[1].text.startswith("[00:03:00] palavra0")
+
+
+def test_map_reduce_counts_and_usage(fake_llm):
+    client, log = fake_llm
+    result = summarizer.summarize(client, make_transcript(30), model="local", max_tokens=40, max_parallel=3)
+
+    map_calls = [call for call in log if call["prompt"].lstrip().startswith("Este é o trecho")]
+    reduce_calls = [call for call in log if not call["stream"] and call not in map_calls]
+    final_calls = [call for call in log if call["stream"]]
+
+    assert result.chunks == 10
+    assert len(map_calls) == 10
+    # Cada parcial (45 palavras) estoura o limite sozinho: junta de dois em dois, 10 -> 5 -> 3 -> 2
+    assert result.usage["reduce_rounds"] == 3
+    assert len(reduce_calls) == 5 + 3 + 2
+    assert len(final_calls) == 1
+    assert final_calls[0]["prompt"].lstrip().startswith("Atue como")
+
+    assert result.usage["calls"] == len(log) == 21
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        assert result.usage[key] == sum(call["usage"][key] for call in log)
+    assert result.text == final_calls[0]["content"]
+    assert set(result.stages) >= {"chunking", "map", "reduce", "ttft", "total"}
+
+
+def test_short_video_single_call(fake_llm):
+    client, log = fake_llm
+    result = summarizer.summarize(client, make_transcript(3), model="local", max_tokens=40)
+
+    assert result.chunks == 1
+    assert result.usage["calls"] == 1
+    assert result.usage["reduce_rounds"] == 0
+    assert [call["stream"] for call in log] == [True]
+    assert log[0]["prompt"].lstrip().startswith("Atue como")
+
+
+def test_sse_event_order(fake_llm):
+    client, log = fake_llm
+    stream = summarizer.SummaryStream(client, make_transcript(30), model="local", max_tokens=40)
+    events = parse_sse("".join(stream.sse()))
+    kinds = [kind for kind, _ in events]
+
+    assert kinds[:2] == ["progress", "progress"]
+    assert events[0][1]["message"] == "Resumindo 10 trechos..."
+    assert kinds[-1] == "done"
+    assert set(kinds[2:-1]) == {"delta"}
+    assert "".join(data["text"] for kind, data in events if kind == "delta") == stream.result.text
+
+    done = events[-1][1]
+    assert done["chunks"] == 10
+    assert done["cached"] is False
+    assert done["usage"] == stream.result.usage
+    assert done["usage"]["calls"] == len(log)
+
+
+def test_sse_error_is_last_event():
+    broken = OpenAI(base_url="http://127.0.0.1:9/v1", api_key="local", max_retries=0, timeout=2)
+    stream = summarizer.SummaryStream(broken, make_transcript(30), model="local", max_tokens=40)
+    events = parse_sse("".join(stream.sse()))
+
+    assert [kind for kind, _ in events] == ["progress", "error"]
+    assert events[-1][1]["detail"].startswith("Erro ao gerar resumo")
@@ -0,0 +1,107 @@
+"""
+Parse incremental de legendas de lives (subtitles/tail.py): o arquivo cresce
+entre as consultas e o resultado de parse parcial + merge tem que ser igual
+ao de um parse completo do arquivo final.
+"""
+import json
+import os
+
+import pytest
+
+from subtitles import Transcript, parse
+from subtitles.tail import first_difference, merge_tail, parse_tail, resume_offset
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def vtt_versions(body: bytes):
+    """O arquivo como uma live o publicaria: cabeçalho + as primeiras k cues."""
+    blocks = body.rstrip().split(b"\n\n")
+    return [b"\n\n".join(blocks[:k]) + b"\n\n" for k in range(2, len(blocks) + 1)]
+
+
+def json3_versions(body: bytes):
+    data = json.loads(body)
+    return [
+        json.dumps(dict(data, events=data["events"][:k])).encode("utf-8")
+        for k in range(1, len(data["events"]) + 1)
+    ]
+
+
+def refresh(old_body: bytes, new_body: bytes, fmt: str) -> Transcript:
+    """Como o LiveRefresher._apply: parse parcial quando há offset, senão completo."""
+    stored = Transcript.from_segments(parse(old_body, fmt))
+    offset = resume_offset(old_body, fmt)
+    if offset is None:
+        return Transcript.from_segments(parse(new_body, fmt))
+    assert new_body[:offset] == old_body[:offset]
+    tail = parse_tail(new_body[offset:], fmt)
+    return merge_tail(stored, tail)[0] if tail else stored
+
+
+def texts(transcript: Transcript):
+    return [segment.text for segment in transcript]
+
+
+def test_rolling_vtt_tail_matches_full_parse():
+    versions = vtt_versions(load("youtube_auto_rolling.vtt"))
+    final = Transcript.from_segments(parse(versions[-1], "vtt"))
+    assert texts(final) == ["we're going to talk", "about rolling captions", "today and tomorrow"]
+    for i, old in enumerate(versions[:-1]):
+        for new in versions[i + 1:]:
+            merged = refresh(old, new, "vtt")
+            assert texts(merged) == texts(Transcript.from_segments(parse(new, "vtt"))), (i, len(new))
+            assert list(merged.starts) == list(Transcript.from_segments(parse(new, "vtt")).starts)
+
+
+def test_vtt_resume_offset_points_one_cue_back():
+    body = vtt_versions(load("youtube_auto_rolling.vtt"))[-1]
+    offset = resume_offset(body, "vtt")
+    assert body[offset:].lstrip().startswith(b"00:00:04.960 --> 00:00:07.110")
+    # Só contexto + a cue de ~10ms repetida: nada novo
+    assert not parse_tail(body[offset:], "vtt")
+
+
+def test_json3_tail_matches_full_parse():
+    versions = json3_versions(load("youtube_auto.json3"))
+    for i, old in enumerate(versions[:-1]):
+        for new in versions[i + 1:]:
+            assert texts(refresh(old, new, "json3")) == texts(Transcript.from_segments(parse(new, "json3")))
+
+
+def test_json3_resume_offset_is_last_event():
+    body = load("youtube_auto.json3")
+    offset = resume_offset(body, "json3")
+    assert body[offset:].startswith(b'{"tStartMs": 4100')
+    assert texts(parse_tail(body[offset:], "json3")) == ["Tom & Jerry"]
+
+
+def test_formats_without_partial_parse():
+    assert resume_offset(b"<timedtext></timedtext>", "srv3") is None
+    assert resume_offset(b"WEBVTT\n", "vtt") is None
+
+
+def test_merge_tail_replaces_from_first_new_start():
+    stored = Transcript.from_segments([(0.0, 1.0, "a"), (1.0, 1.0, "b"), (2.0, 1.0, "c parcial")])
+    tail = Transcript.from_segments([(2.0, 1.0, "c completo"), (3.0, 1.0, "d")])
+    merged, replace_from = merge_tail(stored, tail)
+    assert texts(merged) == ["a", "b", "c completo", "d"]
+    assert replace_from == 2
+
+
+def test_merge_tail_without_changes():
+    stored = Transcript.from_segments([(0.0, 1.0, "a"), (1.0, 1.0, "b")])
+    merged, replace_from = merge_tail(stored, stored.slice(1, 2))
+    assert texts(merged) == texts(stored)
+    assert replace_from == len(stored) == first_difference(stored, merged)
+
+
+@pytest.mark.parametrize("fmt", ["json3", "vtt"])
+def test_empty_tail_is_falsy(fmt):
+    tail = b"]}" if fmt == "json3" else b"\n"
+    assert not parse_tail(tail, fmt)
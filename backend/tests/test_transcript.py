@@ -0,0 +1,52 @@
+"""Intervalos de tempo na Transcript: limites e segmentos sobrepostos."""
+import pytest
+
+from subtitles import Transcript
+
+SEGMENTS = [(0.0, 2.0, "a"), (2.0, 2.0, "b"), (4.0, 2.0, "c"), (6.0, 2.0, "d")]
+
+
+def texts(transcript: Transcript):
+    return [segment.text for segment in transcript]
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        (0.0, 8.0, ["a", "b", "c", "d"]),
+        # Fim exclusivo: "c" começa exatamente em 4.0
+        (0.0, 4.0, ["a", "b"]),
+        # "a" termina exatamente em 2.0 e não se sobrepõe
+        (2.0, 4.0, ["b"]),
+        (3.0, 4.5, ["b", "c"]),
+        (7.9, float("inf"), ["d"]),
+        (8.0, 10.0, []),
+        (-5.0, 0.0, []),
+    ],
+)
+def test_slice_time_boundaries(start, end, expected):
+    assert texts(Transcript.from_segments(SEGMENTS).slice_time(start, end)) == expected
+
+
+def test_long_segment_does_not_pull_in_finished_short_ones():
+    transcript = Transcript.from_segments([
+        (0.0, 30.0, "longo"),
+        (1.0, 1.0, "curto 1"),
+        (2.0, 1.0, "curto 2"),
+        (9.0, 3.0, "cobre o início"),
+        (12.0, 1.0, "depois"),
+        (25.0, 1.0, "fora"),
+    ])
+    piece = transcript.slice_time(10.0, 20.0)
+    assert texts(piece) == ["longo", "cobre o início", "depois"]
+    assert list(piece.starts) == [0.0, 9.0, 12.0]
+    assert piece.text == "longo cobre o início depois"
+
+    # A faixa de índices continua contígua; quem filtra é o slice_time
+    assert transcript.index_range(10.0, 20.0) == (0, 5)
+
+
+def test_zero_duration_segment_at_start_is_kept():
+    transcript = Transcript.from_segments([(0.0, 10.0, "longo"), (5.0, 0.0, "marca"), (6.0, 1.0, "fim")])
+    assert texts(transcript.slice_time(5.0, 6.0)) == ["longo", "marca"]
+    assert texts(transcript.slice_time(5.5, 6.0)) == ["longo"]
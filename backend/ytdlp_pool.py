@@ -0,0 +1,89 @@
+"""
+Pool de instâncias `yt_dlp.YoutubeDL` reaproveitadas.
+
+Criar um YoutubeDL e carregar o extrator do YouTube custa caro (imports,
+regexes, leitura de cookies). Aqui as instâncias são criadas uma vez,
+aquecidas na subida do servidor e emprestadas para uma thread de cada vez
+(YoutubeDL não é thread-safe).
+"""
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import yt_dlp
+
+YTDLP_POOL_SIZE = int(os.environ.get("YTDLP_POOL_SIZE", 4))
+COOKIE_FILE = os.environ.get("YTDLP_COOKIE_FILE", "cookies.txt")
+
+
+class YtdlpPool:
+    def __init__(self, options: Dict, size: int = YTDLP_POOL_SIZE):
+        self.options = options
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[yt_dlp.YoutubeDL]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "borrowed": 0, "waited": 0}
+
+    def _create(self) -> yt_dlp.YoutubeDL:
+        options = dict(self.options)
+        # Cookies lidos uma vez, na criação
+        if os.path.exists(COOKIE_FILE):
+            print("Using cookies.txt for authentication")
+            options['cookiefile'] = COOKIE_FILE
+        ydl = yt_dlp.YoutubeDL(options)
+        # Carrega o extrator agora, e não na primeira requisição
+        ydl.get_info_extractor("Youtube")
+        self.stats["created"] += 1
+        return ydl
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _new_instance(self) -> yt_dlp.YoutubeDL:
+        try:
+            return self._create()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def instance(self) -> Iterator[yt_dlp.YoutubeDL]:
+        try:
+            ydl = self._idle.get_nowait()
+        except queue.Empty:
+            if self._reserve():
+                ydl = self._new_instance()
+            else:
+                self.stats["waited"] += 1
+                ydl = self._idle.get()
+        self.stats["borrowed"] += 1
+        try:
+            yield ydl
+        finally:
+            self._idle.put(ydl)
+
+    def warm(self):
+        """Cria todas as instâncias de uma vez (roda no executor, na subida)."""
+        while self._reserve():
+            self._idle.put(self._new_instance())
+
+    def close(self):
+        while True:
+            try:
+                ydl = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            ydl.close()
+            with self._lock:
+                self._created -= 1
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, size=self.size, idle=self._idle.qsize())
@@ -3,11 +3,15 @@
 import { useState } from 'react';
 import { TranscriptEntry, cleanTranscript, formatTimestamp } from '../lib/utils';
 
+const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+const JOB_POLL_INTERVAL_MS = 1000;
+
 export default function Home() {
   const [url, setUrl] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [transcript, setTranscript] = useState<TranscriptEntry[] | null>(null);
+  const [videoId, setVideoId] = useState<string | null>(null);
   const [cleanMode, setCleanMode] = useState(false);
   const [language, setLanguage] = useState('pt');
 
@@ -18,17 +22,17 @@ export default function Home() {
     setLoading(true);
     setError(null);
     setTranscript(null);
+    setVideoId(null);
 
     try {
-      const apiUrl = 'https://vinicuslbt-yt-transcrib-backendstreamlit-app-qpexzj.streamlit.app';
-
-      // Streamlit requer a URL passada como query param
-      const response = await fetch(`${apiUrl}/?url=${encodeURIComponent(url)}&lang=${language}`, {
-        method: 'GET',
+      // Cria um job e acompanha o status, em vez de segurar uma requisição longa aberta
+      const response = await fetch(`${API_URL}/jobs`, {
+        method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'Accept': 'application/json'
         },
+        body: JSON.stringify({ kind: 'transcript', url, language }),
       });
 
       if (!response.ok) {
@@ -36,8 +40,21 @@ export default function Home() {
         throw new Error(data.detail || 'Falha ao obter transcrição');
       }
 
-      const data = await response.json();
-      setTranscript(data.transcript);
+      let job = await response.json();
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        const poll = await fetch(`${API_URL}/jobs/${job.job_id}`, {
+          headers: { 'Accept': 'application/json' },
+        });
+        if (!poll.ok) throw new Error('Falha ao consultar o andamento da transcrição');
+        job = await poll.json();
+      }
+
+      if (job.status === 'failed') {
+        throw new Error(job.error?.detail || 'Falha ao obter transcrição');
+      }
+      setTranscript(job.result.transcript);
+      setVideoId(job.result.video_id);
     } catch (err: any) {
       setError(err.message);
     } finally {
@@ -45,25 +62,31 @@ export default function Home() {
     }
   };
 
-  const copyToClipboard = () => {
-    if (!transcript) return;
-    const text = cleanMode
-      ? cleanTranscript(transcript)
-      : transcript.map(e => `[${formatTimestamp(e.start)}] ${e.text}`).join('\n');
-    navigator.clipboard.writeText(text);
-    alert('Copiado para a área de transferência!');
+  // Texto e arquivos são gerados pelo backend (mesmo formato em todos os clientes)
+  const exportUrl = (fmt: string, download = false) => {
+    const params = new URLSearchParams({ language });
+    if (fmt === 'txt' && !cleanMode) params.set('timestamps', 'true');
+    if (download) params.set('download', 'true');
+    return `${API_URL}/transcript/${videoId}.${fmt}?${params}`;
+  };
+
+  const copyToClipboard = async () => {
+    if (!transcript || !videoId) return;
+    try {
+      const response = await fetch(exportUrl('txt'));
+      if (!response.ok) throw new Error('Falha ao gerar o texto');
+      const text = cleanMode ? (await response.text()).replace(/\s+/g, ' ').trim() : await response.text();
+      await navigator.clipboard.writeText(text);
+      alert('Copiado para a área de transferência!');
+    } catch (err: any) {
+      setError(err.message);
+    }
   };
 
-  const downloadText = () => {
-    if (!transcript) return;
-    const text = cleanMode
-      ? cleanTranscript(transcript)
-      : transcript.map(e => `[${formatTimestamp(e.start)}] ${e.text}`).join('\n');
-    const blob = new Blob([text], { type: 'text/plain' });
-    const url = window.URL.createObjectURL(blob);
+  const downloadFile = (fmt: string) => {
+    if (!transcript || !videoId) return;
     const a = document.createElement('a');
-    a.href = url;
-    a.download = `transcricao_${new Date().getTime()}.txt`;
+    a.href = exportUrl(fmt, true);
     a.click();
   };
 
@@ -128,7 +151,8 @@ export default function Home() {
             </div>
             <div className="flex gap-2">
               <button onClick={copyToClipboard} className="text-sm px-3 py-1 hover:bg-zinc-800 rounded transition-colors text-zinc-300 border border-zinc-700">Copiar</button>
-              <button onClick={downloadText} className="text-sm px-3 py-1 hover:bg-zinc-800 rounded transition-colors text-zinc-300 border border-zinc-700">Baixar .TXT</button>
+              <button onClick={() => downloadFile('txt')} className="text-sm px-3 py-1 hover:bg-zinc-800 rounded transition-colors text-zinc-300 border border-zinc-700">Baixar .TXT</button>
+              <button onClick={() => downloadFile('srt')} className="text-sm px-3 py-1 hover:bg-zinc-800 rounded transition-colors text-zinc-300 border border-zinc-700">Baixar .SRT</button>
             </div>
           </div>
 